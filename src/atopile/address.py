@@ -5,8 +5,8 @@ Addresses go by other names in various files for historical reasons - but should
 
 This file provides utilities for working with addresses.
 """
+import threading
 from typing import Optional, Iterable
-from functools import wraps
 from os import PathLike
 from pathlib import Path
 
@@ -14,8 +14,25 @@ from pathlib import Path
 class AddrStr(str):
     """
     Represents address strings
+
+    Addresses are interned - making an AddrStr for an address that already
+    has one returns that same object - and are only parsed once, until their
+    file's forgotten. The parsed sections live in a table alongside the
+    interned objects, rather than on the strings themselves, so they cost no
+    more memory than a plain str.
     """
 
+    __slots__ = ()
+
+    def __new__(cls, address: object = "") -> "AddrStr":
+        # Like str(), anything can be made into an address, eg. a Path
+        if not isinstance(address, str):
+            address = str(address)
+        return _intern(address).addr
+
+    def __reduce__(self):
+        return (AddrStr, (str(self),))
+
 
 class AddressError(ValueError):
     """
@@ -23,34 +40,100 @@ class AddressError(ValueError):
     """
 
 
-def _handle_windows(func):
-    """
-    A decorator to handle windows paths
+_UNSET = object()
 
-    FIXME: this is a hack to make this work under Windows
-    until we come up with something better
-    """
 
-    @wraps(func)
-    def wrapper(address: AddrStr, *args, **kwargs):
+class _ParsedAddr:
+    """The sections of an address, and what's derived from them."""
+
+    __slots__ = ("addr", "file", "entry_section", "instance_section", "name", "entry", "_parent")
+
+    def __init__(self, address: str) -> None:
+        # split plain strs, which is quicker than splitting AddrStrs
+        address = str(address)
+        self.addr = str.__new__(AddrStr, address)
+        entry = address.partition("::")[0]
+        self.entry = self.addr if entry == address else AddrStr(entry)
+
+        # FIXME: this is a hack to make this work under Windows
+        # until we come up with something better
+        drive = ""
         if len(address) >= 2 and address[1] == ":" and address[0].isalpha():
-            drive_letter = address[0]
-            remainder = address[2:]
-            result: Optional[str] = func(remainder, *args, **kwargs)
-            if result is None:
-                return None
+            drive, address = address[:2], address[2:]
+
+        sections = address.split(":")
+        self.file = _with_drive(drive, sections[0])
+        self.entry_section = _with_drive(drive, sections[1]) if len(sections) > 1 else None
+        self.instance_section = _with_drive(drive, sections[3]) if len(sections) > 3 else None
+        self.name = sections[-1].rpartition(".")[2]
+        self._parent = _UNSET
+
+    @property
+    def parent(self) -> Optional[AddrStr]:
+        if self._parent is _UNSET:
+            if self.instance_section is None:
+                self._parent = None
+            elif "." in self.instance_section:
+                self._parent = AddrStr(self.addr.rsplit(".", 1)[0])
+            else:
+                self._parent = AddrStr(self.addr.rsplit("::", 1)[0])
+        return self._parent
+
+
+def _with_drive(drive: str, section: str) -> str:
+    """Put a drive letter back on the front of a section that's a path."""
+    if drive and section[:1] in ("/", "\\"):
+        return drive + section
+    return section
 
-            char_1 = result[0]
-            if not (char_1 == "/" or char_1 == "\\"):
-                return result
 
-            return ":".join([drive_letter, result])
-        return func(address, *args, **kwargs)
+# Every address that's been made an AddrStr, keyed by the address itself,
+# until its file is forgotten. Addresses are made from several threads at
+# once, eg. while imports are parsed, so changes are made under the lock
+_parsed: dict[str, _ParsedAddr] = {}
+_parsed_lock = threading.Lock()
 
-    return wrapper
+
+def _intern(address: str) -> _ParsedAddr:
+    """Return the parsed form of an address, and keep it to be looked up again."""
+    parsed = _parsed.get(address)
+    if parsed is None:
+        # parsed outside the lock, since parsing makes the entry an AddrStr too
+        parsed = _ParsedAddr(address)
+        with _parsed_lock:
+            parsed = _parsed.setdefault(parsed.addr, parsed)
+    return parsed
+
+
+def _parse(address: str) -> _ParsedAddr:
+    """
+    Return the parsed form of an address.
+
+    Only AddrStrs are kept, so the helpers below can be given any number of
+    plain strs of instances' addresses without them piling up. Files and
+    entries are few, so they're kept anyway, which lets get_entry hand out
+    the one AddrStr for an entry.
+    """
+    parsed = _parsed.get(address)
+    if parsed is None:
+        if isinstance(address, AddrStr) or "::" not in address:
+            return _intern(address)
+        return _ParsedAddr(address)
+    return parsed
+
+
+def forget_file(file: str) -> None:
+    """
+    Forget the parsed addresses in a file, eg. once it's changed.
+
+    Addresses made afterwards are equal to, but not the same objects as,
+    those made before.
+    """
+    with _parsed_lock:
+        for addr in [addr for addr, parsed in _parsed.items() if parsed.file == file]:
+            del _parsed[addr]
 
 
-@_handle_windows
 def get_file(address: AddrStr) -> str:
     """
     Extract the file path from an address.
@@ -62,7 +145,7 @@ def get_file(address: AddrStr) -> str:
     This is because an "empty" file path is a valid address,
     to the current working directory, which is confusing.
     """
-    return address.split(":")[0]
+    return _parse(address).file
 
 
 def get_relative_addr_str(address: AddrStr, base_path: PathLike) -> AddrStr:
@@ -81,36 +164,28 @@ def get_entry(address: AddrStr) -> AddrStr:
     """
     Extract the root path from an address.
     """
-    return address.split("::")[0]
+    return _parse(address).entry
 
 
-@_handle_windows
 def get_entry_section(address: AddrStr) -> Optional[str]:
     """
     Extract the root path from an address.
     """
-    try:
-        return address.split(":")[1]
-    except IndexError:
-        return None
+    return _parse(address).entry_section
 
 
-@_handle_windows
 def get_instance_section(address: AddrStr) -> Optional[str]:
     """
     Extract the node path from an address.
     """
-    try:
-        return address.split(":")[3]
-    except IndexError:
-        return None
+    return _parse(address).instance_section
 
 
 def get_name(address: AddrStr) -> str:
     """
     Extract name from the end of the sequence.
     """
-    return address.split(":")[-1].split(".")[-1]
+    return _parse(address).name
 
 
 def add_instance(address: AddrStr, instance: str) -> AddrStr:
@@ -121,13 +196,13 @@ def add_instance(address: AddrStr, instance: str) -> AddrStr:
     if not instance:
         return address
 
-    current_instance_addr = get_instance_section(address)
-    if current_instance_addr is not None:
-        if current_instance_addr == "":
-            return address + instance
-        return address + "." + instance
-    elif get_entry_section(address):
-        return address + "::" + instance
+    parsed = _parse(address)
+    if parsed.instance_section is not None:
+        if parsed.instance_section == "":
+            return AddrStr(address + instance)
+        return AddrStr(address + "." + instance)
+    elif parsed.entry_section:
+        return AddrStr(address + "::" + instance)
     else:
         raise AddressError("Cannot add instance to something without an entry section.")
 
@@ -152,9 +227,9 @@ def add_entry(address: AddrStr, entry: str) -> AddrStr:
         raise AddressError("Cannot add entry to an instance address.")
 
     if not get_entry_section(address):
-        return address + ":" + entry
+        return AddrStr(address + ":" + entry)
     else:
-        return address + "." + entry
+        return AddrStr(address + "." + entry)
 
 
 def add_entries(address: AddrStr, entries: Iterable[str]) -> AddrStr:
@@ -173,7 +248,7 @@ def from_parts(
     """
     Create an address from its parts.
     """
-    address = str(file)
+    address = AddrStr(str(file))
     if entry:
         address = add_entry(address, entry)
     if instance:
@@ -185,14 +260,7 @@ def get_parent_instance_addr(address: AddrStr) -> Optional[AddrStr]:
     """
     Get the parent instance of an address, returning None if it doesn't exist.
     """
-    instance_section = get_instance_section(address)
-    if instance_section is None:
-        return None
-
-    if "." in instance_section:
-        return address.rsplit(".", 1)[0]
-
-    return address.rsplit("::", 1)[0]
+    return _parse(address).parent
 
 
 def get_instance_names(address: AddrStr) -> list[str]:
@@ -84,7 +84,7 @@ def generate_assertion_report(build_ctx: config.BuildContext):
     table = AssertionTable()
     context = {}
     with errors.ExceptionAccumulator() as exception_accumulator:
-        for instance_addr in instance_methods.all_descendants(build_ctx.entry):
+        for instance_addr in instance_methods.all_descendants_indexed(build_ctx.entry):
             instance = lofty.get_instance(instance_addr)
             for assertion in instance.assertions:
                 with exception_accumulator.collect():
@@ -214,7 +214,7 @@ def solve_assertions(build_ctx: config.BuildContext):
     variable_units: dict[str, pint.Unit] = {}
     variable_soup = loop_soup.LoopSoup()
     for error_collector, instance_addr in errors.iter_through_errors(
-        instance_methods.all_descendants(build_ctx.entry)
+        instance_methods.all_descendants_indexed(build_ctx.entry)
     ):
         instance = lofty.get_instance(instance_addr)
         for assertion in instance.assertions:
@@ -262,16 +262,14 @@ def solve_assertions(build_ctx: config.BuildContext):
     # 2. Create groups of assertions based on the symbols they contain
     # This way we don't need to solve for every assertion at once
     assertion_groups: dict[tuple[address.AddrStr], list[dict]] = defaultdict(list)
-    for instance_addr in instance_methods.all_descendants(build_ctx.entry):
+    for instance_addr in instance_methods.all_descendants_indexed(build_ctx.entry):
         instance = lofty.get_instance(instance_addr)
         for assertion in instance.assertions:
             for symbol in assertion.lhs.symbols | assertion.rhs.symbols:
                 # Only add the constraint if the assertion contains a variable
                 # Otherwise, this assertion isn't relevant to the optimization
                 if symbol.key in variable_soup:
-                    group_key = tuple(
-                        sorted(variable_soup.get_loop(symbol.key).iter_values())
-                    )
+                    group_key = tuple(sorted(variable_soup.get_group(symbol.key)))
                     assertion_groups[group_key].append(assertion)
                     break  # onto the next assertion
 
@@ -419,7 +417,7 @@ def simplify_expressions(entry_addr: address.AddrStr):
     # FIXME: I hate that we're iterating over the whole model, to grab
     # all the context all at once and duplicated it into a dict.
     context: dict[str, expressions.NumericishTypes] = {}
-    for instance_addr in instance_methods.all_descendants(entry_addr):
+    for instance_addr in instance_methods.all_descendants_indexed(entry_addr):
         instance = lofty.get_instance(instance_addr)
         for assignment_key, assignment in instance.assignments.items():
             if assignment and assignment[0].value is not None:
@@ -442,7 +440,7 @@ def simplify_expressions(entry_addr: address.AddrStr):
     # Great, now simplify the expressions in the assertions
     # TODO:
     simplified_context = {**context, **simplified}
-    for instance_addr in instance_methods.all_descendants(entry_addr):
+    for instance_addr in instance_methods.all_descendants_indexed(entry_addr):
         instance = lofty.get_instance(instance_addr)
         for assertion in instance.assertions:
             assertion.lhs = expressions.Expression.from_numericish(
@@ -16,7 +16,6 @@ from toolz import groupby
 
 import atopile.instance_methods
 from atopile import address, components, errors
-from atopile.instance_methods import all_descendants, match_components
 
 log = logging.getLogger(__name__)
 
@@ -108,7 +107,7 @@ def generate_designator_map(entry_addr: address.AddrStr) -> str:
     if address.get_instance_section(entry_addr):
         raise ValueError("Cannot generate a BoM for an instance address.")
 
-    all_components = list(filter(match_components, all_descendants(entry_addr)))
+    all_components = atopile.instance_methods.all_components(entry_addr)
 
     # Create tables to print to the terminal and to the disc
     sorted_des_table = Table(show_header=True, header_style="bold green")
@@ -153,7 +152,8 @@ def generate_bom(entry_addr: address.AddrStr) -> str:
     if address.get_instance_section(entry_addr):
         raise ValueError("Cannot generate a BoM for an instance address.")
 
-    all_components = list(filter(match_components, all_descendants(entry_addr)))
+    all_components = atopile.instance_methods.all_components(entry_addr)
+    components.prefetch_generics(all_components)
     bom = groupby(_get_mpn, all_components)
 
     # Filter out None MPNs
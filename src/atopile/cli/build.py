@@ -7,37 +7,103 @@ from typing import Callable, Optional
 
 import click
 
+import atopile.address
 import atopile.assertions
 import atopile.bom
+import atopile.components
 import atopile.config
 import atopile.front_end
 import atopile.layout
 import atopile.manufacturing_data
 import atopile.netlist
+import atopile.parse
 import atopile.variable_report
 from atopile.cli.common import project_options
 from atopile.components import download_footprint
 from atopile.config import BuildContext
 from atopile.errors import ExceptionAccumulator
-from atopile.instance_methods import all_descendants, match_components
-from atopile.netlist import get_netlist_as_str
+from atopile.instance_methods import all_components
+from atopile.netlist import get_netlist_as_str, write_netlist
+from atopile.netlist_diff import NetlistSummary, diff_netlists
+from atopile.profiling import profiler
+from atopile.utils import open_if_changed
 
 log = logging.getLogger(__name__)
 
 
 @click.command()
 @project_options
-def build(build_ctxs: list[BuildContext]):
+@click.option(
+    "--no-parse-cache",
+    is_flag=True,
+    envvar="ATO_NO_PARSE_CACHE",
+    help="Re-parse every file, rather than using the cached parse trees.",
+)
+@click.option(
+    "--profile",
+    is_flag=True,
+    help="Time each phase of the build, and write a report to build/<name>.profile.json",
+)
+@click.option(
+    "--cprofile",
+    is_flag=True,
+    help="Like --profile, but also write cProfile stats to build/<name>.prof",
+)
+@click.option(
+    "--diff",
+    is_flag=True,
+    help="Report how the netlist differs from the one last built, rather than writing any outputs.",
+)
+def build(
+    build_ctxs: list[BuildContext],
+    no_parse_cache: bool,
+    profile: bool,
+    cprofile: bool,
+    diff: bool,
+):
     """
     Build the specified --target(s) or the targets specified by the build config.
     Specify the root source file with the argument SOURCE.
     eg. `ato build --target my_target path/to/source.ato:module.path`
     """
+    if not no_parse_cache:
+        atopile.parse.parser.enable_disk_cache(
+            atopile.config.get_project_context().cache_path / "parse"
+        )
+
+    # The first build's profile includes parsing all the files up front
+    profile = profile or cprofile
+    if profile:
+        profiler.start(use_cprofile=cprofile)
+
+    # Parse all the source files up front, so we can do it in parallel
+    with profiler.phase("parse"):
+        atopile.parse.parser.prefetch(
+            (atopile.address.get_file(build_ctx.entry) for build_ctx in build_ctxs),
+            atopile.front_end.scoop.get_search_paths(),
+        )
+
     with ExceptionAccumulator() as accumulator:
         for build_ctx in build_ctxs:
             log.info("Building %s", build_ctx.name)
+            if profile and not profiler.running:
+                profiler.start(use_cprofile=cprofile)
             with accumulator.collect():
-                _do_build(build_ctx)
+                try:
+                    if diff:
+                        _diff_netlist(build_ctx)
+                    else:
+                        _do_build(build_ctx)
+                finally:
+                    if profile:
+                        _write_profile(build_ctx)
+
+        # Write everything the builds added to the component cache at once
+        with accumulator.collect():
+            atopile.components.save_cache()
+
+        if diff:
+            return
 
         with accumulator.collect():
             project_context = atopile.config.get_project_context()
@@ -53,20 +119,60 @@ def build(build_ctxs: list[BuildContext]):
 
             manifest_path = project_context.project_path / "build" / "manifest.json"
             manifest_path.parent.mkdir(exist_ok=True, parents=True)
-            with open(manifest_path, "w", encoding="utf-8") as f:
+            with open_if_changed(manifest_path) as f:
                 json.dump(manifest, f)
 
+    if atopile.parse.parser.disk_cache is not None:
+        atopile.parse.parser.disk_cache.log_stats()
+    atopile.components.log_cache_stats()
+
     log.info("Build complete!")
 
 
+def _write_profile(build_ctx: BuildContext) -> None:
+    """Stop profiling, and report on the build."""
+    report = profiler.stop(build_ctx.name, build_ctx.output_base.with_suffix(".prof"))
+    report.print()
+    profile_path = build_ctx.output_base.with_suffix(".profile.json")
+    report.write(profile_path)
+    log.info("Wrote profile to %s", profile_path)
+
+
+def _diff_netlist(build_ctx: BuildContext) -> None:
+    """Report how a build's netlist differs from the one last written."""
+    do_prebuild(build_ctx)
+
+    netlist_path = build_ctx.output_base.with_suffix(".net")
+    if netlist_path.exists():
+        old = NetlistSummary.from_str(netlist_path.read_text(encoding="utf-8"))
+    else:
+        log.info("There's no netlist at %s to compare with", netlist_path)
+        old = NetlistSummary()
+
+    with profiler.phase("target:netlist"):
+        new = NetlistSummary.from_str(get_netlist_as_str(build_ctx.entry))
+
+    netlist_diff = diff_netlists(old, new)
+    if not netlist_diff:
+        log.info("The netlist for '%s' is unchanged", build_ctx.name)
+        return
+
+    log.info("Changes to the netlist for '%s':", build_ctx.name)
+    for line in netlist_diff.get_lines():
+        log.info("  %s", line)
+
+
 def do_prebuild(build_ctx: BuildContext) -> None:
     with ExceptionAccumulator() as accumulator:
         # Solve the unknown variables
         if not build_ctx.dont_solve_equations:
             with accumulator.collect():
-                atopile.assertions.simplify_expressions(build_ctx.entry)
-                atopile.assertions.solve_assertions(build_ctx)
-                atopile.assertions.simplify_expressions(build_ctx.entry)
+                with profiler.phase("simplify_expressions"):
+                    atopile.assertions.simplify_expressions(build_ctx.entry)
+                with profiler.phase("solve_assertions"):
+                    atopile.assertions.solve_assertions(build_ctx)
+                with profiler.phase("simplify_expressions"):
+                    atopile.assertions.simplify_expressions(build_ctx.entry)
 
 
 def _do_build(build_ctx: BuildContext) -> None:
@@ -98,7 +204,7 @@ def _do_build(build_ctx: BuildContext) -> None:
         built_targets = []
         for target_name in targets:
             log.info(f"Building '{target_name}' for '{build_ctx.name}' config")
-            with accumulator.collect():
+            with accumulator.collect(), profiler.phase(f"target:{target_name}"):
                 muster.targets[target_name](build_ctx)
             built_targets.append(target_name)
 
@@ -178,14 +284,14 @@ def consolidate_3dmodels(build_args: BuildContext) -> None:
 @muster.register("netlist")
 def generate_netlist(build_args: BuildContext) -> None:
     """Generate a netlist for the project."""
-    with open(build_args.output_base.with_suffix(".net"), "w", encoding="utf-8") as f:
-        f.write(get_netlist_as_str(build_args.entry))
+    with open_if_changed(build_args.output_base.with_suffix(".net")) as f:
+        write_netlist(build_args.entry, f)
 
 
 @muster.register("bom")
 def generate_bom(build_args: BuildContext) -> None:
     """Generate a BOM for the project."""
-    with open(build_args.output_base.with_suffix(".csv"), "w", encoding="utf-8") as f:
+    with open_if_changed(build_args.output_base.with_suffix(".csv")) as f:
         f.write(atopile.bom.generate_bom(build_args.entry))
 
 
@@ -210,9 +316,7 @@ def generate_drc_report(build_ctx: BuildContext) -> None:
 @muster.register("clone-footprints")
 def clone_footprints(build_args: BuildContext) -> None:
     """Clone the footprints for the project."""
-    all_components = filter(match_components, all_descendants(build_args.entry))
-
-    for component in all_components:
+    for component in all_components(build_args.entry):
         log.debug("Cloning footprint for %s", component)
         download_footprint(component, footprint_dir=build_args.build_path / "footprints/footprints.pretty")
 
@@ -0,0 +1,300 @@
+"""
+A persistent cache of the parts the components database resolved specs to.
+
+Parts are keyed by a hash of the spec they were resolved from, so components
+with identical specs share a part. Alongside is an index of which spec each
+component address last had.
+
+The cache is a SQLite database. Changes are held in memory and written in a
+single transaction by `flush`, typically once per batch of lookups and once
+at the end of a build - so a crash part way through can't corrupt it, and
+several `ato build`s can share one `.ato` directory at once.
+
+The same kind of cache is used per project and, optionally, machine-wide so
+that projects can reuse each other's parts. The machine-wide one is kept to
+a size by evicting the least recently used parts.
+"""
+
+import hashlib
+import json
+import logging
+import sqlite3
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterator, Optional
+
+log = logging.getLogger(__name__)
+
+
+# How long to wait on another process that's writing to the cache
+_BUSY_TIMEOUT = 30.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS parts (
+    spec_hash TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    spec TEXT NOT NULL,
+    timestamp REAL NOT NULL,
+    last_used REAL NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS addr_index (
+    addr TEXT PRIMARY KEY,
+    spec_hash TEXT NOT NULL
+);
+"""
+
+
+def get_spec_hash(spec: dict[str, Any]) -> str:
+    """Return a hash of a spec, which is the same for identical specs."""
+    canonical = json.dumps(spec, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _read_json_cache(path: Path) -> tuple[dict[str, dict], dict[str, str]]:
+    """
+    Read the parts and index from a JSON cache, as used before SQLite.
+
+    Handles both the address-keyed caches and the spec-keyed (version 2)
+    ones. Anything that can't be read is skipped.
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            old_cache = json.load(f)
+    except (OSError, json.JSONDecodeError) as ex:
+        log.warning("Failed to load component cache: %s", ex)
+        return {}, {}
+    if not isinstance(old_cache, dict):
+        return {}, {}
+
+    if old_cache.get("version") == 2:
+        return old_cache.get("parts", {}), old_cache.get("index", {})
+
+    parts, index = {}, {}
+    for addr, entry in old_cache.items():
+        try:
+            spec_hash = get_spec_hash(entry["address_data"])
+            parts[spec_hash] = {
+                "data": entry["data"],
+                "timestamp": entry["timestamp"],
+                "spec": entry["address_data"],
+            }
+        except (KeyError, TypeError):
+            continue
+        index[addr] = spec_hash
+    return parts, index
+
+
+class ComponentCache:
+    """
+    Parts resolved from the components database, persisted in SQLite.
+
+    A cache is only used from the thread that opened it, which sqlite3
+    enforces. Other threads, like those looking up parts in the database,
+    hand what they find back to it rather than caching it themselves.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Transactions are managed explicitly, rather than by sqlite3
+        self._connection = sqlite3.connect(
+            self.path, timeout=_BUSY_TIMEOUT, isolation_level=None
+        )
+        self._connection.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        self._connection.execute("PRAGMA journal_mode = WAL")
+        self._connection.executescript(_SCHEMA)
+        columns = {row[1] for row in self._connection.execute("PRAGMA table_info(parts)")}
+        if "last_used" not in columns:
+            self._connection.execute(
+                "ALTER TABLE parts ADD COLUMN last_used REAL NOT NULL DEFAULT 0"
+            )
+
+        # Changes not yet written
+        self._pending_parts: dict[str, dict[str, Any]] = {}
+        self._pending_index: dict[str, str] = {}
+        self._pending_uses: dict[str, float] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def import_json(self, json_path: Path) -> None:
+        """Take the contents of a JSON cache, and remove it."""
+        parts, index = _read_json_cache(json_path)
+        for spec_hash, entry in parts.items():
+            self._pending_parts.setdefault(spec_hash, entry)
+        for addr, spec_hash in index.items():
+            self._pending_index.setdefault(addr, spec_hash)
+        self.flush()
+        json_path.unlink(missing_ok=True)
+        log.debug("Moved %d parts from %s to %s", len(parts), json_path, self.path)
+
+    def get_part(self, spec_hash: str, max_age: float) -> Optional[dict[str, Any]]:
+        """Return the part for a spec, if it's cached and no older than max_age seconds."""
+        entry = self.get_entry(spec_hash)
+        if entry is None or time.time() - entry["timestamp"] > max_age:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._pending_uses[spec_hash] = time.time()
+        return entry["data"]
+
+    def get_entry(self, spec_hash: str) -> Optional[dict[str, Any]]:
+        """Return the cached part for a spec, and when it was resolved, however old."""
+        entry = self._pending_parts.get(spec_hash)
+        if entry is None:
+            row = self._connection.execute(
+                "SELECT data, timestamp FROM parts WHERE spec_hash = ?", (spec_hash,)
+            ).fetchone()
+            if row is None:
+                return None
+            entry = {"data": json.loads(row[0]), "timestamp": row[1]}
+        return entry
+
+    def get_spec_hash(self, addr: str) -> Optional[str]:
+        """Return the hash of the spec a component last had."""
+        if addr in self._pending_index:
+            return self._pending_index[addr]
+        row = self._connection.execute(
+            "SELECT spec_hash FROM addr_index WHERE addr = ?", (addr,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def put_part(
+        self,
+        spec_hash: str,
+        data: dict[str, Any],
+        spec: dict[str, Any],
+        timestamp: Optional[float] = None,
+    ) -> None:
+        """
+        Cache the part a spec resolved to, to be written by the next flush.
+
+        timestamp is when the part was resolved, if it wasn't just now.
+        """
+        self._pending_parts[spec_hash] = {
+            "data": data,
+            "timestamp": time.time() if timestamp is None else timestamp,
+            "spec": dict(spec),
+        }
+
+    def put_index(self, addr: str, spec_hash: str) -> None:
+        """Note which spec a component has, to be written by the next flush."""
+        self._pending_index[addr] = spec_hash
+
+    def count_parts(self) -> int:
+        """Return the number of parts that have been written."""
+        return self._connection.execute("SELECT COUNT(*) FROM parts").fetchone()[0]
+
+    def get_index(self) -> dict[str, str]:
+        """Return the whole index, including what's not been written yet."""
+        index = dict(self._connection.execute("SELECT addr, spec_hash FROM addr_index"))
+        index.update(self._pending_index)
+        return index
+
+    def flush(self) -> None:
+        """Write everything that's changed, atomically."""
+        if not self._pending_parts and not self._pending_index and not self._pending_uses:
+            return
+
+        now = time.time()
+        with self._transaction():
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO parts VALUES (?, ?, ?, ?, ?)",
+                (
+                    (
+                        spec_hash,
+                        json.dumps(entry["data"]),
+                        json.dumps(entry["spec"]),
+                        entry["timestamp"],
+                        now,
+                    )
+                    for spec_hash, entry in self._pending_parts.items()
+                ),
+            )
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO addr_index VALUES (?, ?)",
+                self._pending_index.items(),
+            )
+            self._connection.executemany(
+                "UPDATE parts SET last_used = MAX(last_used, ?) WHERE spec_hash = ?",
+                ((last_used, spec_hash) for spec_hash, last_used in self._pending_uses.items()),
+            )
+        self._pending_parts.clear()
+        self._pending_index.clear()
+        self._pending_uses.clear()
+
+    def clean(self, max_age: float) -> None:
+        """
+        Remove parts older than max_age seconds, and compact the cache.
+
+        Nothing's written unless there's something to remove.
+        """
+        cutoff = time.time() - max_age
+        stale = self._connection.execute(
+            "SELECT COUNT(*) FROM parts WHERE timestamp < ?", (cutoff,)
+        ).fetchone()[0]
+        if not stale:
+            return
+
+        with self._transaction():
+            self._connection.execute("DELETE FROM parts WHERE timestamp < ?", (cutoff,))
+            self._connection.execute(
+                "DELETE FROM addr_index WHERE spec_hash NOT IN (SELECT spec_hash FROM parts)"
+            )
+        self.expirations += stale
+        # Give the space the stale parts took back to the filesystem
+        self._connection.execute("PRAGMA incremental_vacuum")
+        log.debug("Removed %d stale parts from %s", stale, self.path)
+
+    def evict(self, max_parts: int) -> None:
+        """Remove the least recently used parts, until there are no more than max_parts."""
+        if self.count_parts() <= max_parts:
+            return
+
+        with self._transaction():
+            # another build may have got here first
+            excess = max(0, self.count_parts() - max_parts)
+            evicted = self._connection.execute(
+                "DELETE FROM parts WHERE spec_hash IN"
+                " (SELECT spec_hash FROM parts ORDER BY last_used, timestamp LIMIT ?)",
+                (excess,),
+            ).rowcount
+            self._connection.execute(
+                "DELETE FROM addr_index WHERE spec_hash NOT IN (SELECT spec_hash FROM parts)"
+            )
+        self.evictions += evicted
+        self._connection.execute("PRAGMA incremental_vacuum")
+        log.debug("Evicted %d parts from %s", evicted, self.path)
+
+    def log_stats(self, name: str) -> None:
+        """Log how effective the cache has been."""
+        log.info(
+            "%s: %d hits, %d misses, %d evictions, %d expired",
+            name,
+            self.hits,
+            self.misses,
+            self.evictions,
+            self.expirations,
+        )
+
+    @contextmanager
+    def _transaction(self) -> Iterator[None]:
+        """
+        Write within a transaction.
+
+        The write lock's taken up front, so concurrent builds queue up for it
+        rather than failing part way through.
+        """
+        self._connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._connection.execute("ROLLBACK")
+            raise
+        self._connection.execute("COMMIT")
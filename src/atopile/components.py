@@ -1,10 +1,10 @@
 import json
 import logging
-import time
-from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
 from functools import cache
 from pathlib import Path
-from typing import Any, Optional
+from typing import Any, Iterable, Optional
 
 import requests
 from urllib3.util.retry import Retry
@@ -13,7 +13,9 @@ from requests.adapters import HTTPAdapter
 
 from atopile import address, config, errors, expressions, instance_methods
 from atopile.address import AddrStr
+from atopile.component_cache import ComponentCache, get_spec_hash
 from atopile.front_end import RangedValue
+from atopile.profiling import LatencyHistogram, profiler
 
 log = logging.getLogger(__name__)
 
@@ -59,8 +61,19 @@ class NoMatchingComponent(errors.AtoError):
     title = "No component matches parameters"
 
 
-_component_cache: Optional[dict[str, Any]] = None
-def get_component_cache() -> dict[str, Any]:
+# Where parts are shared between projects, if they're configured to
+SHARED_CACHE_DIR = Path("~/.atopile/cache/components")
+
+
+def _get_cache_ttl() -> float:
+    """Return how long a resolved part is reused for, in seconds."""
+    ttl_days = config.get_project_context().config.services.components_cache_ttl_days
+    return timedelta(days=ttl_days).total_seconds()
+
+
+_component_cache: Optional[ComponentCache] = None
+_shared_component_cache: Optional[ComponentCache] = None
+def get_component_cache() -> ComponentCache:
     """Return the component cache."""
     global _component_cache
     if _component_cache is None:
@@ -68,81 +81,113 @@ def get_component_cache() -> dict[str, Any]:
     return _component_cache
 
 
+def get_shared_component_cache() -> Optional[ComponentCache]:
+    """Return the machine-wide component cache, if the project uses it."""
+    get_component_cache()
+    return _shared_component_cache
+
+
 def configure_cache():
     """Configure the cache to be used by the component module."""
-    global _component_cache
-    cache_file_path = config.get_project_context().project_path / ".ato/component_cache.json"
-    if cache_file_path.exists():
-        with open(cache_file_path, "r") as cache_file:
-            try:
-                _component_cache = json.load(cache_file)
-            except json.JSONDecodeError as ex:
-                # protect against corrupt cache files
-                log.warning("Failed to load component cache: %s", ex)
-                _component_cache = {}
-        # Clean out stale entries
-        clean_cache()
+    global _component_cache, _shared_component_cache
+    ato_dir = config.get_project_context().project_path / ".ato"
+    _component_cache = ComponentCache(ato_dir / "component_cache.sqlite")
+
+    # Bring across the cache from before it was kept in SQLite
+    json_cache_path = ato_dir / "component_cache.json"
+    if json_cache_path.exists():
+        _component_cache.import_json(json_cache_path)
+
+    if config.get_project_context().config.services.components_shared_cache:
+        _shared_component_cache = ComponentCache(
+            SHARED_CACHE_DIR.expanduser() / "component_cache.sqlite"
+        )
     else:
-        _component_cache = {}
+        _shared_component_cache = None
+
+    # Clean out stale entries
+    clean_cache()
+
+    # Parts resolved before may have gone stale since
+    _resolved_specs.clear()
 
 def save_cache():
-    """Saves the current state of the cache to a file."""
-    cache_file_path = config.get_project_context().project_path / ".ato/component_cache.json"
-    cache_file_path.parent.mkdir(parents=True, exist_ok=True)
-    with open(cache_file_path, "w") as cache_file:
-        # Convert the ChainMap to a regular dictionary
-        serializable_cache = dict(get_component_cache())
-        json.dump(serializable_cache, cache_file)
-
-
-def get_component_from_cache(component_addr: AddrStr, current_data: dict) -> Optional[dict]:
-    """Retrieve a component from the cache, if available, not stale, and unchanged."""
-    # Check the cache age
-    cached_entry = get_component_cache().get(component_addr)
-    if not cached_entry:
-        return None
-
-    cached_timestamp = datetime.fromtimestamp(cached_entry["timestamp"])
-    cache_age = datetime.now() - cached_timestamp
-    if cache_age > timedelta(days=14):
-        return None
-
-    # Check the component attrs
-    if current_data != cached_entry["address_data"]:
-        return None
-
-    log.debug("Using cached component for %s", component_addr)
-    return cached_entry["data"]
-
-
-def update_cache(component_addr, component_data, address_data):
-    """Update the cache with new component data and save it."""
-    get_component_cache()[component_addr] = {
-        "data": component_data,
-        "timestamp": time.time(),  # Current time as a timestamp
-        "address_data": dict(address_data),  # Source attributes used to detect changes
-    }
-    save_cache()
+    """Write everything that's been cached since it was last saved."""
+    if _component_cache is not None:
+        _component_cache.flush()
+    if _shared_component_cache is not None:
+        _shared_component_cache.flush()
+        _shared_component_cache.evict(
+            config.get_project_context().config.services.components_shared_cache_max_parts
+        )
 
 
-def clean_cache():
-    """Clean out entries older than 1 day."""
-    addrs_to_delete = set()
+def log_cache_stats():
+    """Log how effective the component caches have been."""
+    if _component_cache is not None:
+        _component_cache.log_stats("Component cache")
+    if _shared_component_cache is not None:
+        _shared_component_cache.log_stats("Shared component cache")
+
+
+def get_component_from_cache(spec: dict[str, Any]) -> Optional[dict]:
+    """
+    Retrieve the part for a spec from the cache, if available and not stale.
+
+    Parts found in the shared cache are copied into the project's.
+    """
+    spec_hash = get_spec_hash(spec)
+    ttl = _get_cache_ttl()
+    part = get_component_cache().get_part(spec_hash, ttl)
+    if part is not None or _shared_component_cache is None:
+        return part
+
+    part = _shared_component_cache.get_part(spec_hash, ttl)
+    if part is not None:
+        timestamp = _shared_component_cache.get_entry(spec_hash)["timestamp"]
+        get_component_cache().put_part(spec_hash, part, spec, timestamp)
+    return part
+
+
+def get_cached_spec_hash(component_addr: AddrStr) -> Optional[str]:
+    """Return the hash of the spec a component last had, if it's in the cache."""
+    return get_component_cache().get_spec_hash(component_addr)
+
+
+def update_cache(component_addr, component_data, spec):
+    """Update the cache with new component data, to be written when it's next saved."""
     component_cache = get_component_cache()
-    for addr, entry in component_cache.items():
-        cached_timestamp = datetime.fromtimestamp(entry["timestamp"])
-        if datetime.now() - cached_timestamp >= timedelta(days=1):
-            addrs_to_delete.add(addr)
+    spec_hash = get_spec_hash(spec)
+    component_cache.put_part(spec_hash, component_data, spec)
+    component_cache.put_index(component_addr, spec_hash)
+    if _shared_component_cache is not None:
+        _shared_component_cache.put_part(spec_hash, component_data, spec)
 
-    for addr in addrs_to_delete:
-        del component_cache[addr]
 
-    save_cache()
+def index_cache(component_addr: AddrStr, spec_hash: str) -> None:
+    """Note which spec a component has, to be written when the cache's next saved."""
+    get_component_cache().put_index(component_addr, spec_hash)
+
+
+def clean_cache():
+    """
+    Clean out entries older than the project's services.components_cache_ttl_days.
+
+    Only the project's cache is cleaned. Other projects may keep parts for
+    longer, so the shared cache's stale parts are only skipped when read,
+    and it's kept to size by evicting parts instead.
+    """
+    get_component_cache().clean(_get_cache_ttl())
 
 
 _db_session = None
 def get_db_session():
-    """Return the database session."""
+    """
+    Return the database session.
+
+    The session's shared between threads, keeping a connection alive for
+    each request that can be made at once.
+    """
     global _db_session
     if _db_session is not None:
         return _db_session
@@ -154,7 +199,12 @@ def get_db_session():
         allowed_methods=["HEAD", "GET", "OPTIONS"],
     )
 
-    adapter = HTTPAdapter(max_retries=retry_strategy)
+    max_concurrency = config.get_project_context().config.services.components_max_concurrency
+    adapter = HTTPAdapter(
+        max_retries=retry_strategy,
+        pool_connections=max_concurrency,
+        pool_maxsize=max_concurrency,
+    )
 
     _db_session = requests.Session()
     _db_session.mount("https://", adapter)
@@ -171,13 +221,10 @@ def get_db_session():
 
 
 @cache
-def _get_generic_from_db(component_addr: str) -> dict[str, Any]:
+def _get_spec(component_addr: AddrStr) -> dict[str, Any]:
     """
-    Return the MPN for a component given its address
+    Return the spec to look a generic component up in the database with
     """
-    global _db_session
-    log.debug("Fetching component for %s", component_addr)
-
     specd_data = instance_methods.get_data_dict(component_addr)
 
     specd_data_dict = {
@@ -211,21 +258,27 @@ def _get_generic_from_db(component_addr: str) -> dict[str, Any]:
             specd_data_dict["package"] = specd_data_dict["footprint"][1:]
             del specd_data_dict["footprint"]
 
+    return specd_data_dict
 
-    cached_component = get_component_from_cache(component_addr, specd_data_dict)
-    if cached_component:
-        log.debug("Using cache for %s", component_addr)
-        return cached_component
 
+# How long each request to the components database took
+db_latency = LatencyHistogram()
+
+
+def _fetch_from_db(spec: dict[str, Any], component_addr: AddrStr) -> dict[str, Any]:
+    """
+    Return the best component in the database matching a spec
+    """
     url = config.get_project_context().config.services.components
     headers = {"accept": "application/json", "Content-Type": "application/json"}
     try:
         db_sessions = get_db_session()
-        response = db_sessions.post(url, json=specd_data_dict, timeout=20, headers=headers)
+        with profiler.phase("component-db"), db_latency.time():
+            response = db_sessions.post(url, json=spec, timeout=20, headers=headers)
         response.raise_for_status()
     except requests.HTTPError as ex:
         if ex.response.status_code == 404:
-            friendly_dict = " && ".join(f"{k} == {v}" for k, v in specd_data_dict.items())
+            friendly_dict = " && ".join(f"{k} == {v}" for k, v in spec.items())
             raise NoMatchingComponent(
                 f"No valid component found for spec {friendly_dict}: please check the part specs above, if they look right, we probably dont have it yet, we are working on it!",
                 addr=component_addr
@@ -255,6 +308,91 @@ def _get_generic_from_db(component_addr: str) -> dict[str, Any]:
     if not best_component:
         raise NoMatchingComponent("No valid component found", addr=component_addr)
 
+    return best_component
+
+
+def fetch_from_db(
+    specs: dict[str, tuple[dict[str, Any], AddrStr]], max_workers: Optional[int] = None
+) -> dict[str, dict[str, Any] | errors.AtoError]:
+    """
+    Look up a batch of specs in the database, concurrently.
+
+    specs maps each spec's hash to the spec and an address to blame for it.
+    Returns a map of the same keys to the best component for each spec, or
+    the error looking it up raised. At most max_workers requests are made
+    at once, by default the project's services.components_max_concurrency.
+    """
+    if max_workers is None:
+        max_workers = config.get_project_context().config.services.components_max_concurrency
+
+    # Runs in the workers, so mustn't touch the component caches, which can
+    # only be used from this thread - the results are cached by the caller
+    def _fetch(key: str) -> dict[str, Any] | errors.AtoError:
+        spec, component_addr = specs[key]
+        try:
+            return _fetch_from_db(spec, component_addr)
+        except errors.AtoError as ex:
+            return ex
+
+    if len(specs) <= 1:
+        return {key: _fetch(key) for key in specs}
+
+    # open a session here, rather than racing to in the threads
+    get_db_session()
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        return dict(zip(specs, pool.map(_fetch, specs)))
+
+
+# Parts already found for specs, from the cache or the database, by the
+# spec's hash, for _get_generic_from_db to hand out to each address with that
+# spec. Specs without a matching component are kept too, but not those that
+# failed to be looked up, so that they're tried again.
+_resolved_specs: dict[str, dict[str, Any] | NoMatchingComponent] = {}
+
+
+def _remember_resolved(spec_hash: str, result: dict[str, Any] | errors.AtoError) -> None:
+    """Keep the result of looking up a spec, unless it's worth trying again."""
+    if isinstance(result, NoMatchingComponent) or not isinstance(result, errors.AtoError):
+        _resolved_specs[spec_hash] = result
+
+
+def _resolve_from_cache(spec: dict[str, Any], spec_hash: str) -> bool:
+    """Return whether a spec's resolved, checking the cache if it's not yet."""
+    if spec_hash not in _resolved_specs:
+        cached_component = get_component_from_cache(spec)
+        if cached_component is not None:
+            _resolved_specs[spec_hash] = cached_component
+    return spec_hash in _resolved_specs
+
+
+@cache
+def _get_generic_from_db(component_addr: str) -> dict[str, Any]:
+    """
+    Return the MPN for a component given its address
+    """
+    log.debug("Fetching component for %s", component_addr)
+
+    specd_data_dict = _get_spec(component_addr)
+    spec_hash = get_spec_hash(specd_data_dict)
+
+    if _resolve_from_cache(specd_data_dict, spec_hash):
+        best_component = _resolved_specs[spec_hash]
+        if isinstance(best_component, errors.AtoError):
+            # the same error, but about this component
+            raise type(best_component)(
+                best_component.message, title=best_component.title, addr=component_addr
+            ) from best_component
+        log.debug("Using cache for %s", component_addr)
+        index_cache(component_addr, spec_hash)
+        return best_component
+
+    try:
+        best_component = _fetch_from_db(specd_data_dict, component_addr)
+    except errors.AtoError as ex:
+        _remember_resolved(spec_hash, ex)
+        raise
+    _remember_resolved(spec_hash, best_component)
+
     lcsc = best_component["lcsc_id"]
     log.info("Fetched component %s for %s", lcsc, component_addr)
 
@@ -264,6 +402,62 @@ def _get_generic_from_db(component_addr: str) -> dict[str, Any]:
     return best_component
 
 
+def prefetch_generics(
+    addrs: Iterable[AddrStr], max_workers: Optional[int] = None
+) -> None:
+    """
+    Look up all the generic components among addrs in the database at once.
+
+    Components with identical specs are only looked up once, and those
+    already in the component cache aren't looked up at all. The rest are
+    looked up in one batch, so that looking up the components' footprints,
+    MPNs, values etc. afterwards doesn't block on the database one component
+    at a time. Any errors are left to be raised by those lookups.
+    """
+    to_fetch: list[tuple[AddrStr, str]] = []
+    specs: dict[str, tuple[dict[str, Any], AddrStr]] = {}
+    for addr in addrs:
+        if not _is_generic(addr):
+            continue
+        try:
+            spec = _get_spec(addr)
+        except errors.AtoError:
+            continue
+        spec_hash = get_spec_hash(spec)
+        if _resolve_from_cache(spec, spec_hash):
+            if (
+                not isinstance(_resolved_specs[spec_hash], errors.AtoError)
+                and get_cached_spec_hash(addr) != spec_hash
+            ):
+                index_cache(addr, spec_hash)
+            continue
+        to_fetch.append((addr, spec_hash))
+        specs.setdefault(spec_hash, (spec, addr))
+
+    if specs:
+        log.info(
+            "Fetching %d components from the database for %d specs",
+            len(to_fetch),
+            len(specs),
+        )
+        with profiler.phase("component-db"):
+            for spec_hash, result in fetch_from_db(specs, max_workers).items():
+                _remember_resolved(spec_hash, result)
+        log.info("Component database latency: %s", db_latency.get_summary())
+
+    # cache each part once, point every component with its spec at it,
+    # and write it all at once
+    for spec_hash, (spec, addr) in specs.items():
+        best_component = _resolved_specs.get(spec_hash)
+        if isinstance(best_component, dict):
+            log.debug("Fetched component %s for %s", best_component["lcsc_id"], addr)
+            update_cache(addr, best_component, spec)
+    for addr, spec_hash in to_fetch:
+        if isinstance(_resolved_specs.get(spec_hash), dict):
+            index_cache(addr, spec_hash)
+    save_cache()
+
+
 class MissingData(errors.AtoError):
     """
     Raised when a component is missing data in the Basic_Parts.csv file.
@@ -434,9 +628,9 @@ class DesignatorManager:
 
         # FIXME: add lock-file data
         # first pass: grab all the designators from the lock data
-        for err_handler, component in errors.iter_through_errors(filter(
-            instance_methods.match_components, instance_methods.all_descendants(root)
-        )):
+        for err_handler, component in errors.iter_through_errors(
+            instance_methods.all_components(root)
+        ):
             with err_handler():
                 try:
                     designator = instance_methods.get_data(component, "designator")
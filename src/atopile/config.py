@@ -24,6 +24,7 @@ yaml = YAML()
 CONFIG_FILENAME = "ato.yaml"
 ATO_DIR_NAME = ".ato"
 MODULE_DIR_NAME = "modules"
+CACHE_DIR_NAME = "cache"
 BUILD_DIR_NAME = "build"
 LOCK_FILE_NAME = "ato-lock.yaml"
 
@@ -60,6 +61,11 @@ class ProjectServicesConfig:
     """A config for services used by the project."""
 
     components: str = "https://components.atopileapi.com/legacy/jlc"
+    components_max_concurrency: int = 8  # requests to the components service at once
+    components_cache_ttl_days: float = 1.0  # how long a resolved part is reused for
+    # share resolved parts with other projects, in ~/.atopile/cache/components
+    components_shared_cache: bool = False
+    components_shared_cache_max_parts: int = 50_000  # beyond which the least recently used go
 
 
 @define
@@ -239,6 +245,7 @@ class ProjectContext:
     project_path: Path  # abs path to the project directory
     src_path: Path  # abs path to the source directory
     module_path: Path  # abs path to the module directory
+    cache_path: Path  # abs path to the cache directory
     layout_path: Path  # eg. path/to/project/layouts/default/default.kicad_pcb
     lock_file_path: Path  # eg. path/to/project/ato-lock.yaml
     config: ProjectConfig
@@ -251,6 +258,7 @@ class ProjectContext:
             project_path=Path(config.location),
             src_path=Path(config.location) / config.paths.src,
             module_path=Path(config.location) / ATO_DIR_NAME / MODULE_DIR_NAME,
+            cache_path=Path(config.location) / ATO_DIR_NAME / CACHE_DIR_NAME,
             layout_path=Path(config.location) / config.paths.layout,
             lock_file_path=Path(config.location) / LOCK_FILE_NAME,
             config=config,
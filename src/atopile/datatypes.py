@@ -166,6 +166,8 @@ class DotDict(dict):
 
 class IDdSet(collections.abc.MutableSet, Generic[T]):
     """A set that determines uniquenss by an ID function."""
+    __slots__ = ("id_func", "__data__")
+
     def __init__(self, __data__: Iterable[T] | None = None, id_func: Callable[[T], Hashable] = id) -> None:
         self.id_func = id_func
         self.__data__ = {self.id_func(x): x for x in (__data__ or [])}
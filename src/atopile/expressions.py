@@ -518,6 +518,69 @@ class Expression:
         return Expression(symbols=new_symbols, lambda_=_new_lambda)
 
 
+def _reroot_key(key: str, old_root: str, new_root: str) -> str:
+    """Move a key from under old_root to under new_root, if it's there."""
+    if key.startswith(old_root) and key[len(old_root) : len(old_root) + 1] in ("", "."):
+        return new_root + key[len(old_root) :]
+    return key
+
+
+class _RerootedContext(collections.abc.Mapping):
+    """
+    A view of a context as seen by an expression written in terms of inner_root,
+    where the context itself holds values in terms of outer_root.
+    """
+
+    def __init__(self, context: Mapping, outer_root: str, inner_root: str) -> None:
+        self.context = context
+        self.outer_root = outer_root
+        self.inner_root = inner_root
+
+    def __getitem__(self, key: str) -> NumericishTypes:
+        return self.context[_reroot_key(key, self.inner_root, self.outer_root)]
+
+    def __iter__(self):
+        for key in self.context:
+            yield _reroot_key(key, self.outer_root, self.inner_root)
+
+    def __len__(self) -> int:
+        return len(self.context)
+
+
+def reroot(
+    thing: NumericishTypes, old_root: str, new_root: str, memo: Optional[dict] = None
+) -> NumericishTypes:
+    """
+    Return a copy of thing, with the symbols under the old_root
+    address moved to be under new_root.
+
+    Things without symbols are returned as they are. Pass the same memo
+    to many calls to keep expressions that were shared, shared.
+    """
+    if memo is not None and id(thing) in memo:
+        return memo[id(thing)]
+
+    if isinstance(thing, Symbol):
+        new_thing = Symbol(_reroot_key(thing.key, old_root, new_root))
+    elif isinstance(thing, Expression):
+        old_lambda = thing.lambda_
+
+        def _rerooted_lambda(context):
+            return old_lambda(_RerootedContext(context, new_root, old_root))
+
+        new_thing = Expression(
+            symbols={reroot(s, old_root, new_root) for s in thing.symbols},
+            lambda_=_rerooted_lambda,
+            src_ctx=thing.src_ctx,
+        )
+    else:
+        return thing
+
+    if memo is not None:
+        memo[id(thing)] = new_thing
+    return new_thing
+
+
 def _get_symbols(thing: NumericishTypes) -> set[Symbol]:
     if isinstance(thing, Expression):
         return thing.symbols
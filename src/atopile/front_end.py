@@ -5,27 +5,33 @@ In building this datamodel, we check for name collisions, but we don't resolve t
 """
 
 import enum
+import inspect
 import logging
 import operator
+import weakref
+from bisect import bisect_left
 from collections import defaultdict, deque
 from contextlib import ExitStack, contextmanager
 from itertools import chain
 from pathlib import Path
-from typing import Any, Callable, Iterable, Mapping, Optional
+from types import MappingProxyType
+from typing import Any, Callable, Iterable, Mapping, Optional, Sequence
 
 import pint
 from antlr4 import ParserRuleContext
-from attrs import define, field, resolve_types
+from attrs import define, evolve, field, resolve_types
 
 from atopile import address, config, errors, expressions, parse_utils
 from atopile.address import AddrStr
 from atopile.datatypes import IDdSet, KeyOptItem, KeyOptMap, Ref, StackList
 from atopile.expressions import RangedValue
 from atopile.generic_methods import recurse
-from atopile.parse import parser
+from atopile.parse import find_import, parser, read_src_file
+from atopile.parse_incremental import Splice, reparse_incrementally
 from atopile.parse_utils import get_src_info_from_ctx
 from atopile.parser.AtopileParser import AtopileParser as ap
 from atopile.parser.AtopileParserVisitor import AtopileParserVisitor
+from atopile.profiling import profiler
 
 
 @define
@@ -79,6 +85,8 @@ class ClassDef(Base):
 
 
 class Assertion:
+    __slots__ = ("lhs", "operator", "rhs", "src_ctx")
+
     def __init__(
         self,
         lhs: expressions.Expression,
@@ -158,6 +166,34 @@ class SetCumulativeAssignment(Assignment):
     value_is_derived: bool = True
 
 
+class Kind(enum.IntFlag):
+    """The built-in classes a class or instance is derived from."""
+
+    NONE = 0
+    MODULE = enum.auto()
+    COMPONENT = enum.auto()
+    PIN = enum.auto()
+    SIGNAL = enum.auto()
+    INTERFACE = enum.auto()
+
+
+_KINDS_BY_BUILTIN_ADDR: dict[str, Kind] = {
+    "<Built-in>:Module": Kind.MODULE,
+    "<Built-in>:Component": Kind.COMPONENT,
+    "<Built-in>:Pin": Kind.PIN,
+    "<Built-in>:Signal": Kind.SIGNAL,
+    "<Built-in>:Interface": Kind.INTERFACE,
+}
+
+
+def _iter_flags(kind: int) -> Iterable[int]:
+    """Yield each of the single flags set in a Kind."""
+    while kind:
+        flag = kind & -kind
+        yield flag
+        kind ^= flag
+
+
 @define(repr=False)
 class ClassLayer(Base):
     """
@@ -173,6 +209,16 @@ class ClassLayer(Base):
     # None indicates that this is a root object
     super: Optional["ClassLayer"]
 
+    # the Kind flags of all the built-ins this layer is derived from
+    # kept as a plain int, because it's much faster to test than a Kind
+    kind: int = field(init=False)
+
+    def __attrs_post_init__(self) -> None:
+        kind = _KINDS_BY_BUILTIN_ADDR.get(self.obj_def.address, Kind.NONE)
+        if self.super is not None:
+            kind |= self.super.kind
+        self.kind = int(kind)
+
     @property
     def address(self) -> AddrStr:
         return self.obj_def.address
@@ -206,6 +252,10 @@ class Link(Base):
         return f"<Link {repr(self.source)} -> {repr(self.target)}>"
 
 
+# Shared by all the instances without children
+_NO_CHILDREN: Mapping[str, "Instance"] = MappingProxyType({})
+
+
 @define
 class Instance(Base):
     """
@@ -221,19 +271,50 @@ class Instance(Base):
 
     # TODO: flip this around to a list, rather than deque
     assignments: Mapping[str, deque[Assignment]]
-    # Tracks which other instances this instance has it's assignments merged with from connections
     parent: Optional["Instance"]
 
     # created as supers' ASTs are walked
-    assertions: list[Assertion] = field(factory=list)
-    children: dict[str, "Instance"] = field(factory=dict)
-    links: list[Link] = field(factory=list)
+    # most instances (eg. pins and signals) never have any of these, so they
+    # all start out sharing the same empty containers, and get their own as
+    # they're added to with add_assertions, add_child and add_link
+    assertions: Sequence[Assertion] = ()
+    children: Mapping[str, "Instance"] = _NO_CHILDREN
+    links: Sequence[Link] = ()
 
-    # Populated by itself
-    assignments_merged_with: IDdSet["Instance"] = field(factory=IDdSet)
+    # the Kind flags of the instance's class, copied here to save a lookup
+    kind: int = 0
 
-    def __attrs_post_init__(self) -> None:
-        self.assignments_merged_with.add(self)
+    # Tracks which other instances this instance has it's assignments merged with from connections
+    # None until it's first needed, meaning it's merged with only itself
+    _assignments_merged_with: Optional[IDdSet["Instance"]] = field(default=None, init=False)
+
+    @property
+    def assignments_merged_with(self) -> IDdSet["Instance"]:
+        if self._assignments_merged_with is None:
+            self._assignments_merged_with = IDdSet((self,))
+        return self._assignments_merged_with
+
+    @assignments_merged_with.setter
+    def assignments_merged_with(self, value: IDdSet["Instance"]) -> None:
+        self._assignments_merged_with = value
+
+    def add_assertions(self, assertions: Iterable[Assertion]) -> None:
+        """Add assertions to this instance."""
+        if not isinstance(self.assertions, list):
+            self.assertions = list(self.assertions)
+        self.assertions.extend(assertions)
+
+    def add_child(self, name: str, child: "Instance") -> None:
+        """Add a child instance to this instance."""
+        if self.children is _NO_CHILDREN:
+            self.children = {}
+        self.children[name] = child
+
+    def add_link(self, link: Link) -> None:
+        """Add a link to this instance."""
+        if not isinstance(self.links, list):
+            self.links = list(self.links)
+        self.links.append(link)
 
     def __repr__(self) -> str:
         return f"<Instance {self.addr}>"
@@ -257,6 +338,7 @@ class Instance(Base):
             supers=supers,
             assignments=assignments,
             parent=parent,
+            kind=super_.kind,
         )
 
 
@@ -264,6 +346,283 @@ resolve_types(Instance)
 resolve_types(Link)
 
 
+def _iter_instance_tree(root: Instance) -> Iterable[Instance]:
+    """Yield all the instances in a tree, parents before their children."""
+    stack = [root]
+    while stack:
+        instance = stack.pop()
+        yield instance
+        stack.extend(reversed(instance.children.values()))
+
+
+def iter_instance_tree_postorder(root: Instance) -> Iterable[Instance]:
+    """Yield all the instances in a tree, children before their parents."""
+    stack = [(root, iter(root.children.values()))]
+    while stack:
+        instance, children = stack[-1]
+        for child in children:
+            stack.append((child, iter(child.children.values())))
+            break
+        else:
+            stack.pop()
+            yield instance
+
+
+@define
+class DescendantIndex:
+    """
+    An index of all the instances in a root instance's tree.
+
+    Everything under an instance is a contiguous run of both the preorder
+    and postorder lists, so the descendants of any instance are a slice of
+    them, rather than a walk of the tree. The postorder is the same as
+    all_descendants'.
+    """
+
+    preorder: list[AddrStr]
+    postorder: list[AddrStr]
+
+    # the tables below are indexed by preorder position
+    _postorder_positions: list[int]
+    _sizes: list[int]
+    _depths: list[int]
+    _kinds: list[int]
+    # -1 for the root
+    _parents: list[int]
+    # the closest module above each instance, or -1 if there isn't one
+    _parent_modules: list[int]
+
+    _preorder_positions: dict[AddrStr, int]
+    # for each Kind flag, the sorted postorder positions of the instances with it
+    _by_kind: dict[int, list[int]]
+
+    @classmethod
+    def from_root(cls, root: Instance) -> "DescendantIndex":
+        """Index a tree, in a single pass over it."""
+        module_flag = int(Kind.MODULE)
+        preorder: list[AddrStr] = []
+        depths: list[int] = []
+        kinds: list[int] = []
+        parents: list[int] = []
+        parent_modules: list[int] = []
+
+        stack: list[tuple[Instance, int]] = [(root, -1)]
+        while stack:
+            instance, parent = stack.pop()
+            position = len(preorder)
+            preorder.append(instance.addr)
+            kinds.append(instance.kind)
+            parents.append(parent)
+            if parent < 0:
+                depths.append(0)
+                parent_modules.append(-1)
+            else:
+                depths.append(depths[parent] + 1)
+                if kinds[parent] & module_flag:
+                    parent_modules.append(parent)
+                else:
+                    parent_modules.append(parent_modules[parent])
+            if instance.children:
+                stack.extend((child, position) for child in reversed(instance.children.values()))
+
+        # Everything after an instance in preorder, up until the end of its
+        # subtree, is its descendants
+        sizes = [1] * len(preorder)
+        for position in range(len(preorder) - 1, 0, -1):
+            sizes[parents[position]] += sizes[position]
+
+        # In postorder, an instance comes after everything before it in
+        # preorder bar its ancestors, and after all its descendants
+        postorder_positions = [
+            position - depth + size - 1
+            for position, depth, size in zip(range(len(preorder)), depths, sizes)
+        ]
+        preorder_by_postorder = [0] * len(preorder)
+        for position, postorder_position in enumerate(postorder_positions):
+            preorder_by_postorder[postorder_position] = position
+        postorder = [preorder[position] for position in preorder_by_postorder]
+
+        by_kind: dict[int, list[int]] = defaultdict(list)
+        for postorder_position, position in enumerate(preorder_by_postorder):
+            for flag in _iter_flags(kinds[position]):
+                by_kind[flag].append(postorder_position)
+
+        return cls(
+            preorder=preorder,
+            postorder=postorder,
+            postorder_positions=postorder_positions,
+            sizes=sizes,
+            depths=depths,
+            kinds=kinds,
+            parents=parents,
+            parent_modules=parent_modules,
+            preorder_positions={addr: i for i, addr in enumerate(preorder)},
+            by_kind=dict(by_kind),
+        )
+
+    def _get_position(self, addr: AddrStr) -> int:
+        try:
+            return self._preorder_positions[addr]
+        except KeyError as ex:
+            raise errors.AtoKeyError(f"Instance {addr} not found") from ex
+
+    def _get_postorder_span(self, addr: AddrStr) -> tuple[int, int]:
+        position = self._get_position(addr)
+        end = self._postorder_positions[position] + 1
+        return end - self._sizes[position], end
+
+    def get_preorder(self, addr: AddrStr) -> list[AddrStr]:
+        """Return addr and its descendants, parents before their children."""
+        position = self._get_position(addr)
+        return self.preorder[position : position + self._sizes[position]]
+
+    def get_postorder(self, addr: AddrStr) -> list[AddrStr]:
+        """Return addr and its descendants, in the same order as all_descendants."""
+        start, end = self._get_postorder_span(addr)
+        return self.postorder[start:end]
+
+    def get_of_kind(self, addr: AddrStr, kind: int) -> list[AddrStr]:
+        """
+        Return addr and its descendants which have any of the given Kind
+        flags, in the same order as all_descendants.
+        """
+        start, end = self._get_postorder_span(addr)
+        positions = []
+        for flag in _iter_flags(kind):
+            flagged = self._by_kind.get(flag, ())
+            positions.extend(
+                flagged[bisect_left(flagged, start) : bisect_left(flagged, end)]
+            )
+        if len(positions) > 1:
+            # Instances can have several of the flags, eg. components are modules
+            positions = sorted(set(positions))
+        return [self.postorder[i] for i in positions]
+
+    def get_parent(self, addr: AddrStr) -> Optional[AddrStr]:
+        """Return the parent of addr, or None if it's the root."""
+        parent = self._parents[self._get_position(addr)]
+        return self.preorder[parent] if parent >= 0 else None
+
+    def get_parent_module(self, addr: AddrStr) -> Optional[AddrStr]:
+        """Return the closest module above addr, or None if there isn't one."""
+        parent_module = self._parent_modules[self._get_position(addr)]
+        return self.preorder[parent_module] if parent_module >= 0 else None
+
+    def get_depth(self, addr: AddrStr) -> int:
+        """Return how far addr is below the root, which has a depth of 0."""
+        return self._depths[self._get_position(addr)]
+
+    def get_kind(self, addr: AddrStr) -> int:
+        """Return the Kind flags of addr."""
+        return self._kinds[self._get_position(addr)]
+
+
+def _clone_instance_tree(
+    root: Instance,
+    new_root_addr: AddrStr,
+    parent: Optional[Instance],
+    src_ctx: Optional[ParserRuleContext],
+) -> list[Instance]:
+    """
+    Clone an instance tree, re-rooted at a new address.
+
+    The clone shares nothing mutable with the original, but keeps the same
+    structure - eg. instances with merged assignments in the original have
+    merged assignments in the clone. Returns the new instances, parents first.
+    """
+    old_root_addr = root.addr
+    memo: dict[int, Any] = {}
+
+    def _reroot_addr(addr: AddrStr) -> AddrStr:
+        return AddrStr(new_root_addr + addr[len(old_root_addr) :])
+
+    def _reroot_value(value: Any) -> Any:
+        return expressions.reroot(value, old_root_addr, new_root_addr, memo)
+
+    def _clone_assignment(assignment: Assignment) -> Assignment:
+        changes = {"value": _reroot_value(assignment.value)}
+        if isinstance(assignment, SetCumulativeAssignment):
+            changes["anding"] = _reroot_value(assignment.anding)
+            changes["oring"] = _reroot_value(assignment.oring)
+        if all(changes[k] is getattr(assignment, k) for k in changes):
+            # Nothing to re-root, so it can be shared
+            return assignment
+        return evolve(assignment, **changes)
+
+    def _clone_deque(assignments: deque[Assignment]) -> deque[Assignment]:
+        if id(assignments) not in memo:
+            memo[id(assignments)] = deque(map(_clone_assignment, assignments))
+        return memo[id(assignments)]
+
+    def _clone_assignments(
+        assignments: Mapping[str, deque[Assignment]]
+    ) -> Mapping[str, deque[Assignment]]:
+        if id(assignments) not in memo:
+            new_assignments = defaultdict(deque)
+            for name, assignment_deque in assignments.items():
+                new_assignments[name] = _clone_deque(assignment_deque)
+            memo[id(assignments)] = new_assignments
+        return memo[id(assignments)]
+
+    old_instances = list(_iter_instance_tree(root))
+    new_by_old: dict[int, Instance] = {}
+    for old in old_instances:
+        new = Instance(
+            src_ctx=old.src_ctx if old is not root else src_ctx,
+            addr=_reroot_addr(old.addr),
+            supers=old.supers,
+            assignments=_clone_assignments(old.assignments),
+            parent=parent if old is root else new_by_old[id(old.parent)],
+            kind=old.kind,
+        )
+        new_by_old[id(old)] = new
+        if old is not root:
+            new.parent.add_child(address.get_name(new.addr), new)
+
+    for old in old_instances:
+        new = new_by_old[id(old)]
+        if old._assignments_merged_with is not None:
+            merged_id = id(old._assignments_merged_with)
+            if merged_id not in memo:
+                memo[merged_id] = IDdSet(
+                    new_by_old[id(i)] for i in old._assignments_merged_with
+                )
+            new.assignments_merged_with = memo[merged_id]
+        new.links = tuple(
+            Link(
+                src_ctx=link.src_ctx,
+                parent=new,
+                source=new_by_old[id(link.source)],
+                target=new_by_old[id(link.target)],
+            )
+            for link in old.links
+        )
+        new.assertions = tuple(
+            Assertion(
+                lhs=_reroot_value(assertion.lhs),
+                operator=assertion.operator,
+                rhs=_reroot_value(assertion.rhs),
+                src_ctx=assertion.src_ctx,
+            )
+            for assertion in old.assertions
+        )
+
+    return [new_by_old[id(old)] for old in old_instances]
+
+
+# Templates are rooted here, so their addresses can't be confused with real ones
+_TEMPLATE_ROOT_ADDR = AddrStr("<Template>:Template::template")
+
+
+@define
+class _InstanceTemplate:
+    """A snapshot of a freshly built instance tree, to be cloned from."""
+
+    super_obj: ClassLayer
+    root: Instance
+    files: set[str]
+
+
 class _Sentinel(enum.Enum):
     NOTHING = enum.auto()
 
@@ -741,6 +1100,8 @@ class Scoop(HandleStmtsFunctional, HandlesPrimaries):
     ) -> None:
         self.ast_getter = ast_getter
         self._output_cache: dict[AddrStr, ClassDef] = {}
+        # which files each file imports from
+        self._imports: dict[str, set[str]] = defaultdict(set)
         super().__init__()
 
     def get_search_paths(self) -> Iterable[Path]:
@@ -753,11 +1114,36 @@ class Scoop(HandleStmtsFunctional, HandlesPrimaries):
         # TODO: should this have some protections on
         # things that are already indexed?
         file_ast = self.ast_getter(file)
-        obj = self.visitFile_input(file_ast)
+        with profiler.phase("scoop"):
+            obj = self.visitFile_input(file_ast)
         assert isinstance(obj, ClassDef)
         # this operation puts it and it's children in the cache
         return self._register_obj_tree(obj, AddrStr(file), ())
 
+    def get_dependent_files(self, files: Iterable[str]) -> set[str]:
+        """Return the files given, and all the files that import them, transitively."""
+        importers: dict[str, set[str]] = defaultdict(set)
+        for importer, imported in self._imports.items():
+            for file in imported:
+                importers[file].add(importer)
+
+        dependents = set()
+        to_visit = list(files)
+        while to_visit:
+            file = to_visit.pop()
+            if file not in dependents:
+                dependents.add(file)
+                to_visit.extend(importers[file])
+        return dependents
+
+    def invalidate_files(self, files: set[str]) -> None:
+        """Remove everything defined in some files from the cache."""
+        for addr in list(self._output_cache):
+            if address.get_file(addr) in files:
+                del self._output_cache[addr]
+        for file in files:
+            self._imports.pop(file, None)
+
     def get_obj_def(self, addr: AddrStr) -> ClassDef:
         """Returns the ObjectDef for a given address."""
         if addr not in self._output_cache:
@@ -789,6 +1175,48 @@ class Scoop(HandleStmtsFunctional, HandlesPrimaries):
 
         return addrs
 
+    def splice_blockdefs(self, file: str, splice: Splice) -> set[AddrStr]:
+        """
+        Replace the definitions of blocks that've been re-parsed in-place.
+
+        Definitions of the other blocks in the file are kept as they are.
+        Returns the addresses of the blocks that were removed or replaced.
+        """
+        affected = {
+            address.add_entry(file, self.visit_ref_helper(ctx.name())[0])
+            for ctx in chain(splice.old_blockdefs, splice.new_blockdefs)
+        }
+
+        for addr in list(self._output_cache):
+            if any(addr == a or addr.startswith(a + ".") for a in affected):
+                del self._output_cache[addr]
+
+        # If the file's never been ingested, there's nothing more to update
+        if file not in self._output_cache:
+            return affected
+
+        file_obj = self._output_cache[file]
+        new_defs: dict[Ref, ClassDef] = dict(
+            self.visitBlockdef(ctx) for ctx in splice.new_blockdefs
+        )
+
+        # Rebuild the file's definitions, in the order they now appear
+        local_defs = {}
+        for stmt in file_obj.src_ctx.stmt():
+            blockdef = stmt.compound_stmt().blockdef() if stmt.compound_stmt() else None
+            if blockdef is None:
+                continue
+            ref = self.visit_ref_helper(blockdef.name())
+            local_defs[ref] = new_defs.get(ref) or file_obj.local_defs[ref]
+        file_obj.local_defs = local_defs
+
+        for ref, child in new_defs.items():
+            self._register_obj_tree(
+                child, address.add_entry(file, ref[0]), (file_obj,) + file_obj.closure
+            )
+
+        return affected
+
     def visitFile_input(self, ctx: ap.File_inputContext) -> ClassDef:
         """Visit a file input and return it's object."""
         locals_ = self.visit_iterable_helper(ctx.stmt())
@@ -866,20 +1294,14 @@ class Scoop(HandleStmtsFunctional, HandlesPrimaries):
 
         # get the current working directory
         current_file, *_ = get_src_info_from_ctx(ctx)
-        current_file = Path(current_file)
-        if current_file.is_file():
-            search_paths = chain((current_file.parent,), self.get_search_paths())
-        else:
-            search_paths = self.get_search_paths()
-
-        for search_path in search_paths:
-            candidate_path: Path = (search_path / from_file).resolve().absolute()
-            if candidate_path.exists():
-                break
-        else:
+        candidate_path = find_import(
+            from_file, Path(current_file), self.get_search_paths()
+        )
+        if candidate_path is None:
             raise errors.AtoImportNotFoundError.from_ctx(  # pylint: disable=raise-missing-from
                 ctx, f"File '{from_file}' not found."
             )
+        self._imports[str(current_file)].add(str(candidate_path))
 
         imports = {}
         for _what_ref in what_refs:
@@ -1021,7 +1443,8 @@ class Dizzy(HandleStmtsFunctional, HandlesPrimaries, HandlesGetTypeInfo):
         """Returns the ObjectLayer for a given address."""
         if addr not in self._output_cache:
             obj_def = self.obj_def_getter(addr)
-            obj = self.build_layer(obj_def)
+            with profiler.phase("dizzy"):
+                obj = self.build_layer(obj_def)
             assert isinstance(obj, ClassLayer)
             self._output_cache[addr] = obj
         try:
@@ -1031,6 +1454,24 @@ class Dizzy(HandleStmtsFunctional, HandlesPrimaries, HandlesGetTypeInfo):
                 f"No block named $addr in {address.get_file(addr)}", addr=addr
             ) from ex
 
+    def invalidate(
+        self, is_affected: Callable[[AddrStr], bool], files: Optional[set[str]] = None
+    ) -> None:
+        """
+        Remove the layers for affected blocks from the cache, along with any
+        layers that inherit from them.
+
+        If given, only layers defined in files are considered for removal.
+        """
+        for addr, layer in list(self._output_cache.items()):
+            if files is not None and address.get_file(addr) not in files:
+                continue
+            while layer is not None:
+                if is_affected(layer.obj_def.address):
+                    del self._output_cache[addr]
+                    break
+                layer = layer.super
+
     def _get_supers_layer(self, cls_def: ClassDef) -> Optional[ClassLayer]:
         """Return the super object of a given object."""
         if cls_def.super_ref is not None:
@@ -1105,6 +1546,18 @@ class Lofty(HandleStmtsFunctional, HandlesPrimaries, HandlesGetTypeInfo):
         obj_layer_getter: Callable[[AddrStr], ClassLayer],
     ) -> None:
         self._output_cache: dict[AddrStr, Instance] = {}
+        # the files each root instance's tree was built from
+        self._file_deps: dict[AddrStr, set[str]] = defaultdict(set)
+        # indexes of each root instance's tree
+        # built when first asked for, and dropped whenever the tree changes
+        self._descendant_indexes: dict[AddrStr, DescendantIndex] = {}
+        # called with the address of each root instance whose tree is dropped
+        # bound methods are held weakly, so listening doesn't keep their owner alive
+        self._tree_listeners: list[Callable[[], Optional[Callable[[AddrStr], None]]]] = []
+        # snapshots of instance trees, to clone rather than rebuild repeated
+        # instances, keyed by the super and the replacements made within them
+        self.use_templates = True
+        self._templates: dict[tuple, _InstanceTemplate] = {}
         # known replacements are represented as the reference of the instance
         # to be replaced, and a tuple containing the length of the ref of the
         # thing that called for that replacement, and the object that will replace it
@@ -1130,11 +1583,79 @@ class Lofty(HandleStmtsFunctional, HandlesPrimaries, HandlesGetTypeInfo):
             self.get_instance(address.get_entry(addr))
 
         obj_layer = self.obj_layer_getter(addr)
-        self.build_instance(addr, obj_layer)
+        with profiler.phase("lofty"):
+            self.build_instance(addr, obj_layer)
         assert isinstance(self._output_cache[addr], Instance)
 
         return self._output_cache[addr]
 
+    def _cache_instance(self, instance: Instance) -> None:
+        """Add a newly built instance to the cache."""
+        self._output_cache[instance.addr] = instance
+        self._descendant_indexes.pop(address.get_entry(instance.addr), None)
+
+    def get_descendant_index(self, root: AddrStr) -> DescendantIndex:
+        """Return the index of a root instance's tree."""
+        try:
+            return self._descendant_indexes[root]
+        except KeyError:
+            index = DescendantIndex.from_root(self.get_instance(root))
+            self._descendant_indexes[root] = index
+            return index
+
+    def add_tree_listener(self, listener: Callable[[AddrStr], None]) -> None:
+        """
+        Call listener with a root instance's address whenever its tree is
+        dropped, so things derived from it can be updated.
+
+        A bound method is only called for as long as its object is alive.
+        """
+        if inspect.ismethod(listener):
+            self._tree_listeners.append(weakref.WeakMethod(listener))
+        else:
+            self._tree_listeners.append(lambda: listener)
+
+    def _notify_tree_listeners(self, root: AddrStr) -> None:
+        """Call the live tree listeners, and forget those that have died."""
+        live = []
+        for listener_ref in self._tree_listeners:
+            listener = listener_ref()
+            if listener is not None:
+                listener(root)
+                live.append(listener_ref)
+        self._tree_listeners = live
+
+    def invalidate_files(self, files: set[str]) -> None:
+        """Remove all the instance trees built from any of some files."""
+        stale_roots = {
+            root for root, deps in self._file_deps.items() if not deps.isdisjoint(files)
+        }
+        for addr in list(self._output_cache):
+            if address.get_entry(addr) in stale_roots:
+                del self._output_cache[addr]
+        for root in stale_roots:
+            del self._file_deps[root]
+            self._descendant_indexes.pop(root, None)
+            self._notify_tree_listeners(root)
+        for key, template in list(self._templates.items()):
+            if not template.files.isdisjoint(files):
+                del self._templates[key]
+
+    def _get_template_key(self, new_addr: AddrStr, super_obj: ClassLayer) -> tuple:
+        """
+        Return the key for the template of an instance.
+
+        Other than the super, what's built can only vary with the replacements
+        commanded from above for addresses within the new instance.
+        """
+        prefix = new_addr + "."
+        replacements = frozenset(
+            (addr[len(new_addr) :], replace_with)
+            for addr, replace_with in self._known_replacements.items()
+            if addr.startswith(prefix)
+        )
+        return (super_obj.address, replacements)
+
     @contextmanager
     def apply_replacements_from_objs(
         self, objs: Iterable[ClassLayer]
@@ -1185,17 +1706,35 @@ class Lofty(HandleStmtsFunctional, HandlesPrimaries, HandlesGetTypeInfo):
         instance_name = address.get_name(new_addr)
         self.check_name_uniqueness(instance_name, parent_instance)
 
+        # Clone repeated instances from a template, rather than re-visiting their ASTs
+        template_key = None
+        if self.use_templates and parent_instance is not None:
+            template_key = self._get_template_key(new_addr, super_obj)
+            template = self._templates.get(template_key)
+            if template is not None and template.super_obj is super_obj:
+                new_instances = _clone_instance_tree(
+                    template.root, new_addr, parent_instance, src_ctx
+                )
+                for new_instance in new_instances:
+                    self._cache_instance(new_instance)
+                parent_instance.add_child(instance_name, new_instances[0])
+                self._file_deps[address.get_entry(new_addr)].update(template.files)
+                return
+
         new_instance = Instance.from_super(
             new_addr,
             super_obj,
             parent=parent_instance,
             src_ctx=src_ctx
         )
-        self._output_cache[new_addr] = new_instance
+        self._cache_instance(new_instance)
+        self._file_deps[address.get_entry(new_addr)].update(
+            address.get_file(super_.address) for super_ in new_instance.supers
+        )
 
         if self._instance_addr_stack:
             child_addr = address.get_name(new_addr)
-            parent_instance.children[child_addr] = new_instance
+            parent_instance.add_child(child_addr, new_instance)
 
         try:
             with ExitStack() as stack:
@@ -1213,8 +1752,24 @@ class Lofty(HandleStmtsFunctional, HandlesPrimaries, HandlesGetTypeInfo):
         except Exception:
             if new_addr in self._output_cache:
                 del self._output_cache[new_addr]
+            self._descendant_indexes.pop(address.get_entry(new_addr), None)
             raise
 
+        if template_key is not None:
+            # Snapshot it now, before the parent has a chance to modify it
+            template_root = _clone_instance_tree(
+                new_instance, _TEMPLATE_ROOT_ADDR, None, None
+            )[0]
+            self._templates[template_key] = _InstanceTemplate(
+                super_obj=super_obj,
+                root=template_root,
+                files={
+                    address.get_file(super_.address)
+                    for instance in _iter_instance_tree(template_root)
+                    for super_ in instance.supers
+                },
+            )
+
     def visitBlockdef(self, ctx: ap.BlockdefContext) -> _Sentinel:
         """Don't go down blockdefs, they're just for defining objects."""
         return NOTHING
@@ -1543,7 +2098,8 @@ class Lofty(HandleStmtsFunctional, HandlesPrimaries, HandlesGetTypeInfo):
             parent=current_instance,
         )
 
-        self._output_cache[new_addr] = current_instance.children[name] = pin_or_signal
+        self._cache_instance(pin_or_signal)
+        current_instance.add_child(name, pin_or_signal)
 
         return new_addr
 
@@ -1693,7 +2249,7 @@ class Lofty(HandleStmtsFunctional, HandlesPrimaries, HandlesGetTypeInfo):
             instance.assignments = new_attrs
             instance.assignments_merged_with = assign_back_to
 
-        self._current_instance.links.append(link)
+        self._current_instance.add_link(link)
 
         return KeyOptMap.empty()
 
@@ -1776,7 +2332,7 @@ class Lofty(HandleStmtsFunctional, HandlesPrimaries, HandlesGetTypeInfo):
             rhs=expressions_[i+1],
         ) for i in range(len(operators))]
 
-        self._current_instance.assertions.extend(assertions_)
+        self._current_instance.add_assertions(assertions_)
 
         return KeyOptMap.empty()
 
@@ -1790,22 +2346,54 @@ class Lofty(HandleStmtsFunctional, HandlesPrimaries, HandlesGetTypeInfo):
         return Roley(self._instance_addr_stack.top).visitArithmetic_expression(ctx)
 
 
+def _reparse_incrementally(file_str: str) -> bool:
+    """
+    Try to update the caches for an edited file in-place, keeping everything
+    built from the blocks the edit didn't touch. Returns whether it worked.
+    """
+    try:
+        src_code = read_src_file(Path(file_str))
+    except OSError:
+        return False
+
+    tree = parser.cache[file_str]
+    splice = reparse_incrementally(tree, src_code)
+    if splice is None:
+        return False
+
+    try:
+        affected = scoop.splice_blockdefs(file_str, splice)
+    except errors.AtoError:
+        # The tree's already been updated, so re-parse it all to report the error
+        return False
+
+    dizzy.invalidate(
+        lambda addr: any(addr == a or addr.startswith(a + ".") for a in affected),
+        scoop.get_dependent_files({file_str}),
+    )
+    return True
+
+
 def reset_caches(file: Path | str):
-    """Remove a file from the cache."""
-    file_str = str(file)
+    """
+    Remove a file, and everything that depends on it, from the caches.
 
-    if file_str in parser.cache:
-        del parser.cache[file_str]
+    Instance trees that weren't built from the file are kept.
+    """
+    file_str = address.get_file(str(file))
+
+    if file_str not in parser.cache or not _reparse_incrementally(file_str):
+        if file_str in parser.cache:
+            del parser.cache[file_str]
 
-    def _clear_cache(cache: dict[str, Any]):
-        # We do this in two steps to avoid modifying
-        # the dict while iterating over it
-        for addr in list(filter(lambda addr: addr.startswith(file_str), cache)):
-            del cache[addr]
+        dependent_files = scoop.get_dependent_files({file_str})
+        scoop.invalidate_files({file_str})
+        dizzy.invalidate(
+            lambda addr: address.get_file(addr) == file_str, dependent_files
+        )
 
-    _clear_cache(scoop._output_cache)
-    _clear_cache(dizzy._output_cache)
-    lofty._output_cache.clear()
+    lofty.invalidate_files({file_str})
+    address.forget_file(file_str)
 
 
 scoop = Scoop(parser.get_ast_from_file)
@@ -70,11 +70,17 @@ def dfs_postorder(
     start: T,
 ) -> Iterable[T]:
     """Depth-first search, yielding the leaves first."""
-
-    for child in get_children(start):
-        yield from dfs_postorder(get_children, child)
-
-    yield start
+    # An explicit stack, rather than recursion, so deep trees don't hit the
+    # recursion limit, or pay for a "yield from" at every level
+    stack = [(start, iter(get_children(start)))]
+    while stack:
+        item, children = stack[-1]
+        for child in children:
+            stack.append((child, iter(get_children(child))))
+            break
+        else:
+            stack.pop()
+            yield item
 
 
 def bfs(
@@ -99,7 +105,7 @@ def recurse(
     start: T,
 ) -> Iterable[T]:
     """Recursively yield items, optionally including the starting item and its children."""
-    yield start
-    next_item = get_next(start)
-    if next_item is not None:
-        yield from recurse(get_next, next_item)
+    item = start
+    while item is not None:
+        yield item
+        item = get_next(item)
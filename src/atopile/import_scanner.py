@@ -0,0 +1,140 @@
+"""
+Find the imports in a file, without parsing it.
+
+Running the full ANTLR parser is slow, and to find out which files a project
+is made of, all we need are its import statements. This module has a small
+hand-written tokenizer that follows the same string, comment and
+line-joining rules as the AtopileLexer, so it's not fooled by an "import"
+in a string or comment, and picks the import statements out of the token
+stream.
+
+It doesn't validate anything - a file it's happy with may still fail to
+parse, in which case the parser will report the error.
+"""
+
+import re
+from pathlib import Path
+from typing import Iterator
+
+# Prefixes allowed on string and bytes literals by the lexer
+_STRING_PREFIX = r"(?:[rR][bBfF]?|[uU]|[fF][rR]?|[bB][rR]?)?"
+
+_TOKEN_RE = re.compile(
+    "|".join(
+        (
+            # long strings must come before short strings, so '''' isn't ''
+            rf"(?P<string>{_STRING_PREFIX}(?:"
+            r"'''(?:\\.|[^\\])*?'''"
+            r'|"""(?:\\.|[^\\])*?"""'
+            r"|'(?:\\\r\n|\\.|[^\\\r\n\f'])*'"
+            r'|"(?:\\\r\n|\\.|[^\\\r\n\f"])*"'
+            r"))",
+            r"(?P<skip>[ \t]+|#[^\r\n\f]*|\\[ \t]*(?:\r?\n|\r|\f))",
+            r"(?P<newline>\r?\n|\r|\f)",
+            r"(?P<name>[^\W\d]\w*)",
+            r"(?P<open>[(\[{])",
+            r"(?P<close>[)\]}])",
+            r"(?P<other>.)",
+        )
+    ),
+    re.DOTALL,
+)
+
+_NEWLINE = ("newline", "\n")
+
+
+def _tokenize(src_code: str) -> Iterator[tuple[str, str]]:
+    """Yield (kind, text) for the tokens in some source code."""
+    opened = 0
+    for match in _TOKEN_RE.finditer(src_code):
+        kind = match.lastgroup
+        if kind == "skip":
+            continue
+
+        if kind == "open":
+            opened += 1
+        elif kind == "close":
+            opened = max(opened - 1, 0)
+        elif kind == "newline":
+            # like the lexer, newlines within brackets are ignored
+            if opened:
+                continue
+            yield _NEWLINE
+            continue
+
+        yield kind, match.group()
+
+
+def _string_value(text: str) -> str:
+    """Return the value of a string token, the same way the front end does."""
+    return text.strip("\"'")
+
+
+def scan_imports(src_code: str) -> list[tuple[str, list[str]]]:
+    """
+    Return the imports in some source code, in the order they appear.
+
+    Each import is a tuple of the file imported from, as written, and the
+    dotted names imported from it. eg. `from "a.ato" import B, C.D` is
+    returned as `("a.ato", ["B", "C.D"])`.
+    """
+    tokens = list(_tokenize(src_code))
+    imports = []
+
+    def _name_or_attr(i: int) -> tuple[int, str | None]:
+        """Consume a (possibly dotted) name, starting at token i."""
+        if i >= len(tokens) or tokens[i][0] != "name":
+            return i, None
+        parts = [tokens[i][1]]
+        i += 1
+        while (
+            i + 1 < len(tokens)
+            and tokens[i] == ("other", ".")
+            and tokens[i + 1][0] == "name"
+        ):
+            parts.append(tokens[i + 1][1])
+            i += 2
+        return i, ".".join(parts)
+
+    i = 0
+    while i < len(tokens):
+        kind, text = tokens[i]
+
+        # from "file" import name, name
+        if (
+            (kind, text) == ("name", "from")
+            and i + 2 < len(tokens)
+            and tokens[i + 1][0] == "string"
+            and tokens[i + 2] == ("name", "import")
+        ):
+            from_file = _string_value(tokens[i + 1][1])
+            i, name = _name_or_attr(i + 3)
+            names = [name] if name else []
+            while name and i < len(tokens) and tokens[i] == ("other", ","):
+                i, name = _name_or_attr(i + 1)
+                if name:
+                    names.append(name)
+            imports.append((from_file, names))
+            continue
+
+        # import name from "file"
+        if (kind, text) == ("name", "import"):
+            j, name = _name_or_attr(i + 1)
+            if (
+                name
+                and j + 1 < len(tokens)
+                and tokens[j] == ("name", "from")
+                and tokens[j + 1][0] == "string"
+            ):
+                imports.append((_string_value(tokens[j + 1][1]), [name]))
+                i = j + 2
+                continue
+
+        i += 1
+
+    return imports
+
+
+def scan_file_imports(src_path: Path) -> list[tuple[str, list[str]]]:
+    """Return the imports in a file. See scan_imports."""
+    return scan_imports(Path(src_path).read_bytes().decode("utf-8"))
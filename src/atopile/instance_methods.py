@@ -2,7 +2,16 @@ from typing import Any, Callable, Iterable, Optional
 
 from atopile import address, errors
 from atopile.address import AddrStr
-from atopile.front_end import ClassLayer, Link, lofty, Instance, Assignment
+from atopile.front_end import (
+    Assignment,
+    ClassLayer,
+    DescendantIndex,
+    Instance,
+    Kind,
+    Link,
+    iter_instance_tree_postorder,
+    lofty,
+)
 
 
 def get_children(addr: str) -> Iterable[AddrStr]:
@@ -52,9 +61,8 @@ def all_descendants(addr: str) -> Iterable[str]:
     """
     Return a list of addresses in depth-first order
     """
-    for child in get_children(addr):
-        yield from all_descendants(child)
-    yield addr
+    for instance in iter_instance_tree_postorder(lofty.get_instance(addr)):
+        yield instance.addr
 
 
 def _common_children(*instances: Instance) -> Iterable[tuple[Instance]]:
@@ -63,10 +71,19 @@ def _common_children(*instances: Instance) -> Iterable[tuple[Instance]]:
     """
     if len(instances) == 1:
         instances = tuple(instances[0])
-    for child in instances[0].children:
-        if all(child in i.children for i in instances[1:]):
-            yield from _common_children(i.children[child] for i in instances)
-            yield tuple(i.children[child] for i in instances)
+    # Walk the trees together, with an explicit stack rather than recursion
+    stack = [(instances, iter(instances[0].children))]
+    while stack:
+        parents, names = stack[-1]
+        for name in names:
+            if all(name in i.children for i in parents[1:]):
+                children = tuple(i.children[name] for i in parents)
+                stack.append((children, iter(children[0].children)))
+                break
+        else:
+            stack.pop()
+            if stack:
+                yield parents
 
 
 def common_children(*addrs: AddrStr) -> Iterable[AddrStr]:
@@ -81,37 +98,72 @@ def common_children(*addrs: AddrStr) -> Iterable[AddrStr]:
     )
 
 
-def _make_dumb_matcher(pass_list: Iterable[str]) -> Callable[[str], bool]:
+def _make_kind_matcher(kind: Kind) -> Callable[[str], bool]:
     """
-    Return a filter that checks if the addr is in the pass_list
+    Return a filter that checks if the addr is derived from any of the
+    built-ins flagged in kind
     """
+    mask = int(kind)
 
     def _filter(addr: AddrStr) -> bool:
-        instance = lofty.get_instance(addr)
-        for super_ in reversed(instance.supers):
-            if super_.address in pass_list:
-                return True
-        return False
+        return bool(lofty.get_instance(addr).kind & mask)
 
     return _filter
 
 
-match_components = _make_dumb_matcher(["<Built-in>:Component"])
-match_modules = _make_dumb_matcher(["<Built-in>:Module"])
-match_signals = _make_dumb_matcher(["<Built-in>:Signal"])
-match_pins = _make_dumb_matcher("<Built-in>:Pin")
-match_pins_and_signals = _make_dumb_matcher(["<Built-in>:Pin", "<Built-in>:Signal"])
-match_interfaces = _make_dumb_matcher(["<Built-in>:Interface"])
-match_sentinels = _make_dumb_matcher(
-    [
-        "<Built-in>:Component",
-        "<Built-in>:Module" "<Built-in>:Signal",
-        "<Built-in>:Pin",
-        "<Built-in>:Interface",
-    ]
+match_components = _make_kind_matcher(Kind.COMPONENT)
+match_modules = _make_kind_matcher(Kind.MODULE)
+match_signals = _make_kind_matcher(Kind.SIGNAL)
+match_pins = _make_kind_matcher(Kind.PIN)
+match_pins_and_signals = _make_kind_matcher(Kind.PIN | Kind.SIGNAL)
+match_interfaces = _make_kind_matcher(Kind.INTERFACE)
+# Instances derived from any built-in. Module and Signal were missed by the
+# string matcher this replaced, whose list had their names run together
+match_sentinels = _make_kind_matcher(
+    Kind.COMPONENT | Kind.MODULE | Kind.SIGNAL | Kind.PIN | Kind.INTERFACE
 )
 
 
+def get_descendant_index(addr: AddrStr) -> DescendantIndex:
+    """Return the cached index of the tree addr is in."""
+    return lofty.get_descendant_index(address.get_entry(addr))
+
+
+def all_descendants_indexed(addr: AddrStr) -> list[AddrStr]:
+    """
+    Return the same as all_descendants, but from the cached index of the tree,
+    rather than walking it.
+    """
+    return get_descendant_index(addr).get_postorder(addr)
+
+
+def all_descendants_of_kind(addr: AddrStr, kind: Kind) -> list[AddrStr]:
+    """
+    Return the addresses of addr and its descendants that are derived from
+    any of the built-ins flagged in kind, in the same order as all_descendants.
+
+    eg. all_descendants_of_kind(addr, Kind.COMPONENT) is the same as
+    filter(match_components, all_descendants(addr)), without visiting
+    everything else.
+    """
+    return get_descendant_index(addr).get_of_kind(addr, int(kind))
+
+
+def all_components(addr: AddrStr) -> list[AddrStr]:
+    """Return the components at or under addr, in all_descendants order."""
+    return all_descendants_of_kind(addr, Kind.COMPONENT)
+
+
+def all_modules(addr: AddrStr) -> list[AddrStr]:
+    """Return the modules (including components) at or under addr, in all_descendants order."""
+    return all_descendants_of_kind(addr, Kind.MODULE)
+
+
+def get_depth(addr: AddrStr) -> int:
+    """Return how many parents the given address has."""
+    return get_descendant_index(addr).get_depth(addr)
+
+
 def find_matching_super(
     addr: AddrStr, candidate_supers: list[AddrStr]
 ) -> Optional[AddrStr]:
@@ -14,11 +14,10 @@ from collections import defaultdict
 
 from atopile import address, config, errors, instance_methods
 from atopile.instance_methods import (
-    all_descendants,
     find_matching_super,
     match_components,
-    match_modules,
 )
+from atopile.utils import open_if_changed
 
 log = logging.getLogger(__name__)
 
@@ -62,7 +61,7 @@ def generate_module_map(build_ctx: config.BuildContext) -> None:
     module_map = {}
 
     laid_out_modules = _find_module_layouts()
-    for module_instance in filter(match_modules, all_descendants(build_ctx.entry)):
+    for module_instance in instance_methods.all_modules(build_ctx.entry):
         module_super = find_matching_super(module_instance, list(laid_out_modules.keys()))
         if not module_super:
             continue
@@ -104,5 +103,5 @@ def generate_module_map(build_ctx: config.BuildContext) -> None:
             "uuid_map": uuid_map,
         }
 
-    with open(build_ctx.output_base.with_suffix(".layouts.json"), "w", encoding="utf-8") as f:
+    with open_if_changed(build_ctx.output_base.with_suffix(".layouts.json")) as f:
         json.dump(module_map, f)
@@ -96,28 +96,121 @@ def _simple_return(x: T) -> T:
 class LoopSoup:
     """
     Helper function to associate data with the loop class
+
+    Things are given integer ids, and their connectedness is tracked with a
+    union-find over those ids, with path compression and union by rank. That
+    makes joining effectively constant time, no matter how large the groups
+    being joined.
+
+    Alongside, each group's ids are linked into a loop, spliced together the
+    same way LoopItem.join splices loops, so the things in a group come out
+    in the same order as they would from LoopItems. Net names depend on it.
     """
 
     def __init__(self, key_func: Callable[[T], Hashable] = _simple_return):
         self.key_func = key_func
-        self._map: dict[Hashable, LoopItem[T]] = {}
+        self._ids: dict[Hashable, int] = {}
+        self._things: list[T] = []
+        # each id's parent in the union-find forest, roots are their own parent
+        self._parents: list[int] = []
+        self._ranks = bytearray()
+        # each id's neighbours in its group's loop
+        self._nexts: list[int] = []
+        self._prevs: list[int] = []
+        # the ids in each group, keyed by its root id, built when first needed
+        self._groups: Optional[dict[int, list[int]]] = None
+
+    def _get_id(self, thing: T) -> int:
+        return self._ids[self.key_func(thing)]
+
+    def _find(self, i: int) -> int:
+        """Return the root id of the group an id is in."""
+        parents = self._parents
+        root = i
+        while parents[root] != root:
+            root = parents[root]
+        # compress the path, so the next lookup is direct
+        while parents[i] != root:
+            parents[i], i = root, parents[i]
+        return root
+
+    def _iter_loop(self, i: int) -> Iterator[int]:
+        """Yield the ids in an id's loop, starting from it."""
+        nexts = self._nexts
+        yield i
+        current = nexts[i]
+        while current != i:
+            yield current
+            current = nexts[current]
+
+    def _get_groups(self) -> dict[int, list[int]]:
+        """
+        Return the ids in each group, keyed by the root of the group.
+
+        Each group's ids go around its loop, from the first one added.
+        """
+        if self._groups is None:
+            groups: dict[int, list[int]] = {}
+            for i in range(len(self._parents)):
+                root = self._find(i)
+                if root not in groups:
+                    groups[root] = list(self._iter_loop(i))
+            self._groups = groups
+        return self._groups
+
+    def get_group(self, thing: T) -> tuple[T]:
+        """Return all the things connected to a thing, in the order groups() would."""
+        things = self._things
+        return tuple(things[i] for i in self._get_groups()[self._find(self._get_id(thing))])
 
     def get_loop(self, thing: T) -> LoopItem[T]:
         """Get the loop for a thing"""
-        return self._map[self.key_func(thing)]
+        items = [LoopItem(self._things[i]) for i in self._iter_loop(self._get_id(thing))]
+        for item, next_item in zip(items, items[1:] + items[:1]):
+            item.next = next_item
+            next_item.prev = item
+        return items[0]
 
-    def add(self, thing: T) -> LoopItem[T]:
+    def add(self, thing: T) -> None:
         """Add a thing to the loop pool"""
         key = self.key_func(thing)
-        if key in self._map:
+        if key in self._ids:
             raise KeyError(f"Key {key} for {repr(thing)} already occupied")
-        loop_item = LoopItem(thing)
-        self._map[key] = loop_item
-        return loop_item
+        i = len(self._things)
+        self._ids[key] = i
+        self._things.append(thing)
+        self._parents.append(i)
+        self._ranks.append(0)
+        self._nexts.append(i)
+        self._prevs.append(i)
+        self._groups = None
 
     def join(self, a: T, b: T) -> None:
         """Join two things together"""
-        LoopItem.join(self.get_loop(a), self.get_loop(b))
+        id_a = self._get_id(a)
+        id_b = self._get_id(b)
+        root_a = self._find(id_a)
+        root_b = self._find(id_b)
+        if root_a == root_b:
+            return
+
+        # splice the loops together, like LoopItem.join - which puts a lonely
+        # a after b, and otherwise puts b's loop after a
+        nexts, prevs = self._nexts, self._prevs
+        if nexts[id_a] == id_a and nexts[id_b] != id_b:
+            id_a, id_b = id_b, id_a
+        next_a, prev_b = nexts[id_a], prevs[id_b]
+        nexts[id_a], prevs[id_b] = id_b, id_a
+        nexts[prev_b], prevs[next_a] = next_a, prev_b
+
+        # hang the shallower tree off the deeper one, to keep them shallow
+        ranks = self._ranks
+        if ranks[root_a] < ranks[root_b]:
+            root_a, root_b = root_b, root_a
+        self._parents[root_b] = root_a
+        if ranks[root_a] == ranks[root_b]:
+            ranks[root_a] += 1
+        self._groups = None
 
     def join_multiple(self, things: Iterable[T]) -> None:
         """Join multiple things together"""
@@ -128,27 +221,24 @@ class LoopSoup:
             self.join(things[0], b)
 
     def groups(self) -> Iterator[tuple[T]]:
-        """Return an iterator of groups of things that are connected together"""
-        seen = set()
-
-        for k, v in self._map.items():
-            if k in seen:
-                continue
+        """
+        Return an iterator of groups of things that are connected together
 
-            # we can't do this bit lazily because we need to know
-            # which values we would see if we went through the whole group
-            values = tuple(v.iter_values())
-            seen.update(self.key_func(i) for i in values)
-            yield values
+        Groups are in the order their first thing was added. The things
+        within them go around their loop, from the first one added.
+        """
+        things = self._things
+        for ids in self._get_groups().values():
+            yield tuple(things[i] for i in ids)
 
     def __len__(self) -> int:
-        return len(self._map)
+        return len(self._things)
 
     def __bool__(self) -> bool:
-        return bool(self._map)
+        return bool(self._things)
 
     def __iter__(self) -> Iterator[T]:
-        return iter(li.represents for li in self._map.values())
+        return iter(self._things)
 
     def __contains__(self, item: T) -> bool:
-        return self.key_func(item) in self._map
+        return self.key_func(item) in self._ids
@@ -1,17 +1,14 @@
-from pathlib import Path
-from typing import Optional
+from io import StringIO
+from typing import Any, Iterator, Optional, TextIO
 
-from jinja2 import Environment, FileSystemLoader, StrictUndefined
 from toolz import groupby
 
 from atopile import components, errors, nets, layout, config, instance_methods
 from atopile.address import AddrStr, get_name, get_relative_addr_str
 from atopile.instance_methods import (
-    all_descendants,
     get_children,
     get_next_super,
     get_parent,
-    match_components,
     match_pins,
 )
 from atopile.kicad6_datamodel import (
@@ -35,6 +32,130 @@ _get_value = errors.downgrade(
 )
 
 
+def _quote(value: Any) -> str:
+    """Return a value as a quoted S-expression string."""
+    return '"' + str(value).replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+class KicadNetlistWriter:
+    """
+    Write a KiCAD netlist as S-expressions, a piece at a time.
+
+    The components must be written before the libparts, and the libparts
+    before the nets. Each section is only written if something is written
+    to it.
+    """
+
+    def __init__(self, f: TextIO, netlist: Optional[KicadNetlist] = None) -> None:
+        self._f = f
+        # only the netlist's header is written from this
+        self._netlist = netlist or KicadNetlist()
+        self._section: Optional[str] = None
+
+    def __enter__(self) -> "KicadNetlistWriter":
+        self._f.write(
+            f"(export (version {_quote(self._netlist.version)})\n"
+            "  (design\n"
+            f"    (source {_quote(self._netlist.source)})\n"
+            f"    (date {_quote(self._netlist.date)})\n"
+            f"    (tool {_quote(self._netlist.tool)}))"
+        )
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self._enter_section(None)
+            self._f.write(")\n")
+
+    def _enter_section(self, section: Optional[str]) -> None:
+        if section == self._section:
+            return
+        if self._section is not None:
+            self._f.write(")")
+        if section is not None:
+            self._f.write(f"\n  ({section}")
+        self._section = section
+
+    def write_component(self, component: KicadComponent) -> None:
+        self._enter_section("components")
+        lines = [
+            f"\n    (comp (ref {_quote(component.ref)})",
+            f"\n      (value {_quote(component.value)})",
+        ]
+        if component.footprint:
+            lines.append(f"\n      (footprint {_quote(component.footprint)})")
+        if component.fields:
+            lines.append("\n      (fields")
+            for field in component.fields:
+                lines.append(f"\n        (field (name {_quote(field.name)}) {_quote(field.value)})")
+            lines.append(")")
+        for prop in component.properties:
+            lines.append(f"\n      (property (name {_quote(prop.name)})")
+            if prop.value is not None:
+                lines.append(f" (value {_quote(prop.value)})")
+            lines.append(")")
+        libsource = component.libsource
+        sheetpath = component.sheetpath
+        lines += [
+            f"\n      (libsource (lib {_quote(libsource.lib)}) (part {_quote(libsource.part)})"
+            f" (description {_quote(libsource.description)}))",
+            f"\n      (sheetpath (names {_quote(sheetpath.names)})"
+            f" (tstamps {_quote(sheetpath.tstamps)}))",
+            f"\n      (tstamps {_quote(component.tstamp)}))",
+        ]
+        self._f.write("".join(lines))
+
+    def write_libpart(self, libpart: KicadLibpart) -> None:
+        self._enter_section("libparts")
+        lines = [f"\n    (libpart (lib {_quote(libpart.lib)}) (part {_quote(libpart.part)})"]
+        if libpart.description:
+            lines.append(f"\n      (description {_quote(libpart.description)})")
+        if libpart.docs:
+            lines.append(f"\n      (docs {_quote(libpart.docs)})")
+        if libpart.footprints:
+            lines.append("\n      (footprints")
+            for footprint in libpart.footprints:
+                lines.append(f"\n        (fp {_quote(footprint)})")
+            lines.append(")")
+        if libpart.fields:
+            lines.append("\n      (fields")
+            for field in libpart.fields:
+                lines.append(f"\n        (field (name {_quote(field.name)}) {_quote(field.value)})")
+            lines.append(")")
+        if libpart.pins:
+            lines.append("\n      (pins")
+            for pin in libpart.pins:
+                lines.append(
+                    f"\n        (pin (num {_quote(pin.num)}) (name {_quote(pin.name)})"
+                    f" (type {_quote(pin.type)}))"
+                )
+            lines.append(")")
+        lines.append(")")
+        self._f.write("".join(lines))
+
+    def write_net(self, net: KicadNet) -> None:
+        self._enter_section("nets")
+        lines = [f"\n    (net (code {_quote(net.code)}) (name {_quote(net.name)})"]
+        for node in net.nodes:
+            lines.append(
+                f"\n      (node (ref {_quote(node.ref)}) (pin {_quote(node.pin)})"
+                f" (pintype {_quote(node.pintype)}))"
+            )
+        lines.append(")")
+        self._f.write("".join(lines))
+
+
+def write_kicad_netlist(netlist: KicadNetlist, f: TextIO) -> None:
+    """Write a whole KiCAD netlist."""
+    with KicadNetlistWriter(f, netlist) as writer:
+        for component in netlist.components:
+            writer.write_component(component)
+        for libpart in netlist.libparts:
+            writer.write_libpart(libpart)
+        for net in netlist.nets:
+            writer.write_net(net)
+
+
 class NetlistBuilder:
     """He builds netlists."""
 
@@ -42,8 +163,6 @@ class NetlistBuilder:
         """TODO:"""
         self.netlist: Optional[KicadNetlist] = None
         self._libparts: dict[tuple, KicadLibpart] = {}
-        self._components: dict[tuple, KicadComponent] = {}
-        self._nets: dict[str, KicadNet] = {}
 
     def make_kicad_pin(self, pin_addr) -> KicadPin:
         """Make a KiCAD pin object from a representative instance object."""
@@ -134,12 +253,18 @@ class NetlistBuilder:
         )
         return constructed_component
 
-    def build(self, root) -> KicadNetlist:
-        """Build a netlist from an instance"""
-        self.netlist = KicadNetlist()
+    def iter_components(self, root) -> Iterator[KicadComponent]:
+        """
+        Make the components under root, one at a time.
 
-        # We need to cast this to a list, otherwise we're trying to reuse a generator
-        all_components = list(filter(match_components, all_descendants(root)))
+        Each footprint's libpart is made along the way, so they're all
+        ready once the components are done.
+        """
+        all_components = instance_methods.all_components(root)
+
+        # get the generic components from the database all at once up front,
+        # so everything below only reads the results
+        components.prefetch_generics(all_components)
 
         # first check that all the components have a footprint
         # otherwise we can't continue the netlist build
@@ -157,30 +282,45 @@ class NetlistBuilder:
             )
 
             for component in group_components:
-                self._components[component] = self.make_component(component, libsource)
+                yield self.make_component(component, libsource)
 
+    def iter_nets(self, root) -> Iterator[KicadNet]:
+        """Make the nets under root, one at a time."""
         for code, (net_name, pin_signal_list) in enumerate(
             nets.get_nets_by_name(root).items(), start=1
         ):
-            self._nets[net_name] = self.make_net(code, net_name, pin_signal_list)
+            yield self.make_net(code, net_name, pin_signal_list)
 
+    def build(self, root) -> KicadNetlist:
+        """Build a netlist from an instance"""
+        self.netlist = KicadNetlist()
+        self.netlist.components = list(self.iter_components(root))
         self.netlist.libparts = list(self._libparts.values())
-        self.netlist.components = list(self._components.values())
-        self.netlist.nets = list(self._nets.values())
-
+        self.netlist.nets = list(self.iter_nets(root))
         return self.netlist
 
+    def write(self, root, f: TextIO) -> None:
+        """
+        Write a netlist from an instance, as it's built.
+
+        Only the libparts are held onto until they're written.
+        """
+        with KicadNetlistWriter(f) as writer:
+            for component in self.iter_components(root):
+                writer.write_component(component)
+            for libpart in self._libparts.values():
+                writer.write_libpart(libpart)
+            for net in self.iter_nets(root):
+                writer.write_net(net)
 
-def get_netlist_as_str(root: AddrStr) -> str:
-    """Return the netlist as a string."""
-    builder = NetlistBuilder()
-    netlist = builder.build(root)
 
-    env = Environment(
-        loader=FileSystemLoader(Path(__file__).parent), undefined=StrictUndefined
-    )
+def write_netlist(root: AddrStr, f: TextIO) -> None:
+    """Write the netlist to a file."""
+    NetlistBuilder().write(root, f)
 
-    # Create the complete netlist
-    template = env.get_template("kicad6.j2")
-    netlist_str = template.render(nl=netlist)
-    return netlist_str
+
+def get_netlist_as_str(root: AddrStr) -> str:
+    """Return the netlist as a string."""
+    f = StringIO()
+    write_netlist(root, f)
+    return f.getvalue()
@@ -0,0 +1,186 @@
+"""
+Compare KiCAD netlists by what's in them, rather than line by line.
+
+Nets are compared by the pins they connect, so a net that's only been
+renamed shows up as a rename, rather than one net removed and another added.
+Components are compared by their designators.
+"""
+
+import re
+from typing import Iterable, Union
+
+from attrs import define, field
+
+SExpr = Union[str, list["SExpr"]]
+
+_TOKEN = re.compile(r'\s*(?:(\()|(\))|"((?:[^"\\]|\\.)*)"|([^\s()"]+))')
+_ESCAPE = re.compile(r"\\(.)")
+
+# The parts of a component that, when changed, are worth reporting
+_COMPONENT_FIELDS = ("value", "footprint", "part")
+
+
+def parse_sexpr(text: str) -> SExpr:
+    """Parse a single S-expression, returning atoms as strings and lists as lists."""
+    stack: list[list[SExpr]] = [[]]
+    pos = 0
+    text = text.rstrip()
+    while pos < len(text):
+        match = _TOKEN.match(text, pos)
+        if match is None:
+            raise ValueError(f"Can't parse S-expression at character {pos}")
+        pos = match.end()
+        opening, closing, quoted, atom = match.groups()
+        if opening:
+            stack.append([])
+        elif closing:
+            if len(stack) < 2:
+                raise ValueError(f"Unbalanced ')' at character {pos}")
+            expr = stack.pop()
+            stack[-1].append(expr)
+        elif quoted is not None:
+            stack[-1].append(_ESCAPE.sub(r"\1", quoted))
+        else:
+            stack[-1].append(atom)
+
+    if len(stack) != 1 or len(stack[0]) != 1:
+        raise ValueError("Expected exactly one complete S-expression")
+    return stack[0][0]
+
+
+def _children(expr: SExpr, name: str) -> Iterable[list[SExpr]]:
+    """Yield the sub-expressions of expr that start with name."""
+    for child in expr[1:]:
+        if isinstance(child, list) and child and child[0] == name:
+            yield child
+
+
+def _value(expr: SExpr, name: str, default: str = "") -> str:
+    """Return the value of expr's first (name value) sub-expression."""
+    for child in _children(expr, name):
+        if len(child) > 1 and isinstance(child[1], str):
+            return child[1]
+    return default
+
+
+@define
+class NetlistSummary:
+    """What matters about a netlist, for comparing it with another."""
+
+    # designator -> {"value": ..., "footprint": ..., "part": ...}
+    components: dict[str, dict[str, str]] = field(factory=dict)
+    # net name -> the (designator, pin) pairs it connects
+    nets: dict[str, frozenset[tuple[str, str]]] = field(factory=dict)
+
+    @classmethod
+    def from_str(cls, text: str) -> "NetlistSummary":
+        """Summarise the text of a KiCAD netlist."""
+        export = parse_sexpr(text)
+        summary = cls()
+        for section in _children(export, "components"):
+            for comp in _children(section, "comp"):
+                libsource = next(_children(comp, "libsource"), ["libsource"])
+                summary.components[_value(comp, "ref")] = {
+                    "value": _value(comp, "value"),
+                    "footprint": _value(comp, "footprint"),
+                    "part": _value(libsource, "part"),
+                }
+        for section in _children(export, "nets"):
+            for net in _children(section, "net"):
+                summary.nets[_value(net, "name")] = frozenset(
+                    (_value(node, "ref"), _value(node, "pin"))
+                    for node in _children(net, "node")
+                )
+        return summary
+
+
+@define
+class NetlistDiff:
+    """The differences between an old netlist and a new one."""
+
+    added_nets: list[str] = field(factory=list)
+    removed_nets: list[str] = field(factory=list)
+    renamed_nets: list[tuple[str, str]] = field(factory=list)
+    # net name -> (pins added, pins removed)
+    changed_nets: dict[str, tuple[list[tuple[str, str]], list[tuple[str, str]]]] = field(
+        factory=dict
+    )
+    added_components: list[str] = field(factory=list)
+    removed_components: list[str] = field(factory=list)
+    # designator -> {field: (old, new)}
+    changed_components: dict[str, dict[str, tuple[str, str]]] = field(factory=dict)
+
+    def __bool__(self) -> bool:
+        return any(
+            (
+                self.added_nets,
+                self.removed_nets,
+                self.renamed_nets,
+                self.changed_nets,
+                self.added_components,
+                self.removed_components,
+                self.changed_components,
+            )
+        )
+
+    def get_lines(self) -> list[str]:
+        """Describe the differences, one per line."""
+        lines = []
+        for ref in self.added_components:
+            lines.append(f"+ component {ref}")
+        for ref in self.removed_components:
+            lines.append(f"- component {ref}")
+        for ref, changes in self.changed_components.items():
+            described = ", ".join(
+                f"{name} {old!r} -> {new!r}" for name, (old, new) in changes.items()
+            )
+            lines.append(f"~ component {ref}: {described}")
+        for name in self.added_nets:
+            lines.append(f"+ net {name}")
+        for name in self.removed_nets:
+            lines.append(f"- net {name}")
+        for old_name, new_name in self.renamed_nets:
+            lines.append(f"~ net {old_name} renamed to {new_name}")
+        for name, (added, removed) in self.changed_nets.items():
+            pins = [f"+{ref}.{pin}" for ref, pin in added]
+            pins += [f"-{ref}.{pin}" for ref, pin in removed]
+            lines.append(f"~ net {name}: {' '.join(pins)}")
+        return lines
+
+
+def diff_netlists(old: NetlistSummary, new: NetlistSummary) -> NetlistDiff:
+    """Return the differences between two netlists."""
+    diff = NetlistDiff()
+
+    diff.added_components = sorted(new.components.keys() - old.components.keys())
+    diff.removed_components = sorted(old.components.keys() - new.components.keys())
+    for ref in sorted(old.components.keys() & new.components.keys()):
+        changes = {
+            name: (old.components[ref][name], new.components[ref][name])
+            for name in _COMPONENT_FIELDS
+            if old.components[ref][name] != new.components[ref][name]
+        }
+        if changes:
+            diff.changed_components[ref] = changes
+
+    # Nets that have gone from one name to another, with the same pins
+    added = new.nets.keys() - old.nets.keys()
+    removed = old.nets.keys() - new.nets.keys()
+    added_by_pins = {new.nets[name]: name for name in sorted(added)}
+    for old_name in sorted(removed):
+        new_name = added_by_pins.pop(old.nets[old_name], None)
+        if new_name is not None:
+            diff.renamed_nets.append((old_name, new_name))
+            added.discard(new_name)
+            removed.discard(old_name)
+    diff.added_nets = sorted(added)
+    diff.removed_nets = sorted(removed)
+
+    for name in sorted(old.nets.keys() & new.nets.keys()):
+        if old.nets[name] != new.nets[name]:
+            diff.changed_nets[name] = (
+                sorted(new.nets[name] - old.nets[name]),
+                sorted(old.nets[name] - new.nets[name]),
+            )
+
+    return diff
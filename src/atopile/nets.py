@@ -1,58 +1,167 @@
 from collections import defaultdict
 from typing import Iterable, Optional
-from toolz import groupby
+
+import numpy as np
 from attr import define
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import minimum_spanning_tree
+from toolz import groupby
 
-from atopile import address, errors
-from atopile.address import AddrStr
+from atopile import address, errors, instance_methods
+from atopile.address import AddrStr, get_name
 from atopile.datatypes import Ref
-from atopile.instance_methods import (
-    all_descendants,
-    get_children,
-    get_links,
-    iter_parents,
-    get_parent,
-    match_interfaces,
-    match_pins_and_signals,
-    match_signals,
-    match_modules,
+from atopile.front_end import (
+    DescendantIndex,
+    Instance,
+    Kind,
+    Link,
+    iter_instance_tree_postorder,
+    lofty,
 )
-import atopile.instance_methods
-from atopile.loop_soup import LoopSoup
-from atopile.address import get_name, add_instance
+
+
+# Kinds of instance that matter for finding nets
+_OTHER = 0
+_PIN_OR_SIGNAL = 1
+_INTERFACE = 2
+
+_PIN_OR_SIGNAL_FLAGS = int(Kind.PIN | Kind.SIGNAL)
+_SIGNAL_FLAGS = int(Kind.SIGNAL)
+_INTERFACE_FLAGS = int(Kind.INTERFACE)
+
+
+def _get_kind(instance: Instance) -> int:
+    """Return the kind of an instance, as far as finding nets is concerned."""
+    if instance.kind & _PIN_OR_SIGNAL_FLAGS:
+        return _PIN_OR_SIGNAL
+    if instance.kind & _INTERFACE_FLAGS:
+        return _INTERFACE
+    return _OTHER
+
+
+def _flatten(root: AddrStr) -> tuple[list[Instance], list[int], list[int]]:
+    """
+    Flatten the tree under a root, in a single pass, into the pins and
+    signals, which are the nodes of the nets, and the edges between them.
+
+    Interface links are expanded into edges between their pins and signals.
+    Returns the nodes in all_descendants order, and the edges as the sources'
+    and targets' positions in it.
+    """
+    nodes: list[Instance] = []
+    node_ids: dict[int, int] = {}
+    links: list[Link] = []
+    for instance in iter_instance_tree_postorder(lofty.get_instance(root)):
+        if _get_kind(instance) == _PIN_OR_SIGNAL:
+            node_ids[id(instance)] = len(nodes)
+            nodes.append(instance)
+        links.extend(instance.links)
+
+    # Make the edges between nodes from the links
+    sources: list[int] = []
+    targets: list[int] = []
+    for link in links:
+        source_kind = _get_kind(link.source)
+        target_kind = _get_kind(link.target)
+        source = link.source.addr
+        target = link.target.addr
+
+        if source_kind == _INTERFACE and target_kind == _INTERFACE:
+            target_children = link.target.children
+            for name, int_pin in link.source.children.items():
+                if _get_kind(int_pin) != _PIN_OR_SIGNAL:
+                    raise errors.AtoNotImplementedError("Cannot nest interfaces yet.")
+                if name not in target_children:
+                    raise errors.AtoKeyError.from_ctx(
+                        link.src_ctx,
+                        f"{target} has no '{name}' to connect {int_pin.addr} to"
+                    )
+                sources.append(node_ids[id(int_pin)])
+                targets.append(node_ids[id(target_children[name])])
+        elif source_kind == _INTERFACE or target_kind == _INTERFACE:
+            # If only one of the nodes is an interface, then we need to throw an error
+            raise errors.AtoTypeError.from_ctx(
+                link.src_ctx,
+                f"Cannot connect an interface to a non-interface: {source} ~ {target}"
+            )
+        elif source_kind == _PIN_OR_SIGNAL and target_kind == _PIN_OR_SIGNAL:
+            sources.append(node_ids[id(link.source)])
+            targets.append(node_ids[id(link.target)])
+        else:
+            # If only one of the nodes is an pin or signal, then we need to throw an error
+            raise errors.AtoTypeError.from_ctx(
+                link.src_ctx,
+                f"Cannot connect a signal or pin to a non-connectable: {source} ~ {target}"
+            )
+
+    return nodes, sources, targets
+
+
+def _group_nets(
+    node_addrs: list[AddrStr], sources: list[int], targets: list[int]
+) -> list[list[AddrStr]]:
+    """
+    Group nodes into nets: the connected components of the graph of them.
+
+    The edges are the sources' and targets' positions in node_addrs, in the
+    order they're joined. Nets are in the order of their first node. The
+    nodes within them are in the order a LoopSoup would put them, since net
+    names depend on it.
+    """
+    n_nodes = len(node_addrs)
+    source_ids = np.asarray(sources, dtype=np.int64)
+    target_ids = np.asarray(targets, dtype=np.int64)
+
+    # Find the joins that merge two nets, rather than joining nodes already
+    # on the same net. Taking the edges in order, they're the spanning tree
+    # Kruskal's algorithm finds when weighted by their position. Only the
+    # first edge between each pair of nodes can be one of them
+    low = np.minimum(source_ids, target_ids)
+    high = np.maximum(source_ids, target_ids)
+    (candidates,) = np.nonzero(low != high)
+    _, first = np.unique(low[candidates] * n_nodes + high[candidates], return_index=True)
+    candidates = candidates[first]
+    graph = coo_matrix(
+        (candidates + 1.0, (low[candidates], high[candidates])),
+        shape=(n_nodes, n_nodes),
+    )
+    joins = np.sort(minimum_spanning_tree(graph).tocoo().data).astype(np.int64) - 1
+
+    # Splice each net's nodes into a loop, join by join, like LoopItem.join
+    nexts = list(range(n_nodes))
+    prevs = list(range(n_nodes))
+    for a, b in zip(source_ids[joins].tolist(), target_ids[joins].tolist()):
+        if nexts[a] == a and nexts[b] != b:
+            a, b = b, a
+        next_a, prev_b = nexts[a], prevs[b]
+        nexts[a], prevs[b] = b, a
+        nexts[prev_b], prevs[next_a] = next_a, prev_b
+
+    # Each net goes around its loop from its first node
+    nets: list[list[AddrStr]] = []
+    seen = bytearray(n_nodes)
+    for first_node in range(n_nodes):
+        if seen[first_node]:
+            continue
+        net = []
+        node = first_node
+        while not seen[node]:
+            seen[node] = 1
+            net.append(node_addrs[node])
+            node = nexts[node]
+        nets.append(net)
+    return nets
 
 
 def get_nets(root: AddrStr) -> Iterable[Iterable[str]]:
-    """Find all the nets under a given root."""
-    net_soup = LoopSoup()
-    for addr in all_descendants(root):
-        if match_pins_and_signals(addr):
-            net_soup.add(addr)
-        for link in get_links(addr):
-            source = link.source.addr
-            target = link.target.addr
-
-            if match_interfaces(source) and match_interfaces(target):
-                for int_pin in get_children(source):
-                    if match_pins_and_signals(int_pin):
-                        net_soup.join(int_pin, add_instance(target, get_name(int_pin)))
-                    else:
-                        raise errors.AtoNotImplementedError("Cannot nest interfaces yet.")
-            elif match_interfaces(source) or match_interfaces(target):
-                # If only one of the nodes is an interface, then we need to throw an error
-                raise errors.AtoTypeError.from_ctx(
-                    link.src_ctx,
-                    f"Cannot connect an interface to a non-interface: {source} ~ {target}"
-                )
-            elif match_pins_and_signals(source) and match_pins_and_signals(target):
-                net_soup.join(source, target)
-            else:
-                # If only one of the nodes is an pin or signal, then we need to throw an error
-                raise errors.AtoTypeError.from_ctx(
-                    link.src_ctx,
-                    f"Cannot connect a signal or pin to a non-connectable: {source} ~ {target}"
-                )
-    return net_soup.groups()
+    """
+    Find all the nets under a given root.
+
+    The nets are the connected components of the graph of pins and signals.
+    """
+    nodes, sources, targets = _flatten(root)
+    node_addrs = [node.addr for node in nodes]
+    return [tuple(net) for net in _group_nets(node_addrs, sources, targets)]
 
 
 @define
@@ -79,16 +188,23 @@ class _Net:
             f"{'-' + str(self.suffix) if self.suffix else ''}"
         )
 
-    def generate_base_net_name(self) -> None:
-        """Generate the base_name attribute."""
-        min_depth = 100
+    def generate_base_net_name(self, index: DescendantIndex) -> None:
+        """
+        Generate the base_name attribute.
+
+        The index of the net's tree provides the signals' depths and parents.
+        """
+        signals = [
+            node for node in self.nodes_on_net if index.get_kind(node) & _SIGNAL_FLAGS
+        ]
+        depths = [index.get_depth(signal) for signal in signals]
+
+        min_depth = min([100, *depths])
         override_net_name = set()
-        for signal in filter(match_signals, self.nodes_on_net):
-            min_depth = min(min_depth, len(list(iter_parents(signal))))
-            try:
-                override_net_name.add(atopile.instance_methods.get_data(signal, "override_net_name"))
-            except errors.AtoKeyError:
-                pass
+        for signal in signals:
+            override = lofty.get_instance(signal).assignments.get("override_net_name")
+            if override and override[0].value is not None:
+                override_net_name.add(override[0].value)
 
         if len(override_net_name) == 1:
             self.base_name = override_net_name.pop()
@@ -100,19 +216,19 @@ class _Net:
             )
 
         name_candidates = defaultdict(int)
-        for signal in filter(match_signals, self.nodes_on_net):
+        for signal, depth in zip(signals, depths):
             # lower case so we are not case sensitive
             name = get_name(signal).lower()
             # only rank signals at highest level
-            if min_depth == len(list(iter_parents(signal))):
+            if min_depth == depth:
                 if name in ['p1', 'p2']:
                     # Ignore 2 pin component signals
                     name_candidates[name] = 0
                 else:
                     name_candidates[name] += 1
 
-            elif match_interfaces(get_parent(signal)):
-                if min_depth + 1 == len(list(iter_parents(signal))):
+            elif index.get_kind(index.get_parent(signal)) & _INTERFACE_FLAGS:
+                if min_depth + 1 == depth:
                     # Give interfaces on the same level a chance!
                     name_candidates[name] += 1
 
@@ -125,14 +241,22 @@ def _find_net_names(nets: Iterable[Iterable[str]]) -> dict[str, list[str]]:
     """Find the names of the nets."""
     # make net objects
     net_objs = [_Net(list(net)) for net in nets]
+    if not net_objs:
+        return {}
+    index = instance_methods.get_descendant_index(net_objs[0].nodes_on_net[0])
 
     # grab all the nets base names
     for net in net_objs:
-        net.generate_base_net_name()
+        net.generate_base_net_name(index)
+
+    return _resolve_net_names(net_objs, index)
 
+
+def _resolve_net_names(net_objs: list[_Net], index: DescendantIndex) -> dict[str, list[str]]:
+    """Resolve conflicts between the nets' base names, and return them by name."""
     # for the net objects that still conflict, grab a prefix
     conflicing_nets = _find_conflicts(net_objs)
-    _add_prefix(conflicing_nets)
+    _add_prefix(conflicing_nets, index)
 
     # if they still conflict, slap a suffix on that bad boi
     conflicing_nets = _find_conflicts(net_objs)
@@ -149,18 +273,13 @@ def _find_conflicts(nets: Iterable[_Net]) -> Iterable[Iterable[_Net]]:
             yield nets
 
 
-def _add_prefix(conflicts: Iterable[list[_Net]]):
+def _add_prefix(conflicts: Iterable[list[_Net]], index: DescendantIndex):
     """Resolve conflicts in net names."""
     for conflict_nets in conflicts:
         for net in conflict_nets:
             if net.base_name:
-                # Find the parent of the net that is a module
-                parent_module_iter = filter(
-                    match_modules, iter_parents(net.nodes_on_net[0])
-                )
-
-                # Get the first parent module that matches, or None if there's no match
-                parent_module = next(parent_module_iter, None)
+                # Find the parent of the net that is a module, or None if there's no match
+                parent_module = index.get_parent_module(net.nodes_on_net[0])
 
                 # Check if a parent module was found
                 if parent_module:
@@ -175,33 +294,104 @@ def _add_suffix(conflicts: Iterable[list[_Net]]):
             net.suffix = i
 
 
+_NO_OVERRIDE = object()
+
+
+def _get_naming_key(node: Instance) -> tuple:
+    """
+    Return what, other than its address, a node's net name depends on.
+
+    If a node's key changes, the name of its net needs to be found again.
+    """
+    override = node.assignments.get("override_net_name")
+    return (
+        node.kind,
+        node.parent.kind if node.parent is not None else 0,
+        override[0].value if override else _NO_OVERRIDE,
+    )
+
+
+@define
+class _EntryNets:
+    """The nets of an entry, and what they were found from."""
+
+    naming_keys: dict[AddrStr, tuple]
+    nets: list[_Net]
+    nets_by_name: dict[str, list[AddrStr]]
+    node_to_net_name: dict[AddrStr, str]
+
+
 class NetFinder:
+    """
+    Finds and names the nets of entries, keeping them up to date as the
+    instance trees they're found from change.
+
+    When an entry's tree is rebuilt, its nets are found again, but only
+    those whose nodes changed are named again. The result is the same as
+    finding and naming them all again from scratch.
+    """
+
     def __init__(self) -> None:
-        self.net_name_to_nodes_map: dict[AddrStr, dict[str, Iterable[AddrStr]]] = {}
-        self.node_to_net_name: dict[AddrStr, dict[AddrStr, str]] = {}
+        self._entries: dict[AddrStr, _EntryNets] = {}
+        self._stale: set[AddrStr] = set()
+        lofty.add_tree_listener(self._mark_stale)
+
+    def _mark_stale(self, entry: AddrStr) -> None:
+        """Note that an entry's tree has changed, so its nets must be found again."""
+        self._stale.add(entry)
 
     def get_nets_by_name(self, entry: AddrStr) -> dict[str, list[AddrStr]]:
         """Get the nets for a given root."""
         if address.get_instance_section(entry):
             raise ValueError("Only entry are supported for now")
 
-        if entry not in self.net_name_to_nodes_map:
-            self.net_name_to_nodes_map[entry] = _find_net_names(get_nets(entry))
-            self.node_to_net_name[entry] = {
-                node: net_name
-                for net_name, nodes in self.net_name_to_nodes_map[entry].items()
-                for node in nodes
-            }
+        if entry not in self._entries or entry in self._stale:
+            self._entries[entry] = self._update(entry, self._entries.get(entry))
+            self._stale.discard(entry)
 
-        return self.net_name_to_nodes_map[entry]
+        return self._entries[entry].nets_by_name
 
     def get_net_name_node_is_on(self, node: AddrStr) -> str:
         """Get the net name for a given node."""
         entry = address.get_entry(node)
-        if entry not in self.node_to_net_name:
-            self.get_nets_by_name(entry)
-
-        return self.node_to_net_name[entry][node]
+        self.get_nets_by_name(entry)
+        return self._entries[entry].node_to_net_name[node]
+
+    @staticmethod
+    def _update(entry: AddrStr, old: Optional[_EntryNets]) -> _EntryNets:
+        """Find the nets of an entry, reusing those of old that haven't changed."""
+        nodes, sources, targets = _flatten(entry)
+        node_addrs = [node.addr for node in nodes]
+        naming_keys = {node.addr: _get_naming_key(node) for node in nodes}
+
+        # A net's base name depends only on its nodes, their order and their
+        # naming keys, so an old net with all of those the same keeps its own
+        old_nets = {net.nodes_on_net[0]: net for net in old.nets} if old else {}
+        index = lofty.get_descendant_index(entry)
+        nets = []
+        for nodes_on_net in _group_nets(node_addrs, sources, targets):
+            net = old_nets.get(nodes_on_net[0])
+            if (
+                net is not None
+                and net.nodes_on_net == nodes_on_net
+                and all(old.naming_keys.get(addr) == naming_keys[addr] for addr in nodes_on_net)
+            ):
+                net.prefix = None
+                net.suffix = None
+            else:
+                net = _Net(nodes_on_net)
+                net.generate_base_net_name(index)
+            nets.append(net)
+        nets_by_name = _resolve_net_names(nets, index)
+
+        return _EntryNets(
+            naming_keys=naming_keys,
+            nets=nets,
+            nets_by_name=nets_by_name,
+            node_to_net_name={
+                addr: name for name, nodes in nets_by_name.items() for addr in nodes
+            },
+        )
 
 
 net_finder = NetFinder()
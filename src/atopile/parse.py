@@ -1,15 +1,24 @@
 import logging
+from concurrent.futures import ProcessPoolExecutor
 from contextlib import contextmanager
+from itertools import chain
 from os import PathLike
 from pathlib import Path
+from typing import Iterable, Optional
 
 from antlr4 import CommonTokenStream, FileStream, InputStream
+from antlr4.atn.PredictionMode import PredictionMode
 from antlr4.error.ErrorListener import ErrorListener
+from antlr4.error.ErrorStrategy import BailErrorStrategy, DefaultErrorStrategy
+from antlr4.error.Errors import ParseCancellationException
 
 from atopile.parser.AtopileLexer import AtopileLexer
 from atopile.parser.AtopileParser import AtopileParser
 
 from .errors import AtoFileNotFoundError, AtoSyntaxError
+from .import_scanner import scan_file_imports
+from .parse_cache import ParseCache, deserialize_tree, serialize_tree
+from .profiling import profiler
 
 log = logging.getLogger(__name__)
 log.setLevel(logging.INFO)
@@ -76,28 +85,112 @@ def defer_parser_errors(parser: AtopileParser) -> None:
         raise ExceptionGroup("Errors caused parsing failure", error_listener.errors)
 
 
+def parse_file_input(parser: AtopileParser) -> AtopileParser.File_inputContext:
+    """
+    Parse a file input, using the two-stage strategy.
+
+    SLL prediction is much faster than full LL, and gives the same result
+    for almost all valid input. So we try SLL first, bailing out at the first
+    error, and only re-parse with full LL if that fails. Any errors are
+    reported from the LL parse, so they're the same as they'd always be.
+    """
+    parser._interp.predictionMode = PredictionMode.SLL
+    parser._errHandler = BailErrorStrategy()
+    parser.removeErrorListeners()
+    try:
+        return parser.file_input()
+    except ParseCancellationException:
+        pass
+
+    parser.reset()
+    parser._interp.predictionMode = PredictionMode.LL
+    parser._errHandler = DefaultErrorStrategy()
+    with defer_parser_errors(parser):
+        return parser.file_input()
+
+
 def parse_text_as_file(
     src_code: str, src_path: None | str | Path = None
 ) -> AtopileParser.File_inputContext:
     """Parse a string as a file input."""
     input = InputStream(src_code)
     input.name = src_path
-    parser = make_parser(input)
-    with defer_parser_errors(parser):
-        tree = parser.file_input()
-
-    return tree
+    return parse_file_input(make_parser(input))
 
 
 def parse_file(src_path: Path) -> AtopileParser.File_inputContext:
     """Parse a file from a path."""
     input = FileStream(str(src_path), encoding="utf-8")
     input.name = src_path
-    parser = make_parser(input)
-    with defer_parser_errors(parser):
-        tree = parser.file_input()
+    return parse_file_input(make_parser(input))
+
+
+def read_src_file(src_path: Path) -> str:
+    """Read a source file the same way FileStream does, eg. without newline translation."""
+    return Path(src_path).read_bytes().decode("utf-8")
+
+
+def find_import(
+    from_file: str, current_file: Path, search_paths: Iterable[Path]
+) -> Optional[Path]:
+    """
+    Find the file an import refers to, or None if it can't be found.
+
+    Imports are relative to the importing file first, then each of the search paths.
+    """
+    current_file = Path(current_file)
+    if current_file.is_file():
+        search_paths = chain((current_file.parent,), search_paths)
+
+    for search_path in search_paths:
+        candidate_path = (search_path / from_file).resolve().absolute()
+        if candidate_path.exists():
+            return candidate_path
 
-    return tree
+    return None
+
+
+def find_import_graph(
+    src_paths: Iterable[PathLike], search_paths: Iterable[Path]
+) -> dict[str, list[str]]:
+    """
+    Return the files reachable from some source files, and what each imports.
+
+    Files are keyed the same way Scoop refers to them. Imports that can't be
+    found are left out, for the front end to report.
+    """
+    search_paths = list(search_paths)
+    graph: dict[str, list[str]] = {}
+    to_scan = [str(p) for p in src_paths]
+    while to_scan:
+        src_path = to_scan.pop()
+        if src_path in graph or not Path(src_path).exists():
+            continue
+
+        graph[src_path] = []
+        for from_file, _ in scan_file_imports(Path(src_path)):
+            import_path = find_import(from_file, Path(src_path), search_paths)
+            if import_path is not None:
+                graph[src_path].append(str(import_path))
+                to_scan.append(str(import_path))
+
+    return graph
+
+
+def _parse_for_prefetch(src_path: Path) -> Optional[tuple[str, bytes]]:
+    """
+    Parse a file in a worker process.
+
+    Returns the source code and the serialized tree, or None if the file
+    can't be parsed. Errors are left to be raised from the main process,
+    when the file is parsed on demand.
+    """
+    try:
+        src_code = read_src_file(src_path)
+        tree = parse_text_as_file(src_code, src_path)
+    except Exception:  # pylint: disable=broad-except
+        return None
+    return src_code, serialize_tree(tree)
 
 
 class FileParser:
@@ -105,6 +198,25 @@ class FileParser:
 
     def __init__(self) -> None:
         self.cache = {}
+        self.disk_cache: Optional[ParseCache] = None
+
+    def enable_disk_cache(self, cache_dir: Path) -> None:
+        """Persist parse trees to disk, so unchanged files needn't be re-parsed."""
+        self.disk_cache = ParseCache(cache_dir)
+        self.disk_cache.prune()
+
+    def _parse(self, src_path: Path) -> AtopileParser.File_inputContext:
+        """Parse a file, going via the disk cache if it's enabled."""
+        if self.disk_cache is None:
+            return parse_file(src_path)
+
+        src_code = read_src_file(src_path)
+        if (tree := self.disk_cache.get(src_code, src_path)) is not None:
+            return tree
+
+        tree = parse_text_as_file(src_code, src_path)
+        self.disk_cache.put(src_code, tree, src_path)
+        return tree
 
     def get_ast_from_file(
         self, src_origin: PathLike
@@ -117,9 +229,57 @@ class FileParser:
         if src_origin_str not in self.cache:
             if not src_origin_path.exists():
                 raise AtoFileNotFoundError(src_origin_str)
-            self.cache[src_origin_str] = parse_file(src_origin_path)
+            with profiler.phase("parse"):
+                self.cache[src_origin_str] = self._parse(src_origin_path)
 
         return self.cache[src_origin_str]
 
+    def prefetch(
+        self,
+        src_paths: Iterable[PathLike],
+        search_paths: Iterable[Path],
+        max_workers: Optional[int] = None,
+    ) -> None:
+        """
+        Parse files and everything they import, concurrently, ahead of time.
+
+        The import graph is mapped out with the import scanner, then every
+        file that isn't already cached is parsed in a pool of worker processes.
+        The results are handed back to the cache so that later calls to
+        get_ast_from_file are free.
+        """
+        to_parse = []
+        for src_path in find_import_graph(src_paths, search_paths):
+            if src_path in self.cache:
+                continue
+            if self.disk_cache is not None:
+                tree = self.disk_cache.get(read_src_file(Path(src_path)), Path(src_path))
+                if tree is not None:
+                    self.cache[src_path] = tree
+                    continue
+            to_parse.append(src_path)
+
+        # A process pool is only worth spinning up for several files
+        if len(to_parse) <= 1:
+            for src_path in to_parse:
+                self._accept_prefetched(src_path, _parse_for_prefetch(Path(src_path)))
+            return
+
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            results = pool.map(_parse_for_prefetch, map(Path, to_parse))
+            for src_path, result in zip(to_parse, results):
+                self._accept_prefetched(src_path, result)
+
+    def _accept_prefetched(
+        self, src_path: str, result: Optional[tuple[str, bytes]]
+    ) -> None:
+        """Put the result of a prefetched parse into the caches."""
+        if result is None:
+            return
+        src_code, data = result
+        self.cache[src_path] = deserialize_tree(data, src_code, Path(src_path))
+        if self.disk_cache is not None:
+            self.disk_cache.put_data(src_code, data, Path(src_path))
+
 
 parser = FileParser()
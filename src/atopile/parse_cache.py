@@ -0,0 +1,317 @@
+"""
+A persistent, on-disk cache of parse trees.
+
+ANTLR's python runtime is slow, so rather than re-lexing and re-parsing
+every file on every build, we store a compact form of each file's parse
+tree under the project's `.ato/cache` directory.
+
+Entries are keyed by the file's path, and a hash of its contents, the
+grammar and the atopile version, so they're never stale - an edit to the
+file, an update to the grammar or an upgrade of atopile each simply produce
+a new key. Only the newest entry for each file is kept, and entries that
+haven't been written for a while are removed, so the cache doesn't grow
+with every edit.
+
+Entries are pickles, and unpickling runs code, so the cache is trusted like
+the project's own source. Each entry starts with a header giving the
+format, key and file it's for. The header is checked before anything is
+unpickled, so an entry is never loaded for the wrong file or version.
+
+The serialized form is a token table and a tree of rule indices pointing
+into that table. Deserializing it rebuilds real ANTLR contexts, so the
+rest of the compiler can't tell the difference between a fresh parse and
+a cached one.
+"""
+
+import hashlib
+import importlib.metadata
+import json
+import logging
+import os
+import pickle
+import sys
+import tempfile
+import time
+from functools import cache
+from pathlib import Path
+from typing import Any, Optional
+
+from antlr4 import InputStream
+from antlr4.Token import CommonToken
+from antlr4.tree.Tree import TerminalNodeImpl
+
+from atopile.parser import AtopileLexer as lexer_module
+from atopile.parser import AtopileParser as parser_module
+from atopile.parser.AtopileParser import AtopileParser
+
+log = logging.getLogger(__name__)
+
+
+# Bump this if the layout of the serialized data changes
+FORMAT_VERSION = 2
+
+# How long an entry's kept after it was last written, in seconds
+MAX_ENTRY_AGE = 30 * 24 * 60 * 60
+
+
+@cache
+def get_grammar_version() -> str:
+    """Return a hash uniquely identifying the lexer and parser grammars."""
+    hasher = hashlib.sha256()
+    hasher.update(repr(lexer_module.serializedATN()).encode("utf-8"))
+    hasher.update(repr(parser_module.serializedATN()).encode("utf-8"))
+    return hasher.hexdigest()
+
+
+@cache
+def _get_atopile_version() -> str:
+    try:
+        return importlib.metadata.version("atopile")
+    except importlib.metadata.PackageNotFoundError:
+        # This happens when running from a source tree
+        return "unknown"
+
+
+@cache
+def _get_key_prefix() -> bytes:
+    """Everything other than the file's contents that goes into a cache key."""
+    return "|".join(
+        (
+            str(FORMAT_VERSION),
+            get_grammar_version(),
+            _get_atopile_version(),
+            sys.version,
+        )
+    ).encode("utf-8")
+
+
+def get_cache_key(src_code: str) -> str:
+    """Return the cache key for a file's source code."""
+    hasher = hashlib.sha256(_get_key_prefix())
+    hasher.update(src_code.encode("utf-8"))
+    return hasher.hexdigest()
+
+
+@cache
+def _get_context_classes() -> tuple[type, ...]:
+    """Return the context class for each rule, indexed by rule index."""
+    return tuple(
+        getattr(AtopileParser, rule_name[0].upper() + rule_name[1:] + "Context")
+        for rule_name in AtopileParser.ruleNames
+    )
+
+
+def serialize_tree(tree: AtopileParser.File_inputContext) -> bytes:
+    """
+    Serialize a freshly parsed tree into a compact form.
+
+    The tree must still be attached to the parser that created it,
+    since it's the source of the token table and comments.
+    """
+    token_stream = tree.parser.getTokenStream()
+    tokens = tuple(
+        (t.type, t.channel, t.start, t.stop, t.line, t.column, t._text)
+        for t in token_stream.tokens
+    )
+    comments = {
+        line: comment
+        for (_, line), comment in token_stream.tokenSource.comments.items()
+    }
+
+    def _token_index(token: Optional[CommonToken]) -> int:
+        return -1 if token is None else token.tokenIndex
+
+    def _serialize_ctx(ctx) -> tuple:
+        children = tuple(
+            child.symbol.tokenIndex
+            if isinstance(child, TerminalNodeImpl)
+            else _serialize_ctx(child)
+            for child in ctx.children or ()
+        )
+        return (
+            ctx.getRuleIndex(),
+            ctx.invokingState,
+            _token_index(ctx.start),
+            _token_index(ctx.stop),
+            children,
+        )
+
+    return pickle.dumps(
+        (FORMAT_VERSION, tokens, comments, _serialize_ctx(tree)),
+        protocol=pickle.HIGHEST_PROTOCOL,
+    )
+
+
+class CachedTokenSource:
+    """
+    Stands in for the lexer as the source of deserialized tokens.
+
+    The only thing we need from the lexer after parsing is the comments it found.
+    """
+
+    def __init__(self, comments: dict[tuple[Any, int], str]) -> None:
+        self.comments = comments
+
+
+def deserialize_tree(
+    data: bytes, src_code: str, src_path: None | str | Path = None
+) -> AtopileParser.File_inputContext:
+    """Rebuild a parse tree from its serialized form."""
+    format_version, tokens, comments, tree = pickle.loads(data)
+    if format_version != FORMAT_VERSION:
+        raise ValueError(f"Unsupported parse cache format {format_version}")
+
+    input_stream = InputStream(src_code)
+    input_stream.name = src_path
+    token_source = CachedTokenSource(
+        {(src_path, line): comment for line, comment in comments.items()}
+    )
+    source_pair = (token_source, input_stream)
+
+    token_objs = []
+    for token_index, token_data in enumerate(tokens):
+        type_, channel, start, stop, line, column, text = token_data
+        token = CommonToken(CommonToken.EMPTY_SOURCE, type_, channel, start, stop)
+        token.source = source_pair
+        token.tokenIndex = token_index
+        token.line = line
+        token.column = column
+        token._text = text
+        token_objs.append(token)
+
+    context_classes = _get_context_classes()
+
+    def _deserialize_ctx(serialized: tuple, parent):
+        rule_index, invoking_state, start, stop, children = serialized
+        ctx = context_classes[rule_index](None, parent, invoking_state)
+        ctx.start = token_objs[start] if start >= 0 else None
+        ctx.stop = token_objs[stop] if stop >= 0 else None
+        ctx.children = []
+        for child in children:
+            if isinstance(child, int):
+                child_node = TerminalNodeImpl(token_objs[child])
+                child_node.parentCtx = ctx
+            else:
+                child_node = _deserialize_ctx(child, ctx)
+            ctx.children.append(child_node)
+        if not ctx.children:
+            ctx.children = None
+        return ctx
+
+    return _deserialize_ctx(tree, None)
+
+
+def _get_path_key(src_path: None | str | Path) -> str:
+    """Return a key for the file a tree was parsed from, to name its entries by."""
+    path = "" if src_path is None else os.fspath(src_path)
+    return hashlib.sha256(path.encode("utf-8")).hexdigest()[:16]
+
+
+def _make_header(src_code: str, src_path: None | str | Path) -> bytes:
+    """Return the header an entry for some source code starts with."""
+    header = {
+        "format": FORMAT_VERSION,
+        "key": get_cache_key(src_code),
+        "path": None if src_path is None else os.fspath(src_path),
+    }
+    return json.dumps(header).encode("utf-8") + b"\n"
+
+
+class ParseCache:
+    """Persist parse trees to disk, keyed by the file and its content."""
+
+    def __init__(self, cache_dir: Path) -> None:
+        self.cache_dir = Path(cache_dir)
+        self.hits = 0
+        self.misses = 0
+
+    def _get_path(self, src_code: str, src_path: None | str | Path = None) -> Path:
+        return self.cache_dir / (
+            _get_path_key(src_path) + "-" + get_cache_key(src_code) + ".pickle"
+        )
+
+    def get(
+        self, src_code: str, src_path: None | str | Path = None
+    ) -> Optional[AtopileParser.File_inputContext]:
+        """Return the cached tree for some source code, or None if there isn't one."""
+        cache_path = self._get_path(src_code, src_path)
+        try:
+            data = cache_path.read_bytes()
+        except OSError:
+            self.misses += 1
+            return None
+
+        header = _make_header(src_code, src_path)
+        if not data.startswith(header):
+            log.debug("Ignoring parse cache entry %s, which isn't for %s", cache_path, src_path)
+            self.misses += 1
+            return None
+
+        try:
+            tree = deserialize_tree(data[len(header):], src_code, src_path)
+        except Exception as ex:  # pylint: disable=broad-except
+            # protect against corrupt or incompatible cache files
+            log.debug("Failed to load cached parse tree for %s: %s", src_path, ex)
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return tree
+
+    def put(
+        self,
+        src_code: str,
+        tree: AtopileParser.File_inputContext,
+        src_path: None | str | Path = None,
+    ) -> None:
+        """Save a freshly parsed tree to the cache."""
+        self.put_data(src_code, serialize_tree(tree), src_path)
+
+    def put_data(
+        self, src_code: str, data: bytes, src_path: None | str | Path = None
+    ) -> None:
+        """
+        Save an already serialized tree to the cache.
+
+        Any older entries for the same file are removed.
+        """
+        cache_path = self._get_path(src_code, src_path)
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            # Write to a temporary file first, so concurrent builds
+            # never see a partially written entry
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(_make_header(src_code, src_path))
+                    f.write(data)
+                os.replace(tmp_path, cache_path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        except OSError as ex:
+            log.debug("Failed to write parse cache entry: %s", ex)
+            return
+
+        for old_path in self.cache_dir.glob(_get_path_key(src_path) + "-*.pickle"):
+            if old_path != cache_path:
+                old_path.unlink(missing_ok=True)
+
+    def prune(self, max_age: float = MAX_ENTRY_AGE) -> None:
+        """Remove entries, and left-over temporary files, older than max_age seconds."""
+        cutoff = time.time() - max_age
+        try:
+            paths = list(self.cache_dir.iterdir())
+        except OSError:
+            return
+        for path in paths:
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+            except OSError:
+                # eg. another build got to it first
+                continue
+
+    def log_stats(self) -> None:
+        """Log how effective the cache has been."""
+        log.info("Parse cache: %d hits, %d misses", self.hits, self.misses)
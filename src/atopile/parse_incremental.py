@@ -0,0 +1,238 @@
+"""
+Incrementally re-parse a file after it's been edited.
+
+Rather than throwing away the whole parse tree when a file changes, we find
+the top-level statements the edit touched, re-parse just that region of the
+new source and splice the results into the existing tree. Everything outside
+the region keeps its identity, so the objects the front end has already
+built from it can be kept too.
+
+We only do this when the edit is confined to block definitions. Anything else,
+eg. a change to the imports, falls back to a full re-parse.
+"""
+
+import logging
+from typing import Iterator, Optional
+
+from antlr4 import CommonTokenStream, InputStream, ParserRuleContext, Token
+from antlr4.tree.Tree import TerminalNodeImpl
+from attrs import define
+
+from atopile.parse import parse_file_input
+from atopile.parse_cache import CachedTokenSource
+from atopile.parser.AtopileLexer import AtopileLexer
+from atopile.parser.AtopileParser import AtopileParser
+
+log = logging.getLogger(__name__)
+
+_NEXT_STMT = "pass\n"
+
+
+@define
+class Splice:
+    """The top-level statements replaced by an incremental re-parse."""
+
+    old_stmts: list[AtopileParser.StmtContext]
+    new_stmts: list[AtopileParser.StmtContext]
+
+    @property
+    def old_blockdefs(self) -> list[AtopileParser.BlockdefContext]:
+        return [_get_blockdef(stmt) for stmt in self.old_stmts]
+
+    @property
+    def new_blockdefs(self) -> list[AtopileParser.BlockdefContext]:
+        return [_get_blockdef(stmt) for stmt in self.new_stmts]
+
+
+def _get_blockdef(stmt: AtopileParser.StmtContext) -> Optional[AtopileParser.BlockdefContext]:
+    """Return the blockdef a top-level statement defines, if it is one."""
+    if compound_stmt := stmt.compound_stmt():
+        return compound_stmt.blockdef()
+    return None
+
+
+def get_src_code(tree: AtopileParser.File_inputContext) -> str:
+    """Return the source code a tree was parsed from."""
+    return tree.start.getInputStream().strdata
+
+
+def _iter_tokens(ctx: ParserRuleContext) -> Iterator[Token]:
+    """Yield all the tokens in a tree, possibly more than once."""
+    stack = [ctx]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, TerminalNodeImpl):
+            yield node.symbol
+            continue
+        if node.start is not None:
+            yield node.start
+        if node.stop is not None:
+            yield node.stop
+        stack.extend(node.children or ())
+
+
+def _parse_region(
+    src_code: str, src_name, start: int, stop: int, line: int
+) -> tuple[AtopileParser.File_inputContext, AtopileLexer]:
+    """
+    Parse the top-level statements in src_code[start:stop].
+
+    The region must start and end at the start of a top-level statement (or
+    the end of the file), so the lexer's indentation tracking starts and ends
+    at zero. Tokens get the same positions they would in a full parse.
+    """
+    # The lexer treats newlines near the end of the input differently, so if
+    # the region isn't at the end of the file, we follow it with a stand-in
+    # for the next statement and drop it afterwards
+    at_end = stop >= len(src_code)
+    input_stream = InputStream(src_code[:stop] + ("" if at_end else _NEXT_STMT))
+    input_stream.name = src_name
+    input_stream.seek(start)
+    lexer = AtopileLexer(input_stream)
+    lexer.line = line
+    lexer.column = 0
+    parser = AtopileParser(CommonTokenStream(lexer))
+    tree = parse_file_input(parser)
+
+    if not at_end:
+        next_stmt = tree.children[-2]
+        assert next_stmt.start.start == stop
+        del tree.children[-2]
+
+    return tree, lexer
+
+
+def reparse_incrementally(
+    tree: AtopileParser.File_inputContext, new_src_code: str
+) -> Optional[Splice]:
+    """
+    Update a tree in-place to reflect new source code.
+
+    Returns what was spliced in, or None if the edit can't be handled
+    incrementally, in which case the tree is left untouched and the
+    file should be re-parsed from scratch.
+    """
+    old_src_code = get_src_code(tree)
+    if old_src_code == new_src_code:
+        return Splice([], [])
+
+    # Find the edited region, as the bits that differ between the old and new
+    max_common = min(len(old_src_code), len(new_src_code))
+    prefix_len = 0
+    while (
+        prefix_len < max_common
+        and old_src_code[prefix_len] == new_src_code[prefix_len]
+    ):
+        prefix_len += 1
+    suffix_len = 0
+    while (
+        suffix_len < max_common - prefix_len
+        and old_src_code[-suffix_len - 1] == new_src_code[-suffix_len - 1]
+    ):
+        suffix_len += 1
+    old_edit_stop = len(old_src_code) - suffix_len
+
+    # Find the top-level statements the edit touched. The statement before
+    # the edit is included, since the edit may have extended its block - so
+    # long as it is a block, as an import can't be extended
+    stmts: list[AtopileParser.StmtContext] = tree.stmt()
+    first, last = None, -1
+    for i, stmt in enumerate(stmts):
+        if stmt.start.start < prefix_len:
+            first = i
+        if stmt.start.start <= old_edit_stop:
+            last = i
+    if (
+        first is not None
+        and first < last
+        and stmts[first + 1].start.start == prefix_len
+        and _get_blockdef(stmts[first]) is None
+    ):
+        first += 1
+    if first is None:
+        # The edit starts before any statements
+        first, region_start = 0, 0
+    else:
+        region_start = stmts[first].start.start
+    old_stmts = stmts[first : last + 1]
+
+    # The region ends at the start of the next untouched statement
+    if last + 1 < len(stmts):
+        old_region_stop = stmts[last + 1].start.start
+    else:
+        old_region_stop = len(old_src_code)
+    char_delta = len(new_src_code) - len(old_src_code)
+    line_delta = new_src_code.count("\n") - old_src_code.count("\n")
+    region_start_line = old_src_code.count("\n", 0, region_start) + 1
+
+    src_name = tree.start.getInputStream().name
+    try:
+        region_tree, region_lexer = _parse_region(
+            new_src_code,
+            src_name,
+            region_start,
+            old_region_stop + char_delta,
+            region_start_line,
+        )
+    except Exception:  # pylint: disable=broad-except
+        # Let a full parse report the error
+        return None
+
+    new_stmts: list[AtopileParser.StmtContext] = region_tree.stmt()
+    splice = Splice(old_stmts, new_stmts)
+    if None in splice.old_blockdefs or None in splice.new_blockdefs:
+        return None
+
+    # Swap the region's children over
+    old_source = tree.start.getTokenSource()
+    children = tree.children
+    first_child = children.index(stmts[first]) if region_start else 0
+    if last + 1 < len(stmts):
+        stop_child = children.index(stmts[last + 1])
+    else:
+        stop_child = len(children) - 1  # the EOF
+    new_children = region_tree.children[:-1]  # without the EOF
+    for child in new_children:
+        child.parentCtx = tree
+    children[first_child:stop_child] = new_children
+    if not region_start:
+        first_node = children[0]
+        if isinstance(first_node, TerminalNodeImpl):
+            tree.start = first_node.symbol
+        else:
+            tree.start = first_node.start
+
+    # Make all the tokens refer to the new source, and shift those after the
+    # region to account for the edit
+    old_region_stop_line = old_src_code.count("\n", 0, old_region_stop) + 1
+    comments = {}
+    for (name, line), comment in getattr(old_source, "comments", {}).items():
+        if line < region_start_line:
+            comments[(name, line)] = comment
+        elif line >= old_region_stop_line:
+            comments[(name, line + line_delta)] = comment
+    comments.update(region_lexer.comments)
+
+    new_input_stream = InputStream(new_src_code)
+    new_input_stream.name = src_name
+    source_pair = (CachedTokenSource(comments), new_input_stream)
+
+    new_tokens = {id(token) for token in _iter_tokens(region_tree)}
+    seen = set()
+    for token in _iter_tokens(tree):
+        if id(token) in seen:
+            continue
+        seen.add(id(token))
+        if id(token) not in new_tokens and token.start >= old_region_stop:
+            token.start += char_delta
+            token.stop += char_delta
+            token.line += line_delta
+        token.source = source_pair
+
+    log.debug(
+        "Re-parsed %d top-level statements of %s in place of %d",
+        len(new_stmts),
+        src_name,
+        len(old_stmts),
+    )
+    return splice
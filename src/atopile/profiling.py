@@ -0,0 +1,275 @@
+"""
+Time where a build spends its time.
+
+Phases of the build are marked with `profiler.phase(name)`. When the profiler
+isn't running, a phase costs next to nothing, so they're left in place
+permanently.
+
+Phases nest - eg. Lofty triggers Dizzy, which triggers Scoop, which triggers
+parsing - and the time spent in a nested phase is counted only towards that
+phase, so the phases of a report add up to the total.
+
+Only phases on the thread that started the profiler are counted. Work
+farmed out to other threads is counted towards whichever phase is waiting
+on it.
+"""
+
+import cProfile
+import json
+import sys
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Optional
+
+import rich
+from attrs import define, field
+from rich.table import Table
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows
+    resource = None
+
+
+def _get_peak_rss() -> int:
+    """Return the peak resident set size of the process in bytes, or 0 if unknown."""
+    if resource is None:
+        return 0
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS, and kilobytes everywhere else
+    return peak_rss if sys.platform == "darwin" else peak_rss * 1024
+
+
+@define
+class PhaseStats:
+    """What a phase of the build cost, excluding any phases nested within it."""
+
+    calls: int = 0
+    wall: float = 0.0
+    cpu: float = 0.0
+    peak_rss_growth: int = 0
+
+
+@define
+class _ActivePhase:
+    name: str
+    wall_start: float
+    cpu_start: float
+    peak_rss_start: int
+    nested_wall: float = 0.0
+    nested_cpu: float = 0.0
+    nested_peak_rss_growth: int = 0
+
+
+@define
+class ProfileReport:
+    """The results of profiling a build."""
+
+    name: str
+    wall: float
+    cpu: float
+    peak_rss: int
+    phases: dict[str, PhaseStats]
+    cprofile_path: Optional[Path] = None
+
+    def to_dict(self) -> dict:
+        return {
+            "version": 1,
+            "build": self.name,
+            "wall_s": self.wall,
+            "cpu_s": self.cpu,
+            "peak_rss_bytes": self.peak_rss,
+            "phases": {
+                name: {
+                    "calls": stats.calls,
+                    "wall_s": stats.wall,
+                    "cpu_s": stats.cpu,
+                    "peak_rss_growth_bytes": stats.peak_rss_growth,
+                }
+                for name, stats in self.phases.items()
+            },
+            "cprofile": str(self.cprofile_path) if self.cprofile_path else None,
+        }
+
+    def write(self, path: Path) -> None:
+        """Write the report to a JSON file."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def print(self) -> None:
+        """Print the report as a table."""
+        table = Table(show_header=True, header_style="bold green", title=f"Profile of {self.name}")
+        table.add_column("Phase")
+        table.add_column("Calls", justify="right")
+        table.add_column("Wall (s)", justify="right")
+        table.add_column("Wall %", justify="right")
+        table.add_column("CPU (s)", justify="right")
+        table.add_column("Peak RSS +(MB)", justify="right")
+
+        for name, stats in sorted(self.phases.items(), key=lambda x: -x[1].wall):
+            table.add_row(
+                name,
+                str(stats.calls),
+                f"{stats.wall:.3f}",
+                f"{100 * stats.wall / self.wall:.1f}" if self.wall else "-",
+                f"{stats.cpu:.3f}",
+                f"{stats.peak_rss_growth / 1e6:.1f}",
+            )
+        table.add_section()
+        table.add_row(
+            "total", "", f"{self.wall:.3f}", "100.0", f"{self.cpu:.3f}", f"{self.peak_rss / 1e6:.1f}"
+        )
+        rich.print(table)
+
+
+@define
+class Profiler:
+    """Collects the time and memory spent in each phase of a build."""
+
+    running: bool = False
+    _phases: dict[str, PhaseStats] = field(factory=dict)
+    _stack: list[_ActivePhase] = field(factory=list)
+    _cprofile: Optional[cProfile.Profile] = None
+    _thread_id: Optional[int] = None
+
+    def start(self, use_cprofile: bool = False) -> None:
+        """Start profiling, forgetting anything profiled before."""
+        self._phases = {}
+        self._stack = []
+        self.running = True
+        self._thread_id = threading.get_ident()
+        self._enter("other")
+        if use_cprofile:
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+
+    def stop(self, name: str, cprofile_path: Optional[Path] = None) -> ProfileReport:
+        """
+        Stop profiling, and return a report of everything since it was started.
+
+        If cProfile was used, its stats are written to cprofile_path.
+        """
+        if self._cprofile is None:
+            cprofile_path = None
+        else:
+            self._cprofile.disable()
+            if cprofile_path is not None:
+                cprofile_path.parent.mkdir(parents=True, exist_ok=True)
+                self._cprofile.dump_stats(cprofile_path)
+            self._cprofile = None
+
+        # Close anything left open, eg. by an exception
+        while len(self._stack) > 1:
+            self._exit()
+        root = self._stack[0]
+        wall = time.perf_counter() - root.wall_start
+        cpu = time.process_time() - root.cpu_start
+        self._exit()
+        self.running = False
+
+        return ProfileReport(
+            name=name,
+            wall=wall,
+            cpu=cpu,
+            peak_rss=_get_peak_rss(),
+            phases=self._phases,
+            cprofile_path=cprofile_path,
+        )
+
+    def _enter(self, name: str) -> None:
+        self._stack.append(
+            _ActivePhase(name, time.perf_counter(), time.process_time(), _get_peak_rss())
+        )
+
+    def _exit(self) -> None:
+        active = self._stack.pop()
+        wall = time.perf_counter() - active.wall_start
+        cpu = time.process_time() - active.cpu_start
+        peak_rss_growth = _get_peak_rss() - active.peak_rss_start
+
+        stats = self._phases.setdefault(active.name, PhaseStats())
+        stats.calls += 1
+        stats.wall += wall - active.nested_wall
+        stats.cpu += cpu - active.nested_cpu
+        stats.peak_rss_growth += peak_rss_growth - active.nested_peak_rss_growth
+
+        if self._stack:
+            parent = self._stack[-1]
+            parent.nested_wall += wall
+            parent.nested_cpu += cpu
+            parent.nested_peak_rss_growth += peak_rss_growth
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Count everything within this context towards a phase of the build."""
+        if not self.running or threading.get_ident() != self._thread_id:
+            yield
+            return
+
+        self._enter(name)
+        try:
+            yield
+        finally:
+            self._exit()
+
+
+profiler = Profiler()
+
+
+@define
+class LatencyHistogram:
+    """How long a kind of request took, eg. to the components database."""
+
+    # The upper bounds of the buckets, in seconds
+    BOUNDS = (0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0, 10.0, 20.0)
+
+    _samples: list[float] = field(factory=list)
+
+    def record(self, seconds: float) -> None:
+        """Record how long a request took. Safe to call from any thread."""
+        self._samples.append(seconds)
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        """Record how long everything within this context takes."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(time.perf_counter() - start)
+
+    @property
+    def count(self) -> int:
+        return len(self._samples)
+
+    def get_percentile(self, percentile: float) -> float:
+        """Return the latency below which a given percent of requests took."""
+        if not self._samples:
+            return 0.0
+        samples = sorted(self._samples)
+        return samples[min(len(samples) - 1, int(len(samples) * percentile / 100))]
+
+    def get_buckets(self) -> list[tuple[float, int]]:
+        """
+        Return the number of requests in each bucket, by the bucket's upper bound.
+
+        The last bucket, bounded by infinity, holds everything else.
+        """
+        counts = [0] * (len(self.BOUNDS) + 1)
+        for sample in self._samples:
+            counts[bisect_left(self.BOUNDS, sample)] += 1
+        return list(zip((*self.BOUNDS, float("inf")), counts))
+
+    def get_summary(self) -> str:
+        """Return a one-line summary of the latencies."""
+        if not self._samples:
+            return "no requests"
+        return (
+            f"{self.count} requests, p50 {self.get_percentile(50):.3f}s,"
+            f" p90 {self.get_percentile(90):.3f}s, max {max(self._samples):.3f}s"
+        )
@@ -1,7 +1,14 @@
+import hashlib
+import logging
 import os
 import shutil
 import stat
+import tempfile
+from contextlib import contextmanager
 from pathlib import Path
+from typing import Iterator, TextIO
+
+log = logging.getLogger(__name__)
 
 
 def robustly_rm_dir(path: Path) -> None:
@@ -12,3 +19,48 @@ def robustly_rm_dir(path: Path) -> None:
         func(path)
 
     shutil.rmtree(path, onerror=remove_readonly)
+
+
+def _hash_file(path: Path) -> str:
+    """Return the SHA-256 of a file's contents."""
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+@contextmanager
+def open_if_changed(path: Path, encoding: str = "utf-8") -> Iterator[TextIO]:
+    """
+    Open a file to write, but only replace it if what's written is different.
+
+    What's written goes to a temporary file alongside the original, which
+    then replaces it only if their contents differ. An unchanged file keeps
+    its mtime, so nothing downstream thinks it needs rebuilding. If writing
+    raises, the original is left as it was.
+    """
+    path = Path(path)
+    with tempfile.NamedTemporaryFile(
+        "w", encoding=encoding, dir=path.parent, prefix=f".{path.name}.", delete=False
+    ) as f:
+        tmp_path = Path(f.name)
+        try:
+            yield f
+        except BaseException:
+            f.close()
+            tmp_path.unlink()
+            raise
+
+    if not path.exists():
+        # temporary files are only readable by us, unlike a file made with open()
+        umask = os.umask(0)
+        os.umask(umask)
+        os.chmod(tmp_path, 0o666 & ~umask)
+    elif _hash_file(path) == _hash_file(tmp_path):
+        log.debug("%s is unchanged, not rewriting it", path)
+        tmp_path.unlink()
+        return
+    else:
+        shutil.copymode(path, tmp_path)
+    os.replace(tmp_path, path)
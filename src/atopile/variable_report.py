@@ -45,7 +45,7 @@ def generate(build_ctx: config.BuildContext):
     Generate a report of all the variables in the design
     """
     report = VariableReport()
-    for addr in instance_methods.all_descendants(build_ctx.entry):
+    for addr in instance_methods.all_descendants_indexed(build_ctx.entry):
         log.debug("Generating report for %s", addr)
         instance = instance_methods.get_instance(addr)
         for key, assignments in instance.assignments.items():
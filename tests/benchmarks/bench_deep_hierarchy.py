@@ -0,0 +1,133 @@
+"""
+Benchmark walking deep hierarchies.
+
+Builds a design of modules nested to a given depth, each with a row of
+LEDs - like an LED matrix built up from nested modules - and compares
+walking it with the iterative all_descendants, _common_children and
+dfs_postorder against the recursive generators they replaced.
+
+Also walks a plain chain of objects much deeper than the recursion limit,
+which the recursive generators can't walk at all.
+
+Run with: python tests/benchmarks/bench_deep_hierarchy.py [depth] [leds_per_level]
+"""
+
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from atopile import front_end, instance_methods
+from atopile.generic_methods import dfs_postorder, recurse
+
+DEFAULT_DEPTH = 100
+DEFAULT_LEDS_PER_LEVEL = 20
+CHAIN_LENGTH = 100_000
+
+
+def _generated_source(depth: int, leds_per_level: int) -> str:
+    lines = ["component Led:", "    pin a", "    pin k", ""]
+    for level in range(depth):
+        lines.append(f"module Level{level}:")
+        lines += [f"    led{i} = new Led" for i in range(leds_per_level)]
+        if level < depth - 1:
+            lines += [f"    child = new Level{level + 1}", "    led0.k ~ child.led0.a"]
+        lines.append("")
+    return "\n".join(lines)
+
+
+def _recursive_all_descendants(addr: str):
+    for child in instance_methods.get_children(addr):
+        yield from _recursive_all_descendants(child)
+    yield addr
+
+
+def _recursive_common_children(*instances):
+    for child in instances[0].children:
+        if all(child in i.children for i in instances[1:]):
+            yield from _recursive_common_children(*(i.children[child] for i in instances))
+            yield tuple(i.children[child] for i in instances)
+
+
+def _recursive_dfs_postorder(get_children, start):
+    for child in get_children(start):
+        yield from _recursive_dfs_postorder(get_children, child)
+    yield start
+
+
+def _recursive_recurse(get_next, start):
+    yield start
+    next_item = get_next(start)
+    if next_item is not None:
+        yield from _recursive_recurse(get_next, next_item)
+
+
+def _time(func, *args) -> tuple[float, list]:
+    start = time.perf_counter()
+    result = list(func(*args))
+    return time.perf_counter() - start, result
+
+
+class _Link:
+    def __init__(self, next_link):
+        self.next = next_link
+        self.children = [next_link] if next_link else []
+
+
+def main():
+    depth = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_DEPTH
+    leds_per_level = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_LEDS_PER_LEVEL
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        src_path = Path(tmp_dir) / "deep.ato"
+        src_path.write_text(_generated_source(depth, leds_per_level))
+        entry = str(src_path) + ":Level0"
+
+        # Building the instances (and the recursive generators) still recurse
+        # once per level, so make some room for them
+        recursion_limit = sys.getrecursionlimit()
+        sys.setrecursionlimit(max(recursion_limit, depth * 50))
+        build_start = time.perf_counter()
+        root = front_end.lofty.get_instance(entry)
+        build_time = time.perf_counter() - build_start
+
+        rows = []
+        old_time, old = _time(_recursive_all_descendants, entry)
+        new_time, new = _time(instance_methods.all_descendants, entry)
+        assert old == new
+        rows.append(("all_descendants", old_time, new_time, len(new)))
+
+        old_time, old = _time(_recursive_common_children, root, root)
+        new_time, new = _time(instance_methods._common_children, root, root)
+        assert old == new
+        rows.append(("_common_children", old_time, new_time, len(new)))
+
+        old_time, old = _time(_recursive_dfs_postorder, instance_methods.get_children, entry)
+        new_time, new = _time(dfs_postorder, instance_methods.get_children, entry)
+        assert old == new
+        rows.append(("dfs_postorder", old_time, new_time, len(new)))
+        sys.setrecursionlimit(recursion_limit)
+
+    print(f"Built {depth} levels of {leds_per_level} LEDs in {build_time:.2f}s")
+    print(f"{'':20} {'recursive (s)':>14} {'iterative (s)':>14} {'items':>8}")
+    for name, old_time, new_time, n_items in rows:
+        print(f"{name:20} {old_time:14.3f} {new_time:14.3f} {n_items:8}")
+
+    # A chain much deeper than the recursion limit
+    chain = None
+    for _ in range(CHAIN_LENGTH):
+        chain = _Link(chain)
+    print(f"\nA chain of {CHAIN_LENGTH} items, with a recursion limit of {sys.getrecursionlimit()}")
+    for name, old_func, new_func, args in [
+        ("dfs_postorder", _recursive_dfs_postorder, dfs_postorder, (lambda x: x.children, chain)),
+        ("recurse", _recursive_recurse, recurse, (lambda x: x.next, chain)),
+    ]:
+        try:
+            old_result = f"{_time(old_func, *args)[0]:14.3f}"
+        except RecursionError:
+            old_result = f"{'RecursionError':>14}"
+        print(f"{name:20} {old_result} {_time(new_func, *args)[0]:14.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Benchmark joining things together in a LoopSoup.
+
+Compares the union-find behind LoopSoup against joining LoopItems directly,
+which is what LoopSoup used to do. Joining loops is O(n) per join, so it's
+only run on the smaller cases.
+
+Run with: python tests/benchmarks/bench_loop_soup.py
+"""
+
+import random
+import time
+
+from atopile.loop_soup import LoopItem, LoopSoup
+
+CASES = [
+    # (nodes, joins)
+    (1_000, 10_000),
+    (10_000, 100_000),
+    (100_000, 1_000_000),
+]
+MAX_LOOP_ITEM_NODES = 10_000
+
+
+def _random_joins(n_nodes: int, n_joins: int) -> list[tuple[int, int]]:
+    rng = random.Random(0)
+    return [(rng.randrange(n_nodes), rng.randrange(n_nodes)) for _ in range(n_joins)]
+
+
+def _bench_loop_soup(n_nodes: int, joins: list[tuple[int, int]]) -> tuple[float, int]:
+    start = time.perf_counter()
+    soup = LoopSoup()
+    for i in range(n_nodes):
+        soup.add(i)
+    for a, b in joins:
+        soup.join(a, b)
+    n_groups = sum(1 for _ in soup.groups())
+    return time.perf_counter() - start, n_groups
+
+
+def _bench_loop_items(n_nodes: int, joins: list[tuple[int, int]]) -> tuple[float, int]:
+    start = time.perf_counter()
+    items = [LoopItem(i) for i in range(n_nodes)]
+    for a, b in joins:
+        LoopItem.join(items[a], items[b])
+    seen = set()
+    n_groups = 0
+    for item in items:
+        if item.represents not in seen:
+            seen.update(item.iter_values())
+            n_groups += 1
+    return time.perf_counter() - start, n_groups
+
+
+def main():
+    print(f"{'nodes':>8} {'joins':>10} {'groups':>8} {'union-find (s)':>15} {'loops (s)':>10}")
+    for n_nodes, n_joins in CASES:
+        joins = _random_joins(n_nodes, n_joins)
+        soup_time, n_groups = _bench_loop_soup(n_nodes, joins)
+        if n_nodes <= MAX_LOOP_ITEM_NODES:
+            loop_time, loop_groups = _bench_loop_items(n_nodes, joins)
+            assert loop_groups == n_groups
+            loop_str = f"{loop_time:10.3f}"
+        else:
+            loop_str = f"{'-':>10}"
+        print(f"{n_nodes:>8} {n_joins:>10} {n_groups:>8} {soup_time:15.3f} {loop_str}")
+
+
+if __name__ == "__main__":
+    main()
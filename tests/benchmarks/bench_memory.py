@@ -0,0 +1,89 @@
+"""
+Benchmark the memory held by the instance tree of a large design.
+
+Builds a generated design of about 50k instances and reports how many bytes
+the instance tree holds per instance, with and without templates.
+
+Run with: python tests/benchmarks/bench_memory.py
+"""
+
+import gc
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from atopile import front_end
+from atopile.instance_methods import all_descendants
+
+TARGET_INSTANCES = 50_000
+
+# Each Cell is 13 instances: itself, 4 resistors and their 8 pins
+_INSTANCES_PER_CELL = 13
+
+
+def _generated_source(n_cells: int) -> str:
+    """A design made of many copies of a small module."""
+    lines = [
+        "component Resistor:",
+        "    pin 1",
+        "    pin 2",
+        "    resistance: resistance",
+        '    footprint = "R0402"',
+        "",
+        "module Cell:",
+        "    signal a",
+        "    signal b",
+    ]
+    for i in range(4):
+        lines += [
+            f"    r{i} = new Resistor",
+            f"    r{i}.1 ~ a",
+            f"    r{i}.2 ~ b",
+            f"    r{i}.resistance = {i + 1}kohm +/- 1%",
+        ]
+    lines += ["    assert r0.resistance < r1.resistance", "", "module Top:"]
+    lines += [f"    c{i} = new Cell" for i in range(n_cells)]
+    return "\n".join(lines) + "\n"
+
+
+def _measure(src_path: Path, use_templates: bool) -> tuple[int, int, float]:
+    """Return the instances built, the bytes they hold and the time it took."""
+    entry = str(src_path) + ":Top"
+    front_end.reset_caches(src_path)
+    front_end.lofty.use_templates = use_templates
+
+    # Get parsing and the layers out of the way, so we only count the instances
+    front_end.dizzy.get_layer(entry)
+
+    gc.collect()
+    tracemalloc.start()
+    start_bytes = tracemalloc.get_traced_memory()[0]
+    start_time = time.perf_counter()
+    front_end.lofty.get_instance(entry)
+    build_time = time.perf_counter() - start_time
+    gc.collect()
+    held_bytes = tracemalloc.get_traced_memory()[0] - start_bytes
+    tracemalloc.stop()
+
+    n_instances = sum(1 for _ in all_descendants(entry))
+    return n_instances, held_bytes, build_time
+
+
+def main():
+    n_cells = TARGET_INSTANCES // _INSTANCES_PER_CELL
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        src_path = Path(tmp_dir) / "memory.ato"
+        src_path.write_text(_generated_source(n_cells))
+
+        print(f"{'templates':>10} {'instances':>10} {'MB':>8} {'bytes/inst':>11} {'build (s)':>10}")
+        for use_templates in (False, True):
+            n_instances, held_bytes, build_time = _measure(src_path, use_templates)
+            print(
+                f"{str(use_templates):>10} {n_instances:>10} {held_bytes / 1e6:8.1f}"
+                f" {held_bytes / n_instances:11.0f} {build_time:10.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
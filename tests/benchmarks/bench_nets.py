@@ -0,0 +1,108 @@
+"""
+Benchmark finding the nets of a large design.
+
+Compares get_nets against finding them address-by-address, with the
+instance_methods matchers and a LoopSoup, as it used to be done.
+
+Run with: python tests/benchmarks/bench_nets.py [n_pins]
+"""
+
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from atopile import errors, front_end, nets
+from atopile.address import add_instance, get_name
+from atopile.instance_methods import (
+    all_descendants,
+    get_children,
+    get_links,
+    match_interfaces,
+    match_pins_and_signals,
+)
+from atopile.loop_soup import LoopSoup
+
+DEFAULT_PINS = 200_000
+
+# Each Cell has 4 resistors with 2 pins, 2 signals and a power interface of 2,
+# and each Row has 50 Cells and its own power interface. The design is nested
+# like this to keep the source, and so the time to parse it, small
+_PINS_PER_CELL = 12
+_CELLS_PER_ROW = 50
+_PINS_PER_ROW = _PINS_PER_CELL * _CELLS_PER_ROW + 2
+
+
+def _generated_source(n_rows: int) -> str:
+    lines = [
+        "interface Power:",
+        "    signal vcc",
+        "    signal gnd",
+        "",
+        "component Resistor:",
+        "    pin 1",
+        "    pin 2",
+        "",
+        "module Cell:",
+        "    power = new Power",
+        "    signal a",
+        "    signal b",
+    ]
+    for i in range(4):
+        lines += [f"    r{i} = new Resistor", f"    r{i}.1 ~ a", f"    r{i}.2 ~ b"]
+    lines += ["    a ~ power.vcc", "", "module Row:", "    power = new Power"]
+    for i in range(_CELLS_PER_ROW):
+        lines += [f"    c{i} = new Cell", f"    c{i}.power ~ power"]
+    lines += ["", "module Top:", "    power = new Power"]
+    for i in range(n_rows):
+        lines += [f"    r{i} = new Row", f"    r{i}.power ~ power"]
+    return "\n".join(lines) + "\n"
+
+
+def _get_nets_by_address(root: str) -> list[tuple[str]]:
+    """Find the nets the old way, going via addresses for everything."""
+    net_soup = LoopSoup()
+    for addr in all_descendants(root):
+        if match_pins_and_signals(addr):
+            net_soup.add(addr)
+        for link in get_links(addr):
+            source = link.source.addr
+            target = link.target.addr
+            if match_interfaces(source) and match_interfaces(target):
+                for int_pin in get_children(source):
+                    net_soup.join(int_pin, add_instance(target, get_name(int_pin)))
+            elif match_pins_and_signals(source) and match_pins_and_signals(target):
+                net_soup.join(source, target)
+            else:
+                raise errors.AtoTypeError("Bad link")
+    return list(net_soup.groups())
+
+
+def _time(func, *args) -> tuple[float, list]:
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    n_pins = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_PINS
+    n_rows = max(n_pins // _PINS_PER_ROW, 1)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        src_path = Path(tmp_dir) / "nets.ato"
+        src_path.write_text(_generated_source(n_rows))
+        entry = str(src_path) + ":Top"
+
+        build_time, _ = _time(front_end.lofty.get_instance, entry)
+        print(f"Built {n_rows * _PINS_PER_ROW + 2} pins in {build_time:.2f}s")
+
+        new_time, new_nets = _time(nets.get_nets, entry)
+        old_time, old_nets = _time(_get_nets_by_address, entry)
+        assert sorted(map(sorted, new_nets)) == sorted(map(sorted, old_nets))
+
+        print(f"{'':20} {'time (s)':>10} {'nets':>8}")
+        print(f"{'by address':20} {old_time:10.3f} {len(old_nets):8}")
+        print(f"{'get_nets':20} {new_time:10.3f} {len(new_nets):8}")
+
+
+if __name__ == "__main__":
+    main()
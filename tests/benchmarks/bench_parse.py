@@ -0,0 +1,132 @@
+"""
+Benchmark parsing the test projects with SLL-first, two-stage parsing.
+
+ANTLR's lexer and parser share their DFAs (and the parser its prediction
+context cache) between instances, so whichever mode runs first warms them
+for the other. To keep the comparison fair, every timed parse starts from
+fresh DFAs, and the order the modes run in is shuffled on every repeat.
+
+Each mode is timed both cold (parsing with fresh DFAs) and warm (parsing
+again after one untimed parse of the same source in the same mode), and
+the spread over the repeats is reported.
+
+Run with: python tests/benchmarks/bench_parse.py
+"""
+
+import random
+import statistics
+import time
+from pathlib import Path
+
+from antlr4.dfa.DFA import DFA
+from antlr4.PredictionContext import PredictionContextCache
+
+from atopile import parse
+from atopile.parser.AtopileLexer import AtopileLexer
+from atopile.parser.AtopileParser import AtopileParser
+
+REPO_ROOT = Path(__file__).parent.parent.parent
+SOURCES = [
+    REPO_ROOT / "tests" / "test_front_end" / "prj" / "test.ato",
+    REPO_ROOT / "docs" / "ato-demos" / "ldo_demo.ato",
+    REPO_ROOT / "docs" / "ato-demos" / "cumulative_operators.ato",
+]
+REPEATS = 7
+
+
+def _generated_source(n_modules: int = 50) -> str:
+    """Something resembling a large, generated .ato file."""
+    lines = ["component Resistor:", "    pin 1", "    pin 2", "    resistance: resistance", ""]
+    for i in range(n_modules):
+        lines += [
+            f"module Divider{i}:",
+            "    signal top",
+            "    signal out",
+            "    signal bottom",
+            "    r_top = new Resistor",
+            "    r_bottom = new Resistor",
+            "    r_top.1 ~ top; r_top.2 ~ out",
+            "    r_bottom.1 ~ out; r_bottom.2 ~ bottom",
+            f"    r_top.resistance = {i + 1}kohm +/- 1%",
+            "    r_bottom.resistance = 10kohm to 20kohm",
+            "    assert r_top.resistance / (r_top.resistance + r_bottom.resistance) within 0.1 to 0.9",
+            "",
+        ]
+    return "\n".join(lines)
+
+
+def _reset_dfas() -> None:
+    """Throw away everything the lexer and parser have learnt from earlier parses."""
+    for recognizer in (AtopileLexer, AtopileParser):
+        recognizer.decisionsToDFA = [
+            DFA(state, i) for i, state in enumerate(recognizer.atn.decisionToState)
+        ]
+    AtopileParser.sharedContextCache = PredictionContextCache()
+
+
+def _parse_ll_only(src_code: str, src_path: str):
+    input = parse.InputStream(src_code)
+    input.name = src_path
+    parser = parse.make_parser(input)
+    with parse.defer_parser_errors(parser):
+        return parser.file_input()
+
+
+MODES = {
+    "LL": _parse_ll_only,
+    "SLL+LL": parse.parse_text_as_file,
+}
+
+
+def _time_once(func, src_code: str, src_path: str, warm: bool) -> float:
+    _reset_dfas()
+    if warm:
+        func(src_code, src_path)
+    start = time.perf_counter()
+    func(src_code, src_path)
+    return time.perf_counter() - start
+
+
+def _bench(src_code: str, src_path: str, warm: bool, rng: random.Random) -> dict[str, list[float]]:
+    times = {mode: [] for mode in MODES}
+    for _ in range(REPEATS):
+        order = list(MODES)
+        rng.shuffle(order)
+        for mode in order:
+            times[mode].append(_time_once(MODES[mode], src_code, src_path, warm))
+    return times
+
+
+def _spread(times: list[float]) -> str:
+    return f"{min(times):.4f}/{statistics.median(times):.4f}/{max(times):.4f}"
+
+
+def main():
+    cases = [(str(p.relative_to(REPO_ROOT)), parse.read_src_file(p)) for p in SOURCES]
+    cases.append(("<generated>", _generated_source()))
+    rng = random.Random()
+
+    print(f"times in seconds as min/median/max over {REPEATS} repeats")
+    print(
+        f"{'source':45} {'state':5} {'LL':>22} {'SLL+LL':>22}"
+        f" {'speedup (min/median/max)':>26}"
+    )
+    for name, src_code in cases:
+        for warm in (False, True):
+            times = _bench(src_code, name, warm, rng)
+            # Pair the modes' runs up by repeat, as they ran back to back
+            ratios = [ll / sll for ll, sll in zip(times["LL"], times["SLL+LL"])]
+            speedup = (
+                f"{min(ratios):.2f}x/{statistics.median(ratios):.2f}x/{max(ratios):.2f}x"
+            )
+            print(
+                f"{name:45} {'warm' if warm else 'cold':5}"
+                f" {_spread(times['LL']):>22} {_spread(times['SLL+LL']):>22}"
+                f" {speedup:>26}"
+            )
+
+    _reset_dfas()
+
+
+if __name__ == "__main__":
+    main()
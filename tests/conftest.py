@@ -0,0 +1,105 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from attrs import define, field
+
+from atopile import components, config
+
+
+@define
+class ComponentServer:
+    """A stand-in for the components database, served locally."""
+
+    url: str = ""
+    # the specs posted to the server, in the order they arrived
+    requests: list[dict] = field(factory=list)
+    # specs with this value have no matching component
+    missing_value: str = "missing"
+    # specs with this value fail to be looked up
+    failing_value: str = "failing"
+    # how long to take to respond, in seconds
+    delay: float = 0.0
+    max_concurrent: int = 0
+    _concurrent: int = 0
+    _lock: threading.Lock = field(factory=threading.Lock)
+
+    def respond(self, spec: dict) -> tuple[int, dict]:
+        """Return the status and body to respond to a spec with."""
+        if spec.get("value") == self.missing_value:
+            return 404, {}
+        if spec.get("value") == self.failing_value:
+            return 500, {}
+        key = json.dumps(spec, sort_keys=True)
+        return 200, {
+            "bestComponent": {
+                "lcsc_id": f"C{abs(hash(key)) % 100000}",
+                "description": f"{spec.get('value')} {spec.get('type')}",
+                "package": spec.get("package", ""),
+                "footprint": {"kicad": "R" + spec.get("package", "0402")},
+                "price_usd": 0.01,
+            }
+        }
+
+
+def _make_handler(server: ComponentServer):
+    class _Handler(BaseHTTPRequestHandler):
+        def do_POST(self):  # pylint: disable=invalid-name
+            spec = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            with server._lock:
+                server.requests.append(spec)
+                server._concurrent += 1
+                server.max_concurrent = max(server.max_concurrent, server._concurrent)
+            try:
+                time.sleep(server.delay)
+                status, body = server.respond(spec)
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+            finally:
+                with server._lock:
+                    server._concurrent -= 1
+
+        def log_message(self, *args):
+            pass
+
+    return _Handler
+
+
+@pytest.fixture
+def component_server(tmp_path, monkeypatch):
+    """
+    Serve a stand-in components database, and point a project in tmp_path at it.
+
+    The component caches are emptied for the test, so every lookup goes
+    to the server (or the project's component cache). The machine-wide
+    cache, if a test turns it on, is kept in tmp_path too.
+    """
+    server = ComponentServer()
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _make_handler(server))
+    server.url = f"http://127.0.0.1:{httpd.server_address[1]}/jlc"
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+
+    (tmp_path / "ato.yaml").write_text(
+        "ato-version: ^0.2.0\n"
+        "paths:\n"
+        "  src: ./\n"
+        "services:\n"
+        f"  components: {server.url}\n"
+    )
+    monkeypatch.setattr(config, "_project_context", config.ProjectContext.from_path(tmp_path))
+    monkeypatch.setattr(components, "_component_cache", None)
+    monkeypatch.setattr(components, "_shared_component_cache", None)
+    monkeypatch.setattr(components, "SHARED_CACHE_DIR", tmp_path / "shared-cache")
+    monkeypatch.setattr(components, "_resolved_specs", {})
+
+    yield server
+
+    httpd.shutdown()
+    httpd.server_close()
@@ -1,8 +1,16 @@
+import pickle
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
 import pytest
 
+from atopile import address
 from atopile.address import (
+    AddrStr,
     add_instance,
     add_instances,
+    forget_file,
+    get_entry,
     get_file,
     get_instance_section,
     get_parent_instance_addr,
@@ -82,3 +90,42 @@ def test_get_instances():
     assert get_instance_names("//a:b::") == []
     assert get_instance_names("//a:b::c") == ["c"]
     assert get_instance_names("//a:b::c.d") == ["c", "d"]
+
+
+def test_addr_str_interned():
+    addr = AddrStr("//a:b::c.d")
+    assert addr is AddrStr("//a:b::c.d")
+    assert addr == "//a:b::c.d"
+    assert add_instance("//a:b::c", "d") is addr
+    assert get_parent_instance_addr(addr) is AddrStr("//a:b::c")
+    assert pickle.loads(pickle.dumps(addr)) is addr
+    assert AddrStr(Path("//a")) is AddrStr("//a")
+
+
+def test_forget_file():
+    addr = AddrStr("//forget/a.ato:b::c")
+    kept = AddrStr("//forget/b.ato:b::c")
+    forget_file("//forget/a.ato")
+    assert address._parsed.keys().isdisjoint({addr, "//forget/a.ato", "//forget/a.ato:b"})
+    assert kept in address._parsed
+    assert AddrStr("//forget/a.ato:b::c") == addr
+    assert get_instance_section(addr) == "c"
+
+
+def test_plain_str_instances_not_kept():
+    get_instance_section("//kept/a.ato:b::c.d")
+    assert "//kept/a.ato:b::c.d" not in address._parsed
+    assert get_entry("//kept/a.ato:b::c.d") is AddrStr("//kept/a.ato:b")
+    assert get_entry("//kept/a.ato:b") is AddrStr("//kept/a.ato:b")
+
+
+def test_addr_str_interned_across_threads():
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        addrs = list(pool.map(AddrStr, ["//threads/a.ato:b::c"] * 64))
+    assert all(addr is addrs[0] for addr in addrs)
+
+
+def test_helpers_accept_plain_str():
+    addr = AddrStr("//a:b::c.d")
+    assert get_instance_section("//a:b::c.d") == get_instance_section(addr) == "c.d"
+    assert get_file(addr) == "//a"
@@ -0,0 +1,114 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from atopile.component_cache import ComponentCache, get_spec_hash
+
+
+def test_spec_hash():
+    assert get_spec_hash({"a": 1, "b": "2"}) == get_spec_hash({"b": "2", "a": 1})
+    assert get_spec_hash({"a": 1}) != get_spec_hash({"a": 2})
+
+
+def test_changes_are_written_on_flush(tmp_path):
+    path = tmp_path / "cache.sqlite"
+    cache = ComponentCache(path)
+    cache.put_part("h1", {"lcsc_id": "C1"}, {"value": "10k"})
+    cache.put_index("file.ato:Top::r1", "h1")
+
+    # visible straight away, but only written when flushed
+    assert cache.get_part("h1", max_age=60) == {"lcsc_id": "C1"}
+    other = ComponentCache(path)
+    assert other.get_part("h1", max_age=60) is None
+
+    cache.flush()
+    assert other.get_part("h1", max_age=60) == {"lcsc_id": "C1"}
+    assert other.get_spec_hash("file.ato:Top::r1") == "h1"
+    assert other.get_part("h1", max_age=-1) is None
+
+
+def test_failed_flush_writes_nothing(tmp_path):
+    cache = ComponentCache(tmp_path / "cache.sqlite")
+    cache.put_part("h1", {"lcsc_id": "C1"}, {"value": "10k"})
+    cache.put_part("h2", {"unserializable": object()}, {"value": "1k"})
+    with pytest.raises(TypeError):
+        cache.flush()
+    assert cache.count_parts() == 0
+
+
+def test_concurrent_writers(tmp_path):
+    path = tmp_path / "cache.sqlite"
+    ComponentCache(path).close()
+
+    def _build(i: int):
+        # each like a separate `ato build`, with its own connection
+        cache = ComponentCache(path)
+        for j in range(20):
+            cache.put_part(f"h{i}-{j}", {"lcsc_id": f"C{j}"}, {"value": j})
+            cache.put_index(f"file.ato:Top::r{i}-{j}", f"h{i}-{j}")
+            if j % 5 == 4:
+                cache.flush()
+        cache.close()
+
+    threads = [threading.Thread(target=_build, args=(i,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    cache = ComponentCache(path)
+    assert cache.count_parts() == 80
+    assert len(cache.get_index()) == 80
+
+
+def test_only_used_from_its_thread(tmp_path):
+    cache = ComponentCache(tmp_path / "cache.sqlite")
+    errors = []
+
+    def _use():
+        try:
+            cache.get_part("h1", max_age=60)
+        except sqlite3.ProgrammingError as ex:
+            errors.append(ex)
+
+    thread = threading.Thread(target=_use)
+    thread.start()
+    thread.join()
+    assert len(errors) == 1
+
+
+def test_clean(tmp_path):
+    path = tmp_path / "cache.sqlite"
+    cache = ComponentCache(path)
+    cache.put_part("old", {"lcsc_id": "C1"}, {"value": "10k"})
+    cache.put_part("new", {"lcsc_id": "C2"}, {"value": "1k"})
+    cache.put_index("file.ato:Top::r1", "old")
+    cache.put_index("file.ato:Top::r2", "new")
+    cache._pending_parts["old"]["timestamp"] = time.time() - 100
+    cache.flush()
+
+    cache.clean(max_age=50)
+    assert cache.count_parts() == 1
+    assert cache.get_index() == {"file.ato:Top::r2": "new"}
+    assert sqlite3.connect(path).execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+
+
+def test_evict_least_recently_used(tmp_path):
+    cache = ComponentCache(tmp_path / "cache.sqlite")
+    for spec_hash in ("a", "b", "c"):
+        cache.put_part(spec_hash, {"lcsc_id": spec_hash}, {"value": spec_hash})
+        cache.flush()
+        time.sleep(0.01)
+
+    # "a" is used, so "b" is now the least recently used
+    assert cache.get_part("a", max_age=60) is not None
+    assert cache.get_part("d", max_age=60) is None
+    cache.flush()
+
+    cache.evict(max_parts=2)
+    assert cache.get_part("b", max_age=60) is None
+    assert cache.get_part("a", max_age=60) is not None
+    assert cache.get_part("c", max_age=60) is not None
+    assert (cache.hits, cache.misses, cache.evictions) == (3, 2, 1)
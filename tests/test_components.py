@@ -0,0 +1,217 @@
+import json
+import textwrap
+import time
+
+import pytest
+
+from atopile import components, config, errors, front_end, instance_methods
+from atopile.component_cache import ComponentCache
+
+
+def _make_design(tmp_path, values: list[str]) -> str:
+    file = tmp_path / "generics.ato"
+    resistors = "\n".join(
+        f"    r{i} = new Resistor\n    r{i}.value = {value}" for i, value in enumerate(values)
+    )
+    file.write_text(
+        textwrap.dedent(
+            """
+            component Resistor:
+                pin 1
+                pin 2
+                mpn = "generic_resistor"
+                footprint = "R0402"
+
+            module Top:
+            """
+        )
+        + resistors
+        + "\n"
+    )
+    entry = str(file) + ":Top"
+    front_end.lofty.get_instance(entry)
+    return entry
+
+
+def test_prefetch_generics(tmp_path, component_server):
+    values = ['"10k"', '"10k"', '"1k"', '"10k"', '"1k"', '"4k7"']
+    entry = _make_design(tmp_path, values)
+    all_components = instance_methods.all_components(entry)
+
+    components.prefetch_generics(all_components, max_workers=2)
+
+    # identical specs are only looked up once, and only a few at a time
+    assert sorted(spec["value"] for spec in component_server.requests) == ["10k", "1k", "4k7"]
+    assert 1 <= component_server.max_concurrent <= 2
+
+    # and then everything's answered without going back to the server
+    mpns = [components.get_mpn(addr) for addr in all_components]
+    assert len(component_server.requests) == 3
+    assert mpns[0] == mpns[1] == mpns[3] != mpns[2]
+
+    # the results are in the project's component cache too
+    components.prefetch_generics(all_components)
+    assert len(component_server.requests) == 3
+    component_cache = components.get_component_cache()
+    assert component_cache.count_parts() == 3
+    assert set(component_cache.get_index()) == set(all_components)
+
+
+def test_prefetch_generics_errors(tmp_path, component_server):
+    entry = _make_design(tmp_path, ['"missing"', '"missing"', '"10k"'])
+    missing_a, missing_b, found = instance_methods.all_components(entry)
+
+    # errors don't stop the rest being fetched, and are raised on lookup
+    components.prefetch_generics([missing_a, missing_b, found])
+    assert len(component_server.requests) == 2
+
+    for addr in (missing_a, missing_b):
+        with pytest.raises(components.NoMatchingComponent) as exc_info:
+            components.get_mpn(addr)
+        assert exc_info.value.addr == addr
+    components.get_mpn(found)
+    assert len(component_server.requests) == 2
+
+
+def test_failed_lookups_are_retried(tmp_path, component_server):
+    entry = _make_design(tmp_path, ['"failing"', '"failing"'])
+    first, second = instance_methods.all_components(entry)
+
+    components.prefetch_generics([first, second])
+    assert len(component_server.requests) == 1
+    with pytest.raises(errors.AtoInfraError):
+        components.get_mpn(first)
+    assert len(component_server.requests) == 2
+
+    # once the database is back, the lookup succeeds
+    component_server.failing_value = ""
+    components.get_mpn(first)
+    components.get_mpn(second)
+    assert len(component_server.requests) == 3
+
+
+def test_cache_is_checked_once_per_spec(tmp_path, component_server):
+    entry = _make_design(tmp_path, ['"10k"', '"10k"', '"1k"'])
+    all_components = instance_methods.all_components(entry)
+    components.prefetch_generics(all_components)
+
+    # configuring the cache again forgets what's been resolved
+    components.configure_cache()
+    assert not components._resolved_specs
+    components.prefetch_generics(all_components)
+    for addr in all_components:
+        components.get_mpn(addr)
+
+    component_cache = components.get_component_cache()
+    assert component_cache.hits == 2
+    assert component_cache.misses == 0
+    assert len(component_server.requests) == 2
+
+
+def test_fetch_concurrency_limit(tmp_path, component_server):
+    config.get_project_context().config.services.components_max_concurrency = 3
+    component_server.delay = 0.05
+    entry = _make_design(tmp_path, [f'"{i}k"' for i in range(1, 11)])
+    latency_count = components.db_latency.count
+
+    components.prefetch_generics(instance_methods.all_components(entry))
+
+    assert len(component_server.requests) == 10
+    assert 1 < component_server.max_concurrent <= 3
+    assert components.db_latency.count == latency_count + 10
+    assert components.db_latency.get_percentile(50) >= 0.05
+
+
+def test_cache_is_keyed_by_spec(tmp_path, component_server):
+    entry = _make_design(tmp_path, ['"10k"', '"10k"'])
+    components.prefetch_generics(instance_methods.all_components(entry))
+    assert len(component_server.requests) == 1
+
+    # Another design, with components at other addresses but the same spec,
+    # shares the cached part - even once this process has forgotten it
+    components._resolved_specs.clear()
+    components._component_cache = None
+    renamed_file = tmp_path / "renamed.ato"
+    renamed_file.write_text(
+        (tmp_path / "generics.ato").read_text().replace("r0", "renamed")
+    )
+    renamed_entry = str(renamed_file) + ":Top"
+    front_end.lofty.get_instance(renamed_entry)
+    renamed = instance_methods.all_components(renamed_entry)
+
+    components.prefetch_generics(renamed)
+    assert len(component_server.requests) == 1
+    assert components.get_mpn(renamed[0]) == components.get_mpn(renamed[1])
+    component_cache = components.get_component_cache()
+    assert component_cache.count_parts() == 1
+    assert len(component_cache.get_index()) == 4
+
+
+def test_cache_upgrade(tmp_path, component_server):
+    spec = {"value": "10k", "type": "resistor", "package": "0402"}
+    old_cache = {
+        "file.ato:Top::r1": {"data": {"lcsc_id": "C1"}, "timestamp": time.time(), "address_data": spec},
+        "file.ato:Top::r2": {"data": {"lcsc_id": "C1"}, "timestamp": time.time(), "address_data": spec},
+    }
+    cache_path = tmp_path / ".ato" / "component_cache.json"
+    cache_path.parent.mkdir()
+    cache_path.write_text(json.dumps(old_cache))
+
+    assert components.get_component_from_cache(dict(spec)) == {"lcsc_id": "C1"}
+    component_cache = components.get_component_cache()
+    assert component_cache.count_parts() == 1
+    assert set(component_cache.get_index()) == set(old_cache)
+    assert not cache_path.exists()
+
+
+def test_shared_cache(tmp_path, component_server, monkeypatch):
+    config.get_project_context().config.services.components_shared_cache = True
+    entry = _make_design(tmp_path, ['"10k"', '"1k"'])
+    components.prefetch_generics(instance_methods.all_components(entry))
+    components.save_cache()
+    assert len(component_server.requests) == 2
+
+    # another project on the same machine reuses the parts
+    other_path = tmp_path / "other"
+    other_path.mkdir()
+    (other_path / "ato.yaml").write_text(
+        (tmp_path / "ato.yaml").read_text()
+        + "  components_shared_cache: true\n"
+        + "  components_shared_cache_max_parts: 1\n"
+    )
+    monkeypatch.setattr(config, "_project_context", config.ProjectContext.from_path(other_path))
+    components._component_cache = None
+    components._resolved_specs.clear()
+
+    other_entry = _make_design(other_path, ['"10k"', '"1k"'])
+    other_components = instance_methods.all_components(other_entry)
+    components.prefetch_generics(other_components)
+    assert components.get_mpn(other_components[0]) != components.get_mpn(other_components[1])
+    assert len(component_server.requests) == 2
+
+    shared_cache = components.get_shared_component_cache()
+    assert shared_cache.hits == 2
+    assert shared_cache.misses == 0
+
+    # copied into the project's cache, and the shared one's kept to size
+    assert components.get_component_cache().count_parts() == 2
+    assert shared_cache.count_parts() == 1
+    assert shared_cache.evictions == 1
+
+
+def test_shared_cache_not_cleaned_by_project(tmp_path, component_server):
+    spec = {"value": "10k", "type": "resistor", "package": "0402"}
+    spec_hash = components.get_spec_hash(spec)
+    shared_path = components.SHARED_CACHE_DIR / "component_cache.sqlite"
+    shared_cache = ComponentCache(shared_path)
+    shared_cache.put_part(spec_hash, {"lcsc_id": "C1"}, spec, time.time() - 3600)
+    shared_cache.flush()
+    shared_cache.close()
+
+    # a project that only keeps parts for a minute doesn't use the part,
+    # but leaves it for other projects
+    services = config.get_project_context().config.services
+    services.components_shared_cache = True
+    services.components_cache_ttl_days = 1 / (24 * 60)
+    assert components.get_component_from_cache(dict(spec)) is None
+    assert components.get_shared_component_cache().count_parts() == 1
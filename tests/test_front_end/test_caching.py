@@ -1,7 +1,7 @@
 import textwrap
 from pathlib import Path
 
-from atopile import front_end, parse
+from atopile import address, front_end, parse
 from atopile.front_end import parser
 
 PRJ = Path(__file__).parent / "prj"
@@ -30,7 +30,134 @@ def test_caching():
 
     # Clear it out, to make sure it's re-parsed
     front_end.reset_caches(MODULE)
+    assert MODULE not in address._parsed
 
     # Parse something else to make sure it's re-parsed
     root_2 = front_end.lofty.get_instance(MODULE)
     assert root_1 is not root_2
+
+
+def test_incremental_reparse(tmp_path: Path):
+    file = tmp_path / "incremental.ato"
+    file.write_text(
+        textwrap.dedent(
+            """
+            module A:
+                a = 1
+
+            module B:
+                b = 2
+            """
+        )
+    )
+    file_str = str(file)
+    a_addr = file_str + ":A"
+    b_addr = file_str + ":B"
+
+    tree = parser.get_ast_from_file(file_str)
+    assert front_end.lofty.get_instance(b_addr).assignments["b"][0].value == 2
+    a_def = front_end.scoop.get_obj_def(a_addr)
+    a_layer = front_end.dizzy.get_layer(a_addr)
+
+    file.write_text(file.read_text().replace("b = 2", "b = 3\n    c = 4"))
+    front_end.reset_caches(file_str)
+
+    # The tree is patched in-place, and only B is rebuilt
+    assert parser.get_ast_from_file(file_str) is tree
+    assert front_end.scoop.get_obj_def(a_addr) is a_def
+    assert front_end.dizzy.get_layer(a_addr) is a_layer
+
+    b = front_end.lofty.get_instance(b_addr)
+    assert b.assignments["b"][0].value == 3
+    assert b.assignments["c"][0].value == 4
+    assert parse.parse_text_as_file(file.read_text(), file).toStringTree(
+        recog=parse.AtopileParser
+    ) == tree.toStringTree(recog=parse.AtopileParser)
+
+
+def test_invalidates_only_dependents(tmp_path: Path, monkeypatch):
+    monkeypatch.setattr(front_end.scoop, "get_search_paths", lambda: [tmp_path])
+    (tmp_path / "a.ato").write_text("module A:\n    a = 1\n")
+    (tmp_path / "b.ato").write_text(
+        'from "a.ato" import A\nmodule B from A:\n    b = 2\n'
+    )
+    (tmp_path / "c.ato").write_text("module C:\n    c = 3\n")
+    a_file, b_file, c_file = (str(tmp_path / f) for f in ("a.ato", "b.ato", "c.ato"))
+
+    b_1 = front_end.lofty.get_instance(b_file + ":B")
+    c_1 = front_end.lofty.get_instance(c_file + ":C")
+    assert front_end.scoop.get_dependent_files({a_file}) == {a_file, b_file}
+
+    # Changing C shouldn't affect B
+    front_end.reset_caches(c_file)
+    assert front_end.lofty.get_instance(b_file + ":B") is b_1
+    c_2 = front_end.lofty.get_instance(c_file + ":C")
+    assert c_2 is not c_1
+
+    # But B is built from A, so changing A should
+    (tmp_path / "a.ato").write_text("module A:\n    a = 4\n")
+    front_end.reset_caches(a_file)
+    b_2 = front_end.lofty.get_instance(b_file + ":B")
+    assert b_2 is not b_1
+    assert b_2.assignments["a"][0].value == 4
+    assert front_end.lofty.get_instance(c_file + ":C") is c_2
+
+
+def test_templates(tmp_path: Path):
+    file = tmp_path / "templates.ato"
+    file.write_text(
+        textwrap.dedent(
+            """
+            component Resistor:
+                pin 1
+                pin 2
+                resistance: resistance
+
+            component BigResistor from Resistor:
+                footprint = "R0805"
+
+            module Divider:
+                signal out
+                r_top = new Resistor
+                r_bot = new Resistor
+                r_top.2 ~ out
+                r_bot.1 ~ out
+                ratio = r_bot.resistance / (r_top.resistance + r_bot.resistance)
+
+            module Top:
+                d1 = new Divider
+                d2 = new Divider
+                d3 = new Divider
+                d3.r_top -> BigResistor
+                d1.r_top.resistance = 10kohm
+                d1.r_bot.resistance = 10kohm
+                d2.r_top.resistance = 30kohm
+                d2.r_bot.resistance = 10kohm
+            """
+        )
+    )
+    top_addr = str(file) + ":Top"
+    top = front_end.lofty.get_instance(top_addr)
+    d1, d2, d3 = (top.children[name] for name in ("d1", "d2", "d3"))
+
+    # Clones are independent of each other
+    assert d1.children["r_top"] is not d2.children["r_top"]
+    assert d1.assignments is not d2.assignments
+    assert d2.links[0].source.parent is d2.children["r_top"]
+    d1_resistance = d1.children["r_top"].assignments["resistance"][0].value
+    d2_resistance = d2.children["r_top"].assignments["resistance"][0].value
+    assert d1_resistance.min_val == 10
+    assert d2_resistance.min_val == 30
+
+    # Replacements still apply to clones
+    assert d3.children["r_top"].supers[0].address.endswith(":BigResistor")
+    assert d2.children["r_top"].supers[0].address.endswith(":Resistor")
+
+    # Expressions refer to the clone's own attributes
+    d2_addr = top_addr + "::d2"
+    ratio = d2.assignments["ratio"][0].value
+    context = {
+        d2_addr + ".r_top.resistance": 30,
+        d2_addr + ".r_bot.resistance": 10,
+    }
+    assert ratio(context) == 0.25
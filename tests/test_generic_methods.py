@@ -1,5 +1,7 @@
+import sys
+
 import pytest
-from atopile.generic_methods import dfs_postorder, bfs
+from atopile.generic_methods import dfs_postorder, bfs, recurse
 
 
 class Node:
@@ -46,3 +48,19 @@ def test_bfs(tree: tuple[Node]):
 def test_dfs_postorder(tree: tuple[Node]):
     a, b, c, d, e, f, g, h = tree
     assert list(dfs_postorder(lambda n: n.children, a)) == [e, f, b, g, h, c, d, a]
+
+
+def test_recurse():
+    chain = {"a": "b", "b": "c"}
+    assert list(recurse(chain.get, "a")) == ["a", "b", "c"]
+
+
+def test_deep_trees():
+    # Deeper than the recursion limit
+    depth = sys.getrecursionlimit() * 2
+    nodes = [Node(i, []) for i in range(depth)]
+    for parent, child in zip(nodes, nodes[1:]):
+        parent.children = [child]
+
+    assert list(dfs_postorder(lambda n: n.children, nodes[0])) == nodes[::-1]
+    assert list(recurse(lambda n: n.children[0] if n.children else None, nodes[0])) == nodes
@@ -0,0 +1,40 @@
+import textwrap
+
+import pytest
+
+from atopile.import_scanner import scan_imports
+
+
+@pytest.mark.parametrize(
+    "src, expected",
+    [
+        ('from "a.ato" import A', [("a.ato", ["A"])]),
+        ('from "a.ato" import A, B.C', [("a.ato", ["A", "B.C"])]),
+        ("import A from 'a.ato'", [("a.ato", ["A"])]),
+        ('# from "a.ato" import A', []),
+        ('x = "from \\"a.ato\\" import A"', []),
+        ('"""\nfrom "a.ato" import A\n"""', []),
+        ('from \\\n    "a.ato" import A', [("a.ato", ["A"])]),
+        ("module A from B:\n    pass", []),
+    ],
+)
+def test_scan_imports(src: str, expected):
+    assert scan_imports(src) == expected
+
+
+def test_nested_imports():
+    src = textwrap.dedent(
+        """
+        from "a.ato" import A  # a comment
+        import B from "b.ato"
+
+        module C from A:
+            from "c.ato" import D; signal e
+            f = new D
+        """
+    )
+    assert scan_imports(src) == [
+        ("a.ato", ["A"]),
+        ("b.ato", ["B"]),
+        ("c.ato", ["D"]),
+    ]
@@ -1,6 +1,12 @@
-from atopile import instance_methods
+import sys
+import textwrap
 from unittest.mock import MagicMock
 
+import pytest
+
+from atopile import address, errors, front_end, instance_methods
+from atopile.front_end import Kind
+
 
 def test_common_children():
     a = MagicMock()
@@ -20,3 +26,136 @@ def test_common_children():
 
     b = MagicMock(children={"a": MagicMock(children={})})
     assert list(instance_methods._common_children(a, b)) == [(a.children["a"], b.children["a"])]
+
+
+def test_common_children_deep():
+    # Deeper than the recursion limit
+    def _make_chain():
+        nodes = [MagicMock(children={}) for _ in range(sys.getrecursionlimit() * 2)]
+        for parent, child in zip(nodes, nodes[1:]):
+            parent.children = {"x": child}
+        return nodes
+
+    a, b = _make_chain(), _make_chain()
+    assert list(instance_methods._common_children(a[0], b[0])) == list(zip(a[1:], b[1:]))[::-1]
+
+
+def test_match_by_kind(tmp_path):
+    file = tmp_path / "kinds.ato"
+    file.write_text(
+        textwrap.dedent(
+            """
+            interface Power:
+                signal vcc
+
+            component Resistor:
+                pin 1
+
+            module Top:
+                power = new Power
+                r1 = new Resistor
+            """
+        )
+    )
+    top = str(file) + ":Top"
+    power = address.add_instance(top, "power")
+    r1 = address.add_instance(top, "r1")
+    pin = address.add_instance(r1, "1")
+    vcc = address.add_instance(power, "vcc")
+
+    assert instance_methods.match_modules(top)
+    assert not instance_methods.match_components(top)
+    # Components are modules too
+    assert instance_methods.match_components(r1)
+    assert instance_methods.match_modules(r1)
+
+    assert instance_methods.match_pins(pin)
+    assert not instance_methods.match_pins(vcc)
+    assert instance_methods.match_signals(vcc)
+    assert instance_methods.match_pins_and_signals(pin)
+    assert instance_methods.match_pins_and_signals(vcc)
+    assert instance_methods.match_interfaces(power)
+    assert all(map(instance_methods.match_sentinels, [top, power, r1, pin, vcc]))
+
+
+def test_all_descendants_of_kind(tmp_path):
+    file = tmp_path / "kinds.ato"
+    file.write_text(
+        textwrap.dedent(
+            """
+            component Resistor:
+                pin 1
+                pin 2
+
+            module Half:
+                r1 = new Resistor
+                signal a
+
+            module Top:
+                left = new Half
+                right = new Half
+                r1 = new Resistor
+            """
+        )
+    )
+    top = str(file) + ":Top"
+    left = address.add_instance(top, "left")
+
+    for root in [top, left, address.add_instance(left, "r1")]:
+        descendants = list(instance_methods.all_descendants(root))
+        for kind, matcher in [
+            (Kind.COMPONENT, instance_methods.match_components),
+            (Kind.MODULE, instance_methods.match_modules),
+            (Kind.PIN | Kind.SIGNAL, instance_methods.match_pins_and_signals),
+            (Kind.INTERFACE, instance_methods.match_interfaces),
+        ]:
+            assert instance_methods.all_descendants_of_kind(root, kind) == list(
+                filter(matcher, descendants)
+            )
+
+
+def test_descendant_index(tmp_path):
+    file = tmp_path / "index.ato"
+    file.write_text(
+        textwrap.dedent(
+            """
+            component Resistor:
+                pin 1
+                pin 2
+
+            module Half:
+                r1 = new Resistor
+                signal a
+
+            module Top:
+                left = new Half
+                right = new Half
+            """
+        )
+    )
+    top = str(file) + ":Top"
+    left = address.add_instance(top, "left")
+    left_r1 = address.add_instance(left, "r1")
+
+    index = instance_methods.get_descendant_index(top)
+    assert index is instance_methods.get_descendant_index(left_r1)
+
+    for addr in [top, left, left_r1]:
+        assert instance_methods.all_descendants_indexed(addr) == list(
+            instance_methods.all_descendants(addr)
+        )
+        preorder = index.get_preorder(addr)
+        assert preorder[0] == addr
+        assert sorted(preorder) == sorted(index.get_postorder(addr))
+
+    assert index.get_parent(top) is None
+    assert index.get_parent(left_r1) == left
+    assert instance_methods.get_depth(top) == 0
+    assert instance_methods.get_depth(address.add_instance(left_r1, "1")) == 3
+
+    with pytest.raises(errors.AtoKeyError):
+        index.get_depth(address.add_instance(top, "nope"))
+
+    # Rebuilding the tree drops its index
+    front_end.reset_caches(str(file))
+    assert instance_methods.get_descendant_index(top) is not index
@@ -1,3 +1,5 @@
+import random
+
 import pytest
 
 from atopile.loop_soup import LoopItem, LoopSoup
@@ -118,3 +120,77 @@ def test_loop_soup():
         assert len(group) == 2
         assert a == i * 2
         assert b == a + 1
+
+
+def test_loop_soup_joining_groups():
+    soup = LoopSoup()
+    for i in range(10):
+        soup.add(i)
+
+    # Join up two chains, then join the chains together
+    for i in range(0, 4):
+        soup.join(i, i + 1)
+    for i in range(5, 9):
+        soup.join(i + 1, i)
+    soup.join(9, 2)
+    # Joining things already in the same group does nothing
+    soup.join(0, 9)
+
+    # Things go around the loop LoopItems would make
+    assert list(soup.groups()) == [(0, 1, 5, 6, 7, 8, 9, 2, 3, 4)]
+    assert soup.get_group(7) == (0, 1, 5, 6, 7, 8, 9, 2, 3, 4)
+    assert tuple(soup.get_loop(7)) == (7, 8, 9, 2, 3, 4, 0, 1, 5, 6)
+
+
+def test_loop_soup_join_multiple():
+    soup = LoopSoup()
+    for i in "abcdef":
+        soup.add(i)
+
+    soup.join_multiple("ace")
+    soup.join_multiple("fb")
+
+    assert list(soup.groups()) == [("a", "e", "c"), ("b", "f"), ("d",)]
+    assert "a" in soup
+    assert "z" not in soup
+    assert len(soup) == 6
+
+    with pytest.raises(KeyError):
+        soup.add("a")
+    with pytest.raises(KeyError):
+        soup.join("a", "z")
+
+
+def test_loop_soup_net_order():
+    """Nets are named from the order of their nodes, so it mustn't change"""
+    soup = LoopSoup()
+    for addr in ("sub.x", "b", "c"):
+        soup.add(addr)
+    soup.join("b", "c")
+    soup.join("sub.x", "b")
+    assert list(soup.groups()) == [("sub.x", "c", "b")]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_loop_soup_matches_loop_items(seed: int):
+    rng = random.Random(seed)
+    n_things = 50
+    soup = LoopSoup()
+    items = [LoopItem(i) for i in range(n_things)]
+    for i in range(n_things):
+        soup.add(i)
+    for _ in range(60):
+        a, b = rng.randrange(n_things), rng.randrange(n_things)
+        soup.join(a, b)
+        LoopItem.join(items[a], items[b])
+
+    # groups from the loops, the way LoopSoup used to find them
+    expected, seen = [], set()
+    for item in items:
+        if item.represents not in seen:
+            expected.append(tuple(item))
+            seen.update(item)
+
+    assert list(soup.groups()) == expected
+    for i in range(n_things):
+        assert tuple(soup.get_loop(i)) == tuple(items[i])
@@ -0,0 +1,248 @@
+import io
+import textwrap
+
+from atopile import config, front_end
+from atopile.kicad6_datamodel import (
+    KicadComponent,
+    KicadField,
+    KicadLibpart,
+    KicadNet,
+    KicadNetlist,
+    KicadNode,
+    KicadPin,
+    KicadProperty,
+    KicadSheetpath,
+)
+from atopile.netlist import NetlistBuilder, write_kicad_netlist
+from atopile.netlist_diff import NetlistSummary, diff_netlists
+
+
+def _make_netlist() -> KicadNetlist:
+    resistor = KicadLibpart(
+        lib="lib",
+        part="RC0402",
+        description="resistors.ato:Resistor",
+        docs="~",
+        footprints=["*"],
+        pins=[KicadPin(name="1", type="stereo"), KicadPin(name="2", type="stereo")],
+    )
+    bare = KicadLibpart(lib="lib", part="None", description="", docs="")
+    fancy = KicadLibpart(
+        lib="lib",
+        part="X",
+        description="d",
+        docs="~",
+        footprints=["a", "b"],
+        fields=[KicadField(name="Reference", value="U")],
+    )
+    return KicadNetlist(
+        components=[
+            KicadComponent(
+                ref="R1",
+                value="10kΩ",
+                libsource=resistor,
+                tstamp="t1",
+                src_path="a",
+                footprint="lib:R0402",
+                sheetpath=KicadSheetpath(names="a.ato:Top::r1", tstamps="t1"),
+                properties=[
+                    KicadProperty(name="dnp"),
+                    KicadProperty(name="Sheetfile", value="x.kicad_sch"),
+                ],
+            ),
+            KicadComponent(
+                ref="U1",
+                value="?",
+                libsource=fancy,
+                tstamp="t2",
+                src_path="b",
+                fields=[KicadField(name="Datasheet", value="~")],
+            ),
+        ],
+        libparts=[resistor, bare, fancy],
+        nets=[
+            KicadNet(
+                code=1,
+                name="vcc",
+                nodes=[
+                    KicadNode(ref="R1", pin="1"),
+                    KicadNode(ref="U1", pin="3", pintype="passive"),
+                ],
+            ),
+            KicadNet(code=2, name="empty"),
+        ],
+    )
+
+
+# What the netlist's Jinja template used to render for _make_netlist()
+_EXPECTED_NETLIST = """\
+(export (version "E")
+  (design
+    (source "unknown")
+    (date "")
+    (tool "atopile"))
+  (components
+    (comp (ref "R1")
+      (value "10kΩ")
+      (footprint "lib:R0402")
+      (property (name "dnp"))
+      (property (name "Sheetfile") (value "x.kicad_sch"))
+      (libsource (lib "lib") (part "RC0402") (description "resistors.ato:Resistor"))
+      (sheetpath (names "a.ato:Top::r1") (tstamps "t1"))
+      (tstamps "t1"))
+    (comp (ref "U1")
+      (value "?")
+      (fields
+        (field (name "Datasheet") "~"))
+      (libsource (lib "lib") (part "X") (description "d"))
+      (sheetpath (names "/") (tstamps "/"))
+      (tstamps "t2")))
+  (libparts
+    (libpart (lib "lib") (part "RC0402")
+      (description "resistors.ato:Resistor")
+      (docs "~")
+      (footprints
+        (fp "*"))
+      (pins
+        (pin (num "1") (name "1") (type "stereo"))
+        (pin (num "2") (name "2") (type "stereo"))))
+    (libpart (lib "lib") (part "None"))
+    (libpart (lib "lib") (part "X")
+      (description "d")
+      (docs "~")
+      (footprints
+        (fp "a")
+        (fp "b"))
+      (fields
+        (field (name "Reference") "U"))))
+  (nets
+    (net (code "1") (name "vcc")
+      (node (ref "R1") (pin "1") (pintype "stereo"))
+      (node (ref "U1") (pin "3") (pintype "passive")))
+    (net (code "2") (name "empty"))))
+"""
+
+
+def _write(netlist: KicadNetlist) -> str:
+    f = io.StringIO()
+    write_kicad_netlist(netlist, f)
+    return f.getvalue()
+
+
+def test_write_kicad_netlist():
+    assert _write(_make_netlist()) == _EXPECTED_NETLIST
+
+
+def test_write_empty_kicad_netlist():
+    assert _write(KicadNetlist()) == textwrap.dedent(
+        """\
+        (export (version "E")
+          (design
+            (source "unknown")
+            (date "")
+            (tool "atopile")))
+        """
+    )
+
+
+def test_write_kicad_netlist_escapes_strings():
+    netlist = KicadNetlist(
+        source='C:\\my "project"',
+        nets=[KicadNet(code=1, name='a"b\\c', nodes=[KicadNode(ref="R1", pin="1")])],
+    )
+    written = _write(netlist)
+    assert '(source "C:\\\\my \\"project\\"")' in written
+    assert '(name "a\\"b\\\\c")' in written
+
+
+def test_builder_writes_what_it_builds(tmp_path, monkeypatch):
+    (tmp_path / "ato.yaml").write_text("ato-version: ^0.2.0\npaths:\n  src: ./\n")
+    monkeypatch.setattr(config, "_project_context", config.ProjectContext.from_path(tmp_path))
+    file = tmp_path / "netlist.ato"
+    file.write_text(
+        textwrap.dedent(
+            """
+            component Resistor:
+                pin 1
+                pin 2
+                footprint = "R0402"
+                value = "10k"
+                mpn = "generic"
+
+            component Cap:
+                pin 1
+                pin 2
+                footprint = "C0402"
+                value = "1u"
+                mpn = "generic"
+
+            module Top:
+                r1 = new Resistor
+                r2 = new Resistor
+                c1 = new Cap
+                r1.1 ~ r2.1
+                r2.2 ~ c1.1
+            """
+        )
+    )
+    entry = str(file) + ":Top"
+    front_end.lofty.get_instance(entry)
+
+    f = io.StringIO()
+    NetlistBuilder().write(entry, f)
+    assert f.getvalue() == _write(NetlistBuilder().build(entry))
+    assert f.getvalue().count("(comp ") == 3
+    assert f.getvalue().count("(libpart ") == 2
+
+
+def test_netlist_summary():
+    summary = NetlistSummary.from_str(_EXPECTED_NETLIST)
+    assert summary.components == {
+        "R1": {"value": "10kΩ", "footprint": "lib:R0402", "part": "RC0402"},
+        "U1": {"value": "?", "footprint": "", "part": "X"},
+    }
+    assert summary.nets == {
+        "vcc": frozenset({("R1", "1"), ("U1", "3")}),
+        "empty": frozenset(),
+    }
+
+    # what's escaped on the way out is unescaped on the way back in
+    netlist = KicadNetlist(nets=[KicadNet(code=1, name='a"b\\c')])
+    assert list(NetlistSummary.from_str(_write(netlist)).nets) == ['a"b\\c']
+
+
+def test_diff_netlists():
+    old = NetlistSummary(
+        components={
+            "R1": {"value": "10k", "footprint": "lib:R0402", "part": "A"},
+            "R2": {"value": "10k", "footprint": "lib:R0402", "part": "A"},
+        },
+        nets={
+            "vcc": frozenset({("R1", "1")}),
+            "gnd": frozenset({("R1", "2"), ("R2", "2")}),
+            "old-name": frozenset({("R2", "1")}),
+        },
+    )
+    new = NetlistSummary(
+        components={
+            "R1": {"value": "1k", "footprint": "lib:R0402", "part": "B"},
+            "C1": {"value": "1u", "footprint": "lib:C0402", "part": "C"},
+        },
+        nets={
+            "vcc": frozenset({("R1", "1"), ("C1", "1")}),
+            "new-name": frozenset({("R2", "1")}),
+            "sig": frozenset({("C1", "2")}),
+        },
+    )
+
+    diff = diff_netlists(old, new)
+    assert diff.added_components == ["C1"]
+    assert diff.removed_components == ["R2"]
+    assert diff.changed_components == {"R1": {"value": ("10k", "1k"), "part": ("A", "B")}}
+    assert diff.added_nets == ["sig"]
+    assert diff.removed_nets == ["gnd"]
+    assert diff.renamed_nets == [("old-name", "new-name")]
+    assert diff.changed_nets == {"vcc": ([("C1", "1")], [])}
+    assert "~ net old-name renamed to new-name" in diff.get_lines()
+
+    assert not diff_netlists(new, new)
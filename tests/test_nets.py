@@ -1,5 +1,13 @@
+import gc
+import random
+import textwrap
+import weakref
+
 import pytest
-from atopile.nets import _Net
+
+from atopile import address, errors, front_end, nets
+from atopile.loop_soup import LoopSoup
+from atopile.nets import _Net, get_nets
 
 @pytest.fixture
 def net():
@@ -21,3 +29,395 @@ def test_net_name(net: _Net, prefix, base, suffix, expected):
     net.base_name = base
     net.suffix = suffix
     assert net.get_name() == expected
+
+
+def test_get_nets(tmp_path):
+    file = tmp_path / "nets.ato"
+    file.write_text(
+        textwrap.dedent(
+            """
+            interface Power:
+                signal vcc
+                signal gnd
+
+            component Resistor:
+                pin 1
+                pin 2
+
+            module Top:
+                power = new Power
+                other_power = new Power
+                r1 = new Resistor
+                r2 = new Resistor
+                signal floating
+                power ~ other_power
+                r1.1 ~ power.vcc
+                r1.2 ~ r2.1
+                r2.2 ~ other_power.gnd
+            """
+        )
+    )
+    top = str(file) + ":Top"
+
+    nets = {
+        frozenset(address.get_instance_section(node) for node in net)
+        for net in get_nets(top)
+    }
+    assert nets == {
+        frozenset({"power.vcc", "other_power.vcc", "r1.1"}),
+        frozenset({"power.gnd", "other_power.gnd", "r2.2"}),
+        frozenset({"r1.2", "r2.1"}),
+        frozenset({"floating"}),
+    }
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_group_nets_in_loop_order(seed: int):
+    """Nets' nodes come out in the order a LoopSoup puts them"""
+    rng = random.Random(seed)
+    n_nodes = rng.randint(1, 30)
+    edges = [(rng.randrange(n_nodes), rng.randrange(n_nodes)) for _ in range(40)]
+    soup = LoopSoup()
+    for i in range(n_nodes):
+        soup.add(i)
+    for a, b in edges:
+        soup.join(a, b)
+
+    grouped = nets._group_nets(
+        list(range(n_nodes)), [a for a, _ in edges], [b for _, b in edges]
+    )
+    assert grouped == [list(group) for group in soup.groups()]
+
+
+def test_get_nets_interface_to_pin(tmp_path):
+    file = tmp_path / "nets.ato"
+    file.write_text(
+        textwrap.dedent(
+            """
+            interface Power:
+                signal vcc
+
+            module Top:
+                power = new Power
+                signal a
+                power ~ a
+            """
+        )
+    )
+    with pytest.raises(errors.AtoTypeError):
+        get_nets(str(file) + ":Top")
+
+
+def test_net_finder_updates_incrementally(tmp_path):
+    file = tmp_path / "incremental.ato"
+    top = str(file) + ":Top"
+    source = textwrap.dedent(
+        """
+        interface Power:
+            signal vcc
+            signal gnd
+
+        component Resistor:
+            pin 1
+            pin 2
+
+        module Half:
+            power = new Power
+            r1 = new Resistor
+            signal a
+            r1.1 ~ power.vcc
+            r1.2 ~ a
+
+        module Top:
+            left = new Half
+            right = new Half
+            signal unconnected
+            r1 = new Resistor
+            r1.1 ~ left.a
+            # CHANGE
+        """
+    )
+    changes = [
+        "left.power ~ right.power",
+        "r1.2 ~ unconnected",
+        "signal renamed\n    r1.2 ~ renamed",
+        'left.a.override_net_name = "overridden"',
+        "pass",
+    ]
+
+    file.write_text(source)
+    finder = nets.NetFinder()
+    assert finder.get_nets_by_name(top) == nets._find_net_names(get_nets(top))
+
+    for change in changes:
+        old_nets = {id(net) for net in finder._entries[top].nets}
+        file.write_text(source.replace("# CHANGE", change))
+        front_end.reset_caches(str(file))
+
+        # The same as a cold recompute, down to the order
+        nets_by_name = finder.get_nets_by_name(top)
+        expected = nets._find_net_names(get_nets(top))
+        assert list(nets_by_name.items()) == list(expected.items())
+        for name, nodes in expected.items():
+            for node in nodes:
+                assert finder.get_net_name_node_is_on(node) == name
+
+        # ... without finding every net again
+        assert old_nets & {id(net) for net in finder._entries[top].nets}
+
+
+
+def test_net_finder_not_kept_alive_by_lofty(tmp_path):
+    file = tmp_path / "listener.ato"
+    file.write_text("module Top:\n    signal a\n")
+    top = str(file) + ":Top"
+
+    finder = nets.NetFinder()
+    finder.get_nets_by_name(top)
+    finder_ref = weakref.ref(finder)
+    del finder
+    gc.collect()
+    assert finder_ref() is None
+
+    # Dropping a tree after the finder is gone calls nothing, and forgets it
+    listeners = len(front_end.lofty._tree_listeners)
+    front_end.reset_caches(str(file))
+    assert len(front_end.lofty._tree_listeners) < listeners
+
+# Names produced by the baseline, before LoopSoup or net naming were rebuilt
+# This design has prefixes, suffixes, overrides, interfaces and p1/p2 signals
+_NAMING_DESIGN = """
+interface Power:
+    signal vcc
+    signal gnd
+
+interface I2C:
+    signal sda
+    signal scl
+
+component Resistor:
+    signal p1 ~ pin 1
+    signal p2 ~ pin 2
+
+component Chip:
+    signal vdd ~ pin 1
+    signal gnd ~ pin 2
+    signal sda ~ pin 3
+    signal scl ~ pin 4
+    pin 5
+    power = new Power
+    power.vcc ~ vdd
+    power.gnd ~ gnd
+    i2c = new I2C
+    i2c.sda ~ sda
+    i2c.scl ~ scl
+
+component Lone:
+    pin 1
+    pin 2
+
+module PullUp:
+    power = new Power
+    i2c = new I2C
+    r_sda = new Resistor
+    r_scl = new Resistor
+    r_sda.p1 ~ power.vcc
+    r_sda.p2 ~ i2c.sda
+    r_scl.p1 ~ power.vcc
+    r_scl.p2 ~ i2c.scl
+
+module Sensor:
+    power = new Power
+    i2c = new I2C
+    chip = new Chip
+    pullup = new PullUp
+    signal out
+    signal enable
+    chip.power ~ power
+    chip.i2c ~ i2c
+    pullup.power ~ power
+    pullup.i2c ~ i2c
+    out ~ chip.5
+    lone = new Lone
+
+module Top:
+    power = new Power
+    i2c = new I2C
+    left = new Sensor
+    right = new Sensor
+    extra = new Sensor
+    signal out
+    signal spare_a
+    signal spare_b
+    left.power ~ power
+    right.power ~ power
+    left.i2c ~ i2c
+    right.i2c ~ i2c
+    out ~ left.out
+    spare_a ~ spare_b
+    r1 = new Resistor
+    r2 = new Resistor
+    r1.p1 ~ r2.p2
+    r1.p2 ~ extra.enable
+    right.out.override_net_name = "right_out"
+    lone = new Lone
+"""
+
+_EXPECTED_NET_NAMES = {
+    'vcc': [
+        'power.vcc',
+        'left.chip.1',
+        'left.chip.vdd',
+        'left.chip.power.vcc',
+        'left.pullup.r_sda.1',
+        'left.pullup.r_sda.p1',
+        'left.pullup.r_scl.1',
+        'left.pullup.r_scl.p1',
+        'left.pullup.power.vcc',
+        'left.power.vcc',
+        'right.chip.1',
+        'right.chip.vdd',
+        'right.chip.power.vcc',
+        'right.pullup.r_sda.1',
+        'right.pullup.r_sda.p1',
+        'right.pullup.r_scl.1',
+        'right.pullup.r_scl.p1',
+        'right.pullup.power.vcc',
+        'right.power.vcc',
+    ],
+    'gnd': [
+        'power.gnd',
+        'left.pullup.power.gnd',
+        'left.chip.2',
+        'left.chip.gnd',
+        'left.chip.power.gnd',
+        'left.power.gnd',
+        'right.pullup.power.gnd',
+        'right.chip.2',
+        'right.chip.gnd',
+        'right.chip.power.gnd',
+        'right.power.gnd',
+    ],
+    'sda': [
+        'i2c.sda',
+        'left.chip.3',
+        'left.chip.sda',
+        'left.chip.i2c.sda',
+        'left.pullup.r_sda.2',
+        'left.pullup.r_sda.p2',
+        'left.pullup.i2c.sda',
+        'left.i2c.sda',
+        'right.chip.3',
+        'right.chip.sda',
+        'right.chip.i2c.sda',
+        'right.pullup.r_sda.2',
+        'right.pullup.r_sda.p2',
+        'right.pullup.i2c.sda',
+        'right.i2c.sda',
+    ],
+    'scl': [
+        'i2c.scl',
+        'left.chip.4',
+        'left.chip.scl',
+        'left.chip.i2c.scl',
+        'left.pullup.r_scl.2',
+        'left.pullup.r_scl.p2',
+        'left.pullup.i2c.scl',
+        'left.i2c.scl',
+        'right.chip.4',
+        'right.chip.scl',
+        'right.chip.i2c.scl',
+        'right.pullup.r_scl.2',
+        'right.pullup.r_scl.p2',
+        'right.pullup.i2c.scl',
+        'right.i2c.scl',
+    ],
+    'left.chip-out': ['left.chip.5', 'left.out', 'out'],
+    'left-enable': ['left.enable'],
+    'net': ['left.lone.1'],
+    'net-1': ['left.lone.2'],
+    'right_out': ['right.chip.5', 'right.out'],
+    'right-enable': ['right.enable'],
+    'net-2': ['right.lone.1'],
+    'net-3': ['right.lone.2'],
+    'extra-vcc': [
+        'extra.power.vcc',
+        'extra.chip.1',
+        'extra.chip.vdd',
+        'extra.chip.power.vcc',
+        'extra.pullup.r_sda.1',
+        'extra.pullup.r_sda.p1',
+        'extra.pullup.r_scl.1',
+        'extra.pullup.r_scl.p1',
+        'extra.pullup.power.vcc',
+    ],
+    'extra-gnd': [
+        'extra.power.gnd',
+        'extra.pullup.power.gnd',
+        'extra.chip.2',
+        'extra.chip.gnd',
+        'extra.chip.power.gnd',
+    ],
+    'extra-sda': [
+        'extra.i2c.sda',
+        'extra.chip.3',
+        'extra.chip.sda',
+        'extra.chip.i2c.sda',
+        'extra.pullup.r_sda.2',
+        'extra.pullup.r_sda.p2',
+        'extra.pullup.i2c.sda',
+    ],
+    'extra-scl': [
+        'extra.i2c.scl',
+        'extra.chip.4',
+        'extra.chip.scl',
+        'extra.chip.i2c.scl',
+        'extra.pullup.r_scl.2',
+        'extra.pullup.r_scl.p2',
+        'extra.pullup.i2c.scl',
+    ],
+    'extra.chip-out': ['extra.chip.5', 'extra.out'],
+    'extra-enable': ['extra.enable', 'r1.2', 'r1.p2'],
+    'net-4': ['extra.lone.1'],
+    'net-5': ['extra.lone.2'],
+    'spare_a': ['spare_a', 'spare_b'],
+    'r1-p1': ['r1.p1', 'r2.p2', 'r2.2', 'r1.1'],
+    'r2-p1': ['r2.p1', 'r2.1'],
+    'net-6': ['lone.1'],
+    'net-7': ['lone.2'],
+}
+
+# Names tie here, so they're picked by the order of the net's nodes
+_TIE_DESIGN = """
+module Sub:
+    signal x
+
+module Top:
+    sub = new Sub
+    signal b
+    signal c
+    b ~ c
+    sub.x ~ b
+"""
+
+_EXPECTED_TIE_NET_NAMES = {
+    'c': ['sub.x', 'c', 'b'],
+}
+
+
+@pytest.mark.parametrize(
+    "design, expected",
+    [
+        (_NAMING_DESIGN, _EXPECTED_NET_NAMES),
+        (_TIE_DESIGN, _EXPECTED_TIE_NET_NAMES),
+    ],
+)
+def test_net_names_unchanged(tmp_path, design: str, expected: dict[str, list[str]]):
+    file = tmp_path / "naming.ato"
+    file.write_text(design)
+    top = str(file) + ":Top"
+
+    nets_by_name = nets.get_nets_by_name(top)
+    assert list(nets_by_name) == list(expected)
+    for name, nodes in nets_by_name.items():
+        assert [address.get_instance_section(node) for node in nodes] == expected[name]
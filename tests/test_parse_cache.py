@@ -0,0 +1,144 @@
+import os
+import textwrap
+import time
+
+import atopile.parse
+import atopile.parse_cache
+import atopile.parse_utils
+
+SRC = textwrap.dedent(
+    """
+    # Test
+    module Test:
+        a = 1  # A is a variable
+        signal b
+        b ~ c.d
+
+    """
+)
+
+
+def test_serialize_round_trip():
+    """Ensure a deserialized tree is indistinguishable from a fresh parse"""
+    tree = atopile.parse.parse_text_as_file(SRC, "test.ato")
+    data = atopile.parse_cache.serialize_tree(tree)
+    cached = atopile.parse_cache.deserialize_tree(data, SRC, "test.ato")
+
+    parser = atopile.parse.AtopileParser
+    assert cached.toStringTree(recog=parser) == tree.toStringTree(recog=parser)
+    assert (
+        atopile.parse_utils.reconstruct(cached)
+        == atopile.parse_utils.reconstruct(tree)
+    )
+
+
+def test_comments_survive_round_trip():
+    tree = atopile.parse.parse_text_as_file(SRC, "test.ato")
+    data = atopile.parse_cache.serialize_tree(tree)
+    cached = atopile.parse_cache.deserialize_tree(data, SRC, "test.ato")
+
+    tokens = [t for t in _iter_tokens(cached) if t.line == 4]
+    assert atopile.parse_utils.get_comment_from_token(tokens[0]) == "A is a variable"
+
+
+def _iter_tokens(ctx):
+    for child in ctx.getChildren():
+        if hasattr(child, "symbol"):
+            yield child.symbol
+        else:
+            yield from _iter_tokens(child)
+
+
+def test_cache_hits_and_misses(tmp_path):
+    cache = atopile.parse_cache.ParseCache(tmp_path)
+
+    assert cache.get(SRC, "test.ato") is None
+    assert (cache.hits, cache.misses) == (0, 1)
+
+    cache.put(SRC, atopile.parse.parse_text_as_file(SRC, "test.ato"), "test.ato")
+    assert cache.get(SRC, "test.ato") is not None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    # A change to the source is a different entry
+    assert cache.get(SRC + "\n", "test.ato") is None
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_corrupt_entry_is_a_miss(tmp_path):
+    cache = atopile.parse_cache.ParseCache(tmp_path)
+    cache._get_path(SRC, "test.ato").write_bytes(b"not a pickle")
+    assert cache.get(SRC, "test.ato") is None
+    assert cache.misses == 1
+
+
+def test_entry_for_another_file_isnt_loaded(tmp_path, monkeypatch):
+    cache = atopile.parse_cache.ParseCache(tmp_path)
+    cache.put(SRC, atopile.parse.parse_text_as_file(SRC, "other.ato"), "other.ato")
+    cache._get_path(SRC, "other.ato").rename(cache._get_path(SRC, "test.ato"))
+
+    def _fail(*args):
+        raise AssertionError("unpickled an entry with the wrong header")
+
+    monkeypatch.setattr(atopile.parse_cache, "deserialize_tree", _fail)
+    assert cache.get(SRC, "test.ato") is None
+    assert cache.misses == 1
+
+
+def test_old_entries_removed(tmp_path):
+    cache = atopile.parse_cache.ParseCache(tmp_path)
+    for i in range(3):
+        src = SRC + "\n" * i
+        cache.put(src, atopile.parse.parse_text_as_file(src, "test.ato"), "test.ato")
+    cache.put(SRC, atopile.parse.parse_text_as_file(SRC, "other.ato"), "other.ato")
+
+    # only the newest entry for each file is kept
+    assert len(list(tmp_path.glob("*.pickle"))) == 2
+    assert cache.get(SRC + "\n\n", "test.ato") is not None
+    assert cache.get(SRC, "test.ato") is None
+
+    # and those that haven't been written for a while are removed
+    old_time = time.time() - atopile.parse_cache.MAX_ENTRY_AGE - 1
+    os.utime(cache._get_path(SRC, "other.ato"), (old_time, old_time))
+    cache.prune()
+    assert cache.get(SRC, "other.ato") is None
+    assert cache.get(SRC + "\n\n", "test.ato") is not None
+
+
+def test_prefetch(tmp_path):
+    """Ensure prefetching follows imports, and fills the in-memory cache"""
+    (tmp_path / "lib").mkdir()
+    (tmp_path / "lib" / "a.ato").write_text("module A:\n    signal a\n")
+    (tmp_path / "lib" / "b.ato").write_text(
+        'from "a.ato" import A\nmodule B:\n    a = new A\n'
+    )
+    (tmp_path / "c.ato").write_text("component C:\n    pin 1\n")
+    (tmp_path / "main.ato").write_text(
+        textwrap.dedent(
+            """
+            from "lib/b.ato" import B
+            import C from "c.ato"
+            module Main:
+                from "lib/a.ato" import A
+                b = new B
+            """
+        )
+    )
+
+    file_parser = atopile.parse.FileParser()
+    file_parser.enable_disk_cache(tmp_path / "cache")
+    file_parser.prefetch([tmp_path / "main.ato"], [tmp_path])
+
+    assert set(file_parser.cache) == {
+        str(tmp_path / "main.ato"),
+        str(tmp_path / "c.ato"),
+        str(tmp_path / "lib" / "a.ato"),
+        str(tmp_path / "lib" / "b.ato"),
+    }
+    assert file_parser.disk_cache.misses == 4
+
+    # A second run should come entirely from the disk cache
+    file_parser = atopile.parse.FileParser()
+    file_parser.enable_disk_cache(tmp_path / "cache")
+    file_parser.prefetch([tmp_path / "main.ato"], [tmp_path])
+    assert len(file_parser.cache) == 4
+    assert file_parser.disk_cache.hits == 4
@@ -0,0 +1,107 @@
+import textwrap
+
+import pytest
+from antlr4.tree.Tree import TerminalNodeImpl
+
+from atopile import parse, parse_utils
+from atopile.parse_incremental import reparse_incrementally
+
+SRC = textwrap.dedent(
+    """
+    module A:
+        a = 1  # the a
+
+    module B:
+        signal b
+
+
+    component C:
+        pin 1  # the pin
+    """
+)
+
+
+def _tokens(ctx) -> list:
+    """Everything about a tree's tokens that the compiler might look at."""
+    tokens = []
+    for child in ctx.getChildren():
+        if isinstance(child, TerminalNodeImpl):
+            t = child.symbol
+            tokens.append(
+                (
+                    t.type,
+                    t.start,
+                    t.stop,
+                    t.line,
+                    t.column,
+                    t.text,
+                    parse_utils.get_comment_from_token(t),
+                )
+            )
+        else:
+            tokens.extend(_tokens(child))
+    return tokens
+
+
+@pytest.mark.parametrize(
+    "old, new",
+    [
+        ("a = 1", "a = 2"),
+        ("    signal b\n", "    signal b\n    signal c\n    signal d\n"),
+        ("module B:\n    signal b\n", ""),
+        ("\n\ncomponent C", "\n\nmodule D:\n    pass\n\ncomponent C"),
+        ("pin 1  # the pin", "pin 1  # a different pin\n    pin 2"),
+    ],
+)
+def test_matches_full_parse(old: str, new: str):
+    assert old in SRC
+    new_src = SRC.replace(old, new)
+
+    tree = parse.parse_text_as_file(SRC, "test.ato")
+    assert reparse_incrementally(tree, new_src) is not None
+
+    full_tree = parse.parse_text_as_file(new_src, "test.ato")
+    assert tree.toStringTree(recog=parse.AtopileParser) == full_tree.toStringTree(
+        recog=parse.AtopileParser
+    )
+    assert _tokens(tree) == _tokens(full_tree)
+
+
+def test_unaffected_blocks_kept():
+    tree = parse.parse_text_as_file(SRC, "test.ato")
+    block_a, block_b, block_c = tree.stmt()
+
+    splice = reparse_incrementally(tree, SRC.replace("signal b", "signal bb"))
+    assert splice.old_stmts == [block_b]
+    assert tree.stmt()[0] is block_a
+    assert tree.stmt()[2] is block_c
+
+
+def test_edit_after_import():
+    """The first block after an import is re-parsed without the import"""
+    src = 'from "x.ato" import X\n' + SRC
+    tree = parse.parse_text_as_file(src, "test.ato")
+    import_stmt, block_a, block_b, block_c = tree.stmt()
+
+    new_src = src.replace("module A:", "component A:")
+    splice = reparse_incrementally(tree, new_src)
+    assert splice is not None
+    assert splice.old_stmts == [block_a]
+    assert tree.stmt()[0] is import_stmt
+    assert _tokens(tree) == _tokens(parse.parse_text_as_file(new_src, "test.ato"))
+
+
+@pytest.mark.parametrize(
+    "new_src",
+    [
+        'from "x.ato" import X\n' + SRC,
+        SRC.replace("module B:", "module B"),
+    ],
+)
+def test_falls_back(new_src: str):
+    """Changes outside blocks and syntax errors need a full parse"""
+    tree = parse.parse_text_as_file(SRC, "test.ato")
+    assert reparse_incrementally(tree, new_src) is None
+    assert tree.toStringTree(recog=parse.AtopileParser) == parse.parse_text_as_file(
+        SRC, "test.ato"
+    ).toStringTree(recog=parse.AtopileParser)
@@ -0,0 +1,83 @@
+import json
+import threading
+import time
+
+from atopile.profiling import LatencyHistogram, Profiler
+
+
+def test_nested_phases_are_exclusive(tmp_path):
+    profiler = Profiler()
+
+    # Phases are free, and not recorded, when the profiler isn't running
+    with profiler.phase("ignored"):
+        pass
+
+    profiler.start()
+    with profiler.phase("outer"):
+        time.sleep(0.02)
+        with profiler.phase("inner"):
+            time.sleep(0.05)
+    with profiler.phase("inner"):
+        pass
+    report = profiler.stop("test")
+
+    assert not profiler.running
+    assert set(report.phases) == {"other", "outer", "inner"}
+    assert report.phases["inner"].calls == 2
+    assert report.phases["inner"].wall >= 0.05
+    assert 0.02 <= report.phases["outer"].wall < 0.05
+    assert abs(sum(p.wall for p in report.phases.values()) - report.wall) < 1e-3
+
+    profile_path = tmp_path / "test.profile.json"
+    report.write(profile_path)
+    data = json.loads(profile_path.read_text())
+    assert data["build"] == "test"
+    assert data["phases"]["inner"]["calls"] == 2
+    assert data["cprofile"] is None
+
+
+def test_cprofile(tmp_path):
+    profiler = Profiler()
+    profiler.start(use_cprofile=True)
+    sum(range(1000))
+    report = profiler.stop("test", tmp_path / "test.prof")
+    assert report.cprofile_path == tmp_path / "test.prof"
+    assert report.cprofile_path.exists()
+
+
+def test_phases_on_other_threads_are_ignored():
+    profiler = Profiler()
+    profiler.start()
+
+    def _work():
+        with profiler.phase("worker"):
+            time.sleep(0.02)
+
+    with profiler.phase("outer"):
+        thread = threading.Thread(target=_work)
+        thread.start()
+        thread.join()
+    report = profiler.stop("test")
+
+    assert set(report.phases) == {"other", "outer"}
+    assert report.phases["outer"].wall >= 0.02
+
+
+def test_latency_histogram():
+    histogram = LatencyHistogram()
+    assert histogram.get_summary() == "no requests"
+
+    for seconds in (0.005, 0.015, 0.015, 0.3, 30.0):
+        histogram.record(seconds)
+    with histogram.time():
+        pass
+
+    assert histogram.count == 6
+    assert histogram.get_percentile(50) == 0.015
+    buckets = dict(histogram.get_buckets())
+    assert buckets[0.01] == 2
+    assert buckets[0.02] == 2
+    assert buckets[0.5] == 1
+    assert buckets[float("inf")] == 1
+    assert sum(buckets.values()) == 6
+    assert histogram.get_summary().startswith("6 requests")
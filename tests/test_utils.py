@@ -0,0 +1,32 @@
+import os
+
+import pytest
+
+from atopile.utils import open_if_changed
+
+
+def test_open_if_changed(tmp_path):
+    path = tmp_path / "out.txt"
+    with open_if_changed(path) as f:
+        f.write("hello")
+    assert path.read_text() == "hello"
+    assert list(tmp_path.iterdir()) == [path]
+
+    # rewriting the same thing leaves the file alone
+    os.utime(path, (0, 0))
+    with open_if_changed(path) as f:
+        f.write("hello")
+    assert path.stat().st_mtime == 0
+
+    with open_if_changed(path) as f:
+        f.write("goodbye")
+    assert path.read_text() == "goodbye"
+    assert path.stat().st_mtime != 0
+
+    # a failed write leaves the original as it was
+    with pytest.raises(RuntimeError):
+        with open_if_changed(path) as f:
+            f.write("half")
+            raise RuntimeError
+    assert path.read_text() == "goodbye"
+    assert list(tmp_path.iterdir()) == [path]